@@ -1,14 +1,39 @@
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Union
 from ...services.analysis_service import analysis_service
 from ...core.task_manager import task_manager
 
 router = APIRouter(prefix="/analysis", tags=["analysis"])
 
+def _check_bins(bins: int, name: str = "bins"):
+    if bins < 1 or bins > 1000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name} must be between 1 and 1000"
+        )
+
 class AnalysisRequest(BaseModel):
     file_id: str
     column: str
+    histogram_bins: int = 20
+    log_scale: bool = False
+    time_bucket: str = "auto"  # auto, hour, day or week
+    approximate: bool = False  # Answer from a random sample, refine in the background
+
+class BatchAnalysisRequest(BaseModel):
+    file_id: str
+    columns: Union[List[str], str] = "all"  # Column names or "all"
+    histogram_bins: int = 20
+    log_scale: bool = False
+    time_bucket: str = "auto"
+
+class CorrelationRequest(BaseModel):
+    file_id: str
+    columns: Optional[List[str]] = None  # All numeric and categorical columns when omitted
+    methods: List[str] = ["pearson", "spearman"]
+    max_categories: int = 50  # Categorical columns with more distinct values are skipped
+    include_tables: bool = False
 
 class QualityAnalysisRequest(BaseModel):
     file_id: str
@@ -16,13 +41,26 @@ class QualityAnalysisRequest(BaseModel):
 @router.post("/column")
 async def analyze_column(request: AnalysisRequest):
     """Start column analysis task"""
+    _check_bins(request.histogram_bins, "histogram_bins")
     try:
+        if request.approximate:
+            return analysis_service.approximate_column_analysis(
+                request.file_id, request.column,
+                request.histogram_bins, request.log_scale, request.time_bucket
+            )
+        
         # Check for cached result first
-        cached = analysis_service.get_cached_analysis(request.file_id, request.column)
+        cached = analysis_service.get_cached_analysis(
+            request.file_id, request.column,
+            request.histogram_bins, request.log_scale, request.time_bucket
+        )
         if cached:
             return {"status": "completed", "result": cached}
         
-        task_id = analysis_service.analyze_column(request.file_id, request.column)
+        task_id = analysis_service.analyze_column(
+            request.file_id, request.column,
+            request.histogram_bins, request.log_scale, request.time_bucket
+        )
         return {"status": "started", "task_id": task_id}
         
     except Exception as e:
@@ -31,6 +69,48 @@ async def analyze_column(request: AnalysisRequest):
             detail=f"Analysis failed: {str(e)}"
         )
 
+@router.post("/columns")
+async def analyze_columns(request: BatchAnalysisRequest):
+    """Analyze several columns in one scan of the file"""
+    if isinstance(request.columns, str) and request.columns != "all":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='columns must be a list of column names or "all"'
+        )
+    _check_bins(request.histogram_bins, "histogram_bins")
+    
+    try:
+        columns = None if request.columns == "all" else request.columns
+        batch = analysis_service.analyze_columns(
+            request.file_id, columns,
+            request.histogram_bins, request.log_scale, request.time_bucket
+        )
+        
+        results = {
+            column: analysis_service.get_cached_analysis(
+                request.file_id, column,
+                request.histogram_bins, request.log_scale, request.time_bucket
+            )
+            for column in batch["cached"]
+        }
+        
+        return {
+            "status": "started" if batch["task_id"] or batch["attached"] else "completed",
+            **batch,
+            "results": results
+        }
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch analysis failed: {str(e)}"
+        )
+
 @router.get("/column/{file_id}/{column}")
 async def get_column_analysis(file_id: str, column: str):
     """Get cached column analysis result"""
@@ -42,11 +122,59 @@ async def get_column_analysis(file_id: str, column: str):
         )
     return result
 
+@router.get("/histogram/{file_id}/{column}")
+async def get_column_histogram(file_id: str, column: str, bins: int = 20, log_scale: bool = False,
+                               time_bucket: str = "auto"):
+    """Re-bin the histogram of a completed column analysis without rescanning"""
+    _check_bins(bins)
+    
+    result = analysis_service.get_histogram(file_id, column, bins, log_scale, time_bucket)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found. Please start analysis first."
+        )
+    return result
+
+@router.post("/correlation")
+async def analyze_correlations(request: CorrelationRequest):
+    """Start correlation matrix and contingency analysis across columns"""
+    if request.max_categories < 2 or request.max_categories > 1000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="max_categories must be between 2 and 1000"
+        )
+    
+    try:
+        cached = analysis_service.get_cached_correlations(
+            request.file_id, request.columns, request.methods,
+            request.max_categories, request.include_tables
+        )
+        if cached:
+            return {"status": "completed", "result": cached}
+        
+        task_id = analysis_service.analyze_correlations(
+            request.file_id, request.columns, request.methods,
+            request.max_categories, request.include_tables
+        )
+        return {"status": "started", "task_id": task_id}
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Correlation analysis failed: {str(e)}"
+        )
+
 @router.get("/dataset-overview/{file_id}")
-async def get_dataset_overview(file_id: str):
-    """Get comprehensive dataset overview"""
+async def get_dataset_overview(file_id: str, approximate: bool = False):
+    """Get comprehensive dataset overview (estimated from a sample when approximate)"""
     try:
-        overview = analysis_service.get_dataset_overview(file_id)
+        overview = analysis_service.get_dataset_overview(file_id, approximate)
         return overview
     except Exception as e:
         raise HTTPException(
@@ -58,6 +186,10 @@ async def get_dataset_overview(file_id: str):
 async def analyze_data_quality(request: QualityAnalysisRequest):
     """Start data quality analysis"""
     try:
+        cached = analysis_service.get_cached_quality(request.file_id)
+        if cached:
+            return {"status": "completed", "result": cached}
+        
         task_id = analysis_service.analyze_data_quality(request.file_id)
         return {"status": "started", "task_id": task_id}
         
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import Response
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-from ...services.export_service import export_service
+from ...services.export_service import export_service, parse_range
 from ...models.filter import DataRequest
 
 router = APIRouter(prefix="/export", tags=["export"])
 
 class ExportRequest(BaseModel):
     data_request: DataRequest
-    format: str  # json, jsonl, csv, excel
+    format: str  # json, jsonl, csv, excel, parquet, arrow
     include_stats: bool = False
+    compression: Optional[str] = None  # gzip/zstd for text formats, codec for Parquet/Arrow
+    row_group_size: Optional[int] = None  # Parquet row group / Arrow record batch rows
+    partition_by: Optional[str] = None  # rows, size or column (jobs only): JSONL/CSV shards in a zip
+    partition_size: Optional[int] = None  # Records (rows) or uncompressed bytes (size) per shard
+    partition_column: Optional[str] = None  # Column whose values name the shards
 
 @router.post("/")
 async def export_data(request: ExportRequest):
@@ -19,24 +24,131 @@ async def export_data(request: ExportRequest):
         result = await export_service.export_data(
             request.data_request, 
             request.format, 
-            request.include_stats
+            request.include_stats,
+            request.compression,
+            request.row_group_size,
+            request.partition_by,
+            request.partition_size,
+            request.partition_column
         )
         
-        if request.format.lower() == 'excel':
-            return Response(
-                content=result["content"],
-                media_type=result["content_type"],
-                headers={"Content-Disposition": f"attachment; filename={result['filename']}"}
-            )
-        else:
-            return Response(
-                content=result["content"],
-                media_type=result["content_type"],
-                headers={"Content-Disposition": f"attachment; filename={result['filename']}"}
-            )
+        return StreamingResponse(
+            result["stream"],
+            media_type=result["content_type"],
+            headers={"Content-Disposition": f"attachment; filename={result['filename']}"}
+        )
             
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Export failed: {str(e)}"
+        )
+
+@router.post("/jobs")
+async def create_export_job(request: ExportRequest):
+    """Run an export in the background and keep the file for download"""
+    try:
+        job = export_service.submit_job(
+            request.data_request,
+            request.format,
+            request.include_stats,
+            request.compression,
+            request.row_group_size,
+            request.partition_by,
+            request.partition_size,
+            request.partition_column
+        )
+        return export_service.job_status(job)
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Export failed: {str(e)}"
         )
+
+@router.get("/jobs/{job_id}")
+async def get_export_job(job_id: str):
+    """Get export job status"""
+    job = export_service.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    return export_service.job_status(job)
+
+@router.get("/jobs/{job_id}/download")
+async def download_export_job(job_id: str, range_header: Optional[str] = Header(None, alias="Range"),
+                              if_range: Optional[str] = Header(None),
+                              if_none_match: Optional[str] = Header(None)):
+    """Download a finished export; supports Range requests for resuming"""
+    job = export_service.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    if job.etag is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Export job has not completed"
+        )
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": job.etag,
+        "Content-Disposition": f"attachment; filename={job.filename}"
+    }
+    if if_none_match and (if_none_match.strip() == "*" or job.etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # A Range is only honoured while the file still matches the client's If-Range ETag
+    byte_range = None
+    if range_header and (not if_range or if_range.strip() == job.etag):
+        try:
+            byte_range = parse_range(range_header, job.size)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{job.size}"}
+            )
+    start, end = byte_range or (0, job.size - 1)
+    
+    try:
+        content = export_service.read_job_file(job, start, end)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export file has expired"
+        )
+    
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{job.size}"
+    return StreamingResponse(
+        content,
+        status_code=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        media_type=job.content_type,
+        headers=headers
+    )
+
+@router.delete("/jobs/{job_id}")
+async def delete_export_job(job_id: str):
+    """Delete an export job and its file"""
+    if not export_service.delete_job(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    return {"message": "Export job deleted successfully"}
@@ -100,6 +100,22 @@ async def get_file_info(file_id: str):
         )
     return metadata
 
+@router.get("/{file_id}/schema-drift")
+async def get_schema_drift(file_id: str):
+    """Get where fields appear, disappear or change type across the file"""
+    if not file_loader_service.get_file_metadata(file_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    drift = file_loader_service.get_schema_drift(file_id)
+    if drift is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Schema drift profile is not available until full analysis completes"
+        )
+    return drift
+
 @router.get("/", response_model=List[FileMetadata])
 async def list_files():
     """List all uploaded files"""
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from typing import Any, Dict, List, Optional
+import json
+import math
+import time
+from pydantic import BaseModel, Field
 from ...services.search_service import search_service
+from ...core.task_manager import task_manager
 
 router = APIRouter(prefix="/search", tags=["search"])
 
@@ -11,12 +17,37 @@ class SearchRequest(BaseModel):
     column: Optional[str] = None
     regex: bool = False
     limit: int = 1000
+    column_boosts: Optional[Dict[str, float]] = None
 
 class SearchResponse(BaseModel):
     matching_rows: List[int]
     total_matches: int
     query: str
+    scores: Optional[List[float]] = None
     execution_time_ms: float
+    index_status: str = "ready"
+
+class SearchResultsRequest(SearchRequest):
+    page: int = Field(1, ge=1)
+    page_size: int = Field(50, ge=1, le=1000)
+
+class SearchResultsResponse(BaseModel):
+    data: List[Dict[str, Any]]
+    row_ids: List[int]
+    scores: Optional[List[float]] = None
+    page: int
+    page_size: int
+    total_pages: int
+    total_matches: int
+    has_next: bool
+    has_prev: bool
+    query: str
+    execution_time_ms: float
+    index_status: str = "ready"
+
+class StreamSearchRequest(SearchRequest):
+    batch_size: int = 100
+    format: str = "ndjson"  # ndjson or sse
 
 class SuggestionsRequest(BaseModel):
     file_id: str
@@ -27,31 +58,30 @@ class SuggestionsRequest(BaseModel):
 @router.post("/", response_model=SearchResponse)
 async def search_data(request: SearchRequest):
     """Search data globally or within specific column"""
-    import time
     start_time = time.time()
     
     try:
-        if request.column:
-            if request.regex:
-                matching_rows = search_service.search_regex(
-                    request.file_id, request.column, request.query, request.limit
-                )
-            else:
-                matching_rows = search_service.search_column(
-                    request.file_id, request.column, request.query, request.limit
-                )
+        scores = None
+        if request.column and request.regex:
+            matching_rows = search_service.search_regex(
+                request.file_id, request.column, request.query, request.limit
+            )
+            total_matches = len(matching_rows)
         else:
-            matching_rows = search_service.search_global(
-                request.file_id, request.query, request.limit
+            matching_rows, scores, total_matches = search_service.search_with_scores(
+                request.file_id, request.query, request.limit,
+                column=request.column, column_boosts=request.column_boosts
             )
         
         execution_time = (time.time() - start_time) * 1000
         
         return SearchResponse(
             matching_rows=matching_rows,
-            total_matches=len(matching_rows),
+            total_matches=total_matches,
             query=request.query,
-            execution_time_ms=execution_time
+            scores=scores,
+            execution_time_ms=execution_time,
+            index_status=search_service.get_index_status(request.file_id)
         )
         
     except Exception as e:
@@ -60,6 +90,115 @@ async def search_data(request: SearchRequest):
             detail=f"Search failed: {str(e)}"
         )
 
+@router.get("/index/{file_id}")
+async def get_search_index_status(file_id: str):
+    """Get search index build status for file"""
+    status_value = search_service.get_index_status(file_id)
+    task_id = search_service.index_tasks.get(file_id)
+    task = task_manager.get_task(task_id) if task_id else None
+    return {
+        "file_id": file_id,
+        "index_status": status_value,
+        "task_id": task_id,
+        "progress": task.progress if task else (100.0 if status_value == "ready" else 0.0)
+    }
+
+@router.post("/results", response_model=SearchResultsResponse)
+async def search_results(request: SearchResultsRequest):
+    """Search and return a page of the matching records"""
+    start_time = time.time()
+    
+    try:
+        # Only rows up to the end of the requested page need to be ranked, but scans
+        # count matches up to request.limit so the totals cover the later pages
+        page_end = request.page * request.page_size
+        limit = min(page_end, request.limit)
+        
+        scores = None
+        if request.column and request.regex:
+            matching_rows = search_service.search_regex(
+                request.file_id, request.column, request.query, request.limit
+            )
+            total_matches = len(matching_rows)
+        else:
+            matching_rows, scores, total_matches = search_service.search_with_scores(
+                request.file_id, request.query, limit,
+                column=request.column, column_boosts=request.column_boosts, count_limit=request.limit
+            )
+        
+        page_start = (request.page - 1) * request.page_size
+        page_rows = matching_rows[page_start:page_end]
+        page_scores = scores[page_start:page_end] if scores is not None else None
+        records = search_service.get_records(request.file_id, page_rows)
+        
+        # Rows that could not be read back (e.g. the file changed since indexing) are dropped
+        found = [i for i, record in enumerate(records) if record is not None]
+        records = [records[i] for i in found]
+        page_rows = [page_rows[i] for i in found]
+        if page_scores is not None:
+            page_scores = [page_scores[i] for i in found]
+        
+        total_matches = min(total_matches, request.limit)
+        total_pages = max(1, math.ceil(total_matches / request.page_size))
+        
+        return SearchResultsResponse(
+            data=records,
+            row_ids=page_rows,
+            scores=page_scores,
+            page=request.page,
+            page_size=request.page_size,
+            total_pages=total_pages,
+            total_matches=total_matches,
+            has_next=request.page < total_pages,
+            has_prev=request.page > 1,
+            query=request.query,
+            execution_time_ms=(time.time() - start_time) * 1000,
+            index_status=search_service.get_index_status(request.file_id)
+        )
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Search failed: {str(e)}"
+        )
+
+@router.post("/stream")
+async def stream_search(request: StreamSearchRequest, http_request: Request):
+    """Stream match batches and scan progress as NDJSON or server-sent events"""
+    try:
+        events = search_service.stream_search(
+            request.file_id, request.query, request.column, request.regex,
+            request.limit, request.batch_size
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    use_sse = request.format.lower() == "sse"
+    
+    async def event_stream():
+        try:
+            async for event in iterate_in_threadpool(events):
+                if await http_request.is_disconnected():
+                    break
+                payload = json.dumps(event)
+                if use_sse:
+                    yield f"event: {event['event']}\ndata: {payload}\n\n"
+                else:
+                    yield payload + "\n"
+        finally:
+            try:
+                events.close()
+            except ValueError:
+                pass  # Cancelled while the generator was running in the threadpool
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson"
+    )
+
 @router.post("/suggestions")
 async def get_search_suggestions(request: SuggestionsRequest):
     """Get search suggestions for autocomplete"""
@@ -77,11 +216,19 @@ async def get_search_suggestions(request: SuggestionsRequest):
 
 @router.post("/index/{file_id}")
 async def build_search_index(file_id: str):
-    """Build search index for file"""
+    """Start background search index build for file"""
     try:
-        result = search_service.build_search_index(file_id)
-        return result
+        if search_service.get_index_status(file_id) == "ready":
+            return {"status": "completed", "index_status": "ready"}
+        
+        task_id = search_service.start_index_build(file_id)
+        return {"status": "started", "task_id": task_id, "index_status": "building"}
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
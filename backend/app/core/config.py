@@ -18,6 +18,28 @@ class Settings(BaseSettings):
     chunk_size: int = 1000
     max_workers: int = 4
     cache_ttl: int = 3600  # 1 hour
+    search_scan_max_records: int = 100000  # Fallback scan bound while index builds
+    index_workers: int = 0  # Index build processes (0 = max_workers)
+    index_shard_min_bytes: int = 16 * 1024 * 1024  # Smaller files are indexed in-process
+    analysis_workers: int = 0  # Column analysis processes (0 = max_workers)
+    analysis_shard_min_bytes: int = 16 * 1024 * 1024  # Smaller files are analyzed in-process
+    analysis_sample_size: int = 10000  # Random records behind approximate analysis
+    quality_hash_bits: int = 64  # Record fingerprint size for duplicate detection (64 or 128)
+    quality_memory_budget: int = 0  # Bytes for duplicate detection; a Bloom filter is used beyond it (0 = unbounded)
+    quality_max_duplicate_groups: int = 100
+    analysis_store_max_entries: int = 10000  # Persistent analysis results kept (least recently used evicted)
+    analysis_memory_cache_size: int = 256  # Analysis results kept in memory in front of the store
+    correlation_sample_size: int = 100000  # Rows sampled for Spearman rank correlation
+    text_char_stats: bool = True  # Character class and script profiles for text columns
+    quick_sample_offsets: int = 100  # Random file offsets read for the initial schema and record estimate
+    schema_segment_bytes: int = 4 * 1024 * 1024  # Schema drift segment size (grown to keep at most 1000 segments)
+    sort_run_records: int = 100000  # Records sorted in memory before spilling a run to disk
+    export_chunk_bytes: int = 1024 * 1024  # Target size of each streamed export chunk
+    export_row_group_size: int = 65536  # Rows per Parquet row group / Arrow record batch
+    export_job_ttl: int = 6 * 3600  # Seconds a finished export job's file is kept for download
+    export_workers: int = 0  # Export compression threads (0 = max_workers)
+    export_max_partitions: int = 256  # Distinct values allowed when partitioning an export by column
+    export_sync_excel_max_records: int = 100000  # Larger Excel exports must run as /export/jobs
     
     # Database
     database_url: str = "sqlite:///./jsonl_viewer.db"
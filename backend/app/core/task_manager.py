@@ -14,6 +14,9 @@ class TaskStatus(Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+class TaskCancelled(Exception):
+    """Raised by a running task that stops early because it was cancelled"""
+
 @dataclass
 class TaskInfo:
     id: str
@@ -65,6 +68,10 @@ class TaskManager:
                 
                 return result
                 
+            except TaskCancelled:
+                with self._lock:
+                    self.tasks[task_id].status = TaskStatus.CANCELLED
+                    self.tasks[task_id].completed_at = time.time()
             except Exception as e:
                 with self._lock:
                     self.tasks[task_id].status = TaskStatus.FAILED
@@ -19,6 +19,8 @@ class ColumnInfo(BaseModel):
     sample_values: List[Any] = []
     unique_count: Optional[int] = None
     null_count: Optional[int] = None
+    type_counts: Optional[Dict[str, int]] = None
+    integer_count: Optional[int] = None  # Numbers that are int64 integers
 
 class FileMetadata(BaseModel):
     id: str
@@ -28,7 +30,9 @@ class FileMetadata(BaseModel):
     file_size: int
     total_records: int
     estimated_records: Optional[int] = None
+    estimated_records_ci: Optional[List[int]] = None  # 95% interval of the estimate
     columns: List[ColumnInfo]
+    fields: List[ColumnInfo] = []  # Every dotted nested field path, e.g. a.b[].c
     upload_time: datetime
     processing_status: str = "uploaded"
     sample_data: List[Dict[str, Any]] = []
@@ -36,6 +40,7 @@ class FileMetadata(BaseModel):
 
 class SchemaInfo(BaseModel):
     columns: List[ColumnInfo]
+    fields: List[ColumnInfo] = []
     total_records: int
     estimated_records: Optional[int] = None
     sample_size: int
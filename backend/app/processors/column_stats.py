@@ -0,0 +1,168 @@
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from .jsonl_streamer import JSONLStreamer
+from .sketches import HyperLogLog, KLLSketch, RunningStats, SpaceSaving, StreamingHistogram
+from .text_stats import TextAccumulator
+from .timestamps import TimestampParser
+
+class ColumnAccumulator:
+    """Single-pass, mergeable accumulator for one column's analysis"""
+
+    TOP_VALUES_CAPACITY = 1000
+    DATE_BATCH_SIZE = 8192
+    DATE_SAMPLE_SIZE = 10
+
+    def __init__(self, column: str, data_type: str, text_char_stats: bool = False):
+        self.column = column
+        self.data_type = data_type
+        self.total_count = 0
+        self.null_count = 0
+        self.value_counts = SpaceSaving(self.TOP_VALUES_CAPACITY)
+        self.distinct = HyperLogLog()
+        self.numeric_stats = RunningStats()
+        self.numeric_quantiles = KLLSketch()
+        self.histogram = StreamingHistogram()
+        self.log_histogram = StreamingHistogram()  # log10 of positive values
+        self.time_histogram = StreamingHistogram(resolution=16384)  # Whole hours since the epoch
+        self.text = TextAccumulator(text_char_stats) if data_type == 'string' else None
+
+        # Date columns: values are parsed to epoch seconds in batches and only profiled
+        self.timestamps = TimestampParser()
+        self.hour_of_day = np.zeros(24, dtype=np.int64)
+        self.day_of_week = np.zeros(7, dtype=np.int64)  # Monday first
+        self.date_samples: List[str] = []
+        self.earliest: Optional[int] = None  # Epoch seconds
+        self.latest: Optional[int] = None
+        self._date_buffer: List[Any] = []
+
+    def add_record(self, record: Any):
+        self.total_count += 1
+        value = record.get(self.column) if isinstance(record, dict) else None
+
+        if value is None:
+            self.null_count += 1
+            return
+
+        text = str(value)
+        self.value_counts.add(text)
+        self.distinct.add(text)
+
+        if self.data_type == 'number':
+            try:
+                number = float(value) if isinstance(value, (int, float)) else float(str(value))
+            except (ValueError, TypeError):
+                return
+            self.numeric_stats.add(number)
+            self.numeric_quantiles.add(number)
+            self.histogram.add(number)
+            if number > 0:
+                self.log_histogram.add(math.log10(number))
+        elif self.data_type == 'string':
+            self.text.add(text)
+        elif self.data_type == 'date':
+            if len(self.date_samples) < self.DATE_SAMPLE_SIZE and text not in self.date_samples:
+                self.date_samples.append(text)
+            self._date_buffer.append(value)
+            if len(self._date_buffer) >= self.DATE_BATCH_SIZE:
+                self.flush()
+
+    def flush(self):
+        """Process buffered numeric, text and date values in one batch"""
+        self.histogram.flush()
+        self.log_histogram.flush()
+        if self.text is not None:
+            self.text.flush()
+        if not self._date_buffer:
+            return
+        seconds = self.timestamps.parse_many(self._date_buffer)
+        self._date_buffer = []
+        if seconds.size:
+            earliest, latest = int(seconds.min()), int(seconds.max())
+            self.earliest = earliest if self.earliest is None else min(self.earliest, earliest)
+            self.latest = latest if self.latest is None else max(self.latest, latest)
+            self.time_histogram.add_many(seconds // 3600)
+            self.hour_of_day += np.bincount(seconds % 86400 // 3600, minlength=24)
+            # 1970-01-01 was a Thursday
+            self.day_of_week += np.bincount((seconds // 86400 + 3) % 7, minlength=7)
+
+    def merge(self, other: 'ColumnAccumulator'):
+        """Fold in the accumulator of a later partition"""
+        self.flush()
+        other.flush()
+        self.total_count += other.total_count
+        self.null_count += other.null_count
+        self.value_counts.merge(other.value_counts)
+        self.distinct.merge(other.distinct)
+        self.numeric_stats.merge(other.numeric_stats)
+        self.numeric_quantiles.merge(other.numeric_quantiles)
+        self.histogram.merge(other.histogram)
+        self.log_histogram.merge(other.log_histogram)
+        self.time_histogram.merge(other.time_histogram)
+        if other.earliest is not None:
+            self.earliest = other.earliest if self.earliest is None else min(self.earliest, other.earliest)
+            self.latest = other.latest if self.latest is None else max(self.latest, other.latest)
+        if self.text is not None:
+            self.text.merge(other.text)
+        self.timestamps.merge(other.timestamps)
+        self.hour_of_day += other.hour_of_day
+        self.day_of_week += other.day_of_week
+        for sample in other.date_samples:
+            if len(self.date_samples) < self.DATE_SAMPLE_SIZE and sample not in self.date_samples:
+                self.date_samples.append(sample)
+
+    @property
+    def non_null_count(self) -> int:
+        return self.total_count - self.null_count
+
+def accumulate_byte_range(file_path: str, start: int, end: int,
+                          columns: List[Tuple[str, str]], text_char_stats: bool = False) -> Dict[str, ColumnAccumulator]:
+    """Worker entry point: accumulate one byte range of an uncompressed file"""
+    accumulators = {column: ColumnAccumulator(column, data_type, text_char_stats) for column, data_type in columns}
+    for _, record in JSONLStreamer(Path(file_path)).stream_byte_range(start, end):
+        for accumulator in accumulators.values():
+            accumulator.add_record(record)
+    for accumulator in accumulators.values():
+        accumulator.flush()
+    return accumulators
+
+def accumulate_columns(file_path: str, columns: List[Tuple[str, str]], workers: int, min_shard_bytes: int,
+                       total_records: int = 0, text_char_stats: bool = False,
+                       progress_callback: Optional[Callable[[float], None]] = None) -> Dict[str, ColumnAccumulator]:
+    """Accumulate several (column, data_type) pairs in one pass, sharding uncompressed files
+    by byte range across processes"""
+    streamer = JSONLStreamer(Path(file_path))
+    file_size = streamer.file_path.stat().st_size
+    num_shards = max(1, min(workers, file_size // max(1, min_shard_bytes)))
+    ranges = streamer.split_byte_ranges(num_shards)
+
+    if len(ranges) == 1:
+        accumulators = {column: ColumnAccumulator(column, data_type, text_char_stats) for column, data_type in columns}
+        for row, record in enumerate(streamer.stream_records(), start=1):
+            for accumulator in accumulators.values():
+                accumulator.add_record(record)
+            if progress_callback and total_records and row % 1000 == 0:
+                progress_callback(min(1.0, row / total_records))
+        for accumulator in accumulators.values():
+            accumulator.flush()
+        return accumulators
+
+    results: List[Optional[Dict[str, ColumnAccumulator]]] = [None] * len(ranges)
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = {
+            executor.submit(accumulate_byte_range, str(file_path), start, end, columns, text_char_stats): shard
+            for shard, (start, end) in enumerate(ranges)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(done / len(ranges))
+
+    # Merge in file order so order-dependent parts (date samples) stay in row order
+    accumulators = results[0]
+    for partial in results[1:]:
+        for column, accumulator in partial.items():
+            accumulators[column].merge(accumulator)
+    return accumulators
@@ -0,0 +1,130 @@
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .schema_stats import INT64_MAX, INT64_MIN
+from .shard_writer import ChunkSink
+
+# Codecs accepted per format; the first one is the default
+CODECS = {
+    'parquet': ['snappy', 'zstd', 'gzip', 'brotli', 'lz4', 'none'],
+    'arrow': ['none', 'lz4', 'zstd'],
+}
+
+_SCALAR_TYPES = {"number": pa.float64(), "boolean": pa.bool_()}
+
+def _field_type(path: str, fields: Dict[str, Any]) -> pa.DataType:
+    """Arrow type of a field path from the schema detector's nested field infos"""
+    info = fields.get(path)
+    if info is None:
+        return pa.string()
+    type_counts = info.type_counts or {info.data_type.value: 1}
+    types = {name for name, count in type_counts.items() if count and name != "null"}
+    if types <= {"string", "date"} or len(types) > 1:
+        return pa.string()  # Dates keep their source text; mixed types are written as JSON text
+
+    (data_type,) = types
+    if data_type == "object":
+        prefix = path + '.'
+        children = sorted(
+            name[len(prefix):] for name in fields
+            if name.startswith(prefix) and '.' not in name[len(prefix):] and not name.endswith('[]')
+        )
+        if not children:
+            return pa.string()
+        return pa.struct([pa.field(child, _field_type(prefix + child, fields)) for child in children])
+    if data_type == "array":
+        return pa.list_(_field_type(path + '[]', fields))
+    if data_type == "number" and info.integer_count is not None and info.integer_count == type_counts["number"]:
+        return pa.int64()  # float64 would round integers beyond 2**53
+    return _SCALAR_TYPES[data_type]
+
+def arrow_schema(columns: List[Any], fields: List[Any]) -> pa.Schema:
+    """Arrow schema with one field per top-level column, nested objects as structs and arrays as lists"""
+    by_path = {field.name: field for field in fields}
+    for column in columns:
+        by_path.setdefault(column.name, column)
+    return pa.schema([pa.field(column.name, _field_type(column.name, by_path)) for column in columns])
+
+def _to_float(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    try:
+        return float(value)
+    except OverflowError:
+        return None
+
+def _to_int(value: Any) -> Optional[int]:
+    if isinstance(value, int) and not isinstance(value, bool) and INT64_MIN <= value <= INT64_MAX:
+        return value
+    return None
+
+def _converter(data_type: pa.DataType) -> Callable[[Any], Any]:
+    """Function mapping a JSON value to a value of data_type; values that do not fit become null"""
+    if pa.types.is_string(data_type):
+        return lambda value: value if value is None or isinstance(value, str) else json.dumps(value, default=str)
+    if pa.types.is_floating(data_type):
+        return _to_float
+    if pa.types.is_integer(data_type):
+        return _to_int
+    if pa.types.is_boolean(data_type):
+        return lambda value: value if isinstance(value, bool) else None
+    if pa.types.is_list(data_type):
+        convert_item = _converter(data_type.value_type)
+        return lambda value: [convert_item(item) for item in value] if isinstance(value, list) else None
+    if pa.types.is_struct(data_type):
+        children = [(field.name, _converter(field.type)) for field in data_type]
+        return lambda value: (
+            {name: convert(value.get(name)) for name, convert in children} if isinstance(value, dict) else None
+        )
+    raise ValueError(f"Unsupported Arrow type: {data_type}")
+
+def columnar_codec(format: str, compression: Optional[str], row_group_size: int) -> str:
+    """Check columnar export options, returning the codec to write with"""
+    if format not in CODECS:
+        raise ValueError(f"Unsupported columnar format: {format}")
+    codec = (compression or CODECS[format][0]).lower()
+    if codec not in CODECS[format]:
+        raise ValueError(f"Unsupported {format} compression: {compression} (expected one of {', '.join(CODECS[format])})")
+    if row_group_size <= 0:
+        raise ValueError("row_group_size must be positive")
+    return codec
+
+def write_columnar(records: Iterable[Dict[str, Any]], schema: pa.Schema, format: str,
+                   compression: Optional[str] = None, row_group_size: int = 65536) -> Iterator[bytes]:
+    """Encode records as Parquet or an Arrow IPC file, yielding the output as it is written.
+
+    Records are converted in batches of row_group_size rows, each written as
+    one Parquet row group or one Arrow record batch, so memory is bounded by
+    the batch size.
+    """
+    codec = columnar_codec(format, compression, row_group_size)
+    struct_type = pa.struct(list(schema))
+    convert = _converter(struct_type)
+    sink = ChunkSink()
+    output = pa.PythonFile(sink, mode='w')
+    if format == 'parquet':
+        writer = pq.ParquetWriter(output, schema, compression=codec)
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=None if codec == 'none' else codec)
+        writer = pa.ipc.new_file(output, schema, options=options)
+    return _write_batches(records, writer, sink, convert, struct_type, row_group_size)
+
+def _write_batches(records: Iterable[Dict[str, Any]], writer, sink: ChunkSink, convert: Callable[[Any], Any],
+                   struct_type: pa.DataType, row_group_size: int) -> Iterator[bytes]:
+    rows: List[Dict[str, Any]] = []
+    try:
+        yield sink.drain()  # The file header, before any record is read
+        for record in records:
+            rows.append(convert(record if isinstance(record, dict) else {}))
+            if len(rows) >= row_group_size:
+                writer.write_batch(pa.RecordBatch.from_struct_array(pa.array(rows, type=struct_type)))
+                rows = []
+                data = sink.drain()
+                if data:
+                    yield data
+        if rows:
+            writer.write_batch(pa.RecordBatch.from_struct_array(pa.array(rows, type=struct_type)))
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,304 @@
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from .jsonl_streamer import JSONLStreamer
+
+def _to_number(value: Any) -> float:
+    if value is None or isinstance(value, bool):
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value))
+    except (ValueError, TypeError):
+        return math.nan
+
+def average_ranks(values: np.ndarray) -> np.ndarray:
+    """1-based ranks with ties sharing their average rank"""
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    ends = np.cumsum(counts)
+    return (ends - (counts - 1) / 2.0)[inverse]
+
+class CorrelationAccumulator:
+    """Mergeable one-pass accumulator for cross-column statistics.
+
+    Numeric columns keep pairwise-complete co-moment sums (on values shifted by
+    a per-column constant for numerical stability), which give exact Pearson
+    correlations. Spearman needs global ranks, so it is computed on a uniform
+    bottom-k sample of rows. Categorical columns keep one contingency table per
+    pair, grown to the categories seen so far, until a column exceeds
+    max_categories distinct values.
+    """
+
+    BATCH_SIZE = 8192
+
+    def __init__(self, numeric_columns: List[str], categorical_columns: List[str],
+                 shifts: Optional[Sequence[float]] = None, max_categories: int = 50,
+                 sample_size: int = 100000, seed: Optional[int] = None):
+        self.numeric_columns = numeric_columns
+        self.categorical_columns = categorical_columns
+        self.max_categories = max_categories
+        self.sample_size = sample_size
+        self.total_count = 0
+        self.rng = np.random.default_rng(seed)
+
+        k = len(numeric_columns)
+        self.shifts = np.asarray(shifts if shifts is not None else [0.0] * k, dtype=np.float64)
+        self.n = np.zeros((k, k), dtype=np.int64)
+        self.sum_x = np.zeros((k, k))
+        self.sum_xx = np.zeros((k, k))
+        self.sum_xy = np.zeros((k, k))
+
+        # Bottom-k row sample for rank correlation: the rows with the smallest random priorities
+        self.sample_values = np.empty((0, k))
+        self.sample_priorities = np.empty(0)
+
+        m = len(categorical_columns)
+        self.categories: List[Dict[str, int]] = [{} for _ in range(m)]
+        self.overflowed = [False] * m
+        self.tables: Dict[tuple, np.ndarray] = {
+            (i, j): np.zeros((0, 0), dtype=np.int64) for i in range(m) for j in range(i + 1, m)
+        }
+
+        self._numeric_rows: List[List[float]] = []
+        self._categorical_rows: List[List[Any]] = []
+
+    def add_record(self, record: Any):
+        if not isinstance(record, dict):
+            record = {}
+        self.total_count += 1
+        if self.numeric_columns:
+            self._numeric_rows.append([_to_number(record.get(column)) for column in self.numeric_columns])
+        if self.categorical_columns:
+            self._categorical_rows.append([record.get(column) for column in self.categorical_columns])
+        if max(len(self._numeric_rows), len(self._categorical_rows)) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._numeric_rows:
+            self._add_numeric_batch(np.array(self._numeric_rows, dtype=np.float64))
+            self._numeric_rows = []
+        if self._categorical_rows:
+            self._add_categorical_batch(self._categorical_rows)
+            self._categorical_rows = []
+
+    def _add_numeric_batch(self, values: np.ndarray):
+        present = ~np.isnan(values)
+        mask = present.astype(np.float64)
+        shifted = np.where(present, values - self.shifts, 0.0)
+
+        # Entry [i, j] sums over rows where both column i and column j are present
+        self.n += (mask.T @ mask).astype(np.int64)
+        self.sum_x += shifted.T @ mask
+        self.sum_xx += (shifted * shifted).T @ mask
+        self.sum_xy += shifted.T @ shifted
+
+        priorities = self.rng.random(len(values))
+        if len(self.sample_priorities) >= self.sample_size:
+            keep = priorities < self.sample_priorities.max()
+            values, priorities = values[keep], priorities[keep]
+        if len(priorities):
+            self._merge_sample(values, priorities)
+
+    def _merge_sample(self, values: np.ndarray, priorities: np.ndarray):
+        values = np.concatenate([self.sample_values, values])
+        priorities = np.concatenate([self.sample_priorities, priorities])
+        if len(priorities) > self.sample_size:
+            keep = np.argpartition(priorities, self.sample_size - 1)[:self.sample_size]
+            values, priorities = values[keep], priorities[keep]
+        self.sample_values, self.sample_priorities = values, priorities
+
+    def _encode(self, column: int, value: Any) -> int:
+        """Category code of a value, -1 for nulls and for columns past max_categories"""
+        if value is None or self.overflowed[column]:
+            return -1
+        key = str(value)
+        codes = self.categories[column]
+        code = codes.get(key)
+        if code is None:
+            if len(codes) >= self.max_categories:
+                self.overflowed[column] = True
+                return -1
+            code = codes[key] = len(codes)
+        return code
+
+    def _table(self, i: int, j: int) -> np.ndarray:
+        """Contingency table of a pair, grown to the categories seen so far"""
+        table = self.tables[(i, j)]
+        rows, cols = len(self.categories[i]), len(self.categories[j])
+        if table.shape != (rows, cols):
+            table = np.pad(table, ((0, rows - table.shape[0]), (0, cols - table.shape[1])))
+            self.tables[(i, j)] = table
+        return table
+
+    def _drop_overflowed_tables(self):
+        for (i, j) in self.tables:
+            if self.overflowed[i] or self.overflowed[j]:
+                self.tables[(i, j)] = np.zeros((0, 0), dtype=np.int64)
+
+    def _add_categorical_batch(self, rows: List[List[Any]]):
+        m = len(self.categorical_columns)
+        codes = np.array([[self._encode(column, row[column]) for column in range(m)] for row in rows],
+                         dtype=np.int64).reshape(len(rows), m)
+        self._drop_overflowed_tables()
+        for i, j in self.tables:
+            if self.overflowed[i] or self.overflowed[j]:
+                continue
+            table = self._table(i, j)
+            size = table.shape[1]
+            both = (codes[:, i] >= 0) & (codes[:, j] >= 0)
+            cells = codes[both, i] * size + codes[both, j]
+            table += np.bincount(cells, minlength=table.size).reshape(table.shape)
+
+    def merge(self, other: 'CorrelationAccumulator'):
+        """Fold in the accumulator of another partition (built with the same columns and shifts)"""
+        self.flush()
+        other.flush()
+        self.total_count += other.total_count
+        self.n += other.n
+        self.sum_x += other.sum_x
+        self.sum_xx += other.sum_xx
+        self.sum_xy += other.sum_xy
+        if len(other.sample_priorities):
+            self._merge_sample(other.sample_values, other.sample_priorities)
+
+        # Re-code the other partition's categories into this partition's codes
+        remaps = []
+        for column, other_codes in enumerate(other.categories):
+            if other.overflowed[column]:
+                self.overflowed[column] = True
+            remap = np.full(len(other_codes), -1, dtype=np.int64)
+            for key, code in other_codes.items():
+                remap[code] = self._encode(column, key)
+            remaps.append(remap)
+
+        self._drop_overflowed_tables()
+        for i, j in self.tables:
+            if self.overflowed[i] or self.overflowed[j]:
+                continue
+            table = self._table(i, j)
+            other_table = other.tables[(i, j)]
+            rows, cols = np.nonzero(other_table)
+            np.add.at(table, (remaps[i][rows], remaps[j][cols]), other_table[rows, cols])
+
+    def pearson(self) -> Dict[str, Any]:
+        self.flush()
+        n = self.n.astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sum_y, sum_yy = self.sum_x.T, self.sum_xx.T
+            covariance = self.sum_xy - self.sum_x * sum_y / n
+            var_x = self.sum_xx - self.sum_x ** 2 / n
+            var_y = sum_yy - sum_y ** 2 / n
+            matrix = covariance / np.sqrt(var_x * var_y)
+        matrix = np.clip(matrix, -1.0, 1.0)
+        return {"matrix": _matrix_to_list(matrix), "n": self.n.tolist()}
+
+    def spearman(self) -> Dict[str, Any]:
+        self.flush()
+        values = self.sample_values
+        k = len(self.numeric_columns)
+        present = ~np.isnan(values)
+        complete = present.all(axis=0)
+        full_ranks = {c: average_ranks(values[:, c]) for c in range(k) if complete[c] and len(values)}
+
+        matrix = np.full((k, k), np.nan)
+        n = np.zeros((k, k), dtype=np.int64)
+        for i in range(k):
+            for j in range(i, k):
+                if i in full_ranks and j in full_ranks:
+                    rank_i, rank_j = full_ranks[i], full_ranks[j]
+                else:
+                    both = present[:, i] & present[:, j]
+                    rank_i, rank_j = average_ranks(values[both, i]), average_ranks(values[both, j])
+                n[i, j] = n[j, i] = len(rank_i)
+                if len(rank_i) > 1 and rank_i.std() > 0 and rank_j.std() > 0:
+                    matrix[i, j] = matrix[j, i] = float(np.corrcoef(rank_i, rank_j)[0, 1])
+        return {"matrix": _matrix_to_list(matrix), "n": n.tolist(), "sample_size": len(values)}
+
+    def contingency(self, include_tables: bool = False) -> List[Dict[str, Any]]:
+        self.flush()
+        pairs = []
+        for i, j in self.tables:
+            if self.overflowed[i] or self.overflowed[j]:
+                continue
+            observed = self._table(i, j)
+            pair = {"columns": [self.categorical_columns[i], self.categorical_columns[j]]}
+            pair.update(cramers_v(observed))
+            if include_tables:
+                pair["table"] = {
+                    "rows": list(self.categories[i]),
+                    "columns": list(self.categories[j]),
+                    "counts": observed.tolist()
+                }
+            pairs.append(pair)
+        pairs.sort(key=lambda pair: -(pair["cramers_v"] or 0.0))
+        return pairs
+
+def cramers_v(observed: np.ndarray) -> Dict[str, Any]:
+    """Chi-squared statistic and Cramer's V of a contingency table"""
+    observed = observed[observed.sum(axis=1) > 0][:, observed.sum(axis=0) > 0]
+    n = int(observed.sum())
+    rows, cols = observed.shape if observed.size else (0, 0)
+    if n == 0 or min(rows, cols) < 2:
+        return {"cramers_v": None, "chi_squared": None, "dof": 0, "n": n}
+
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / n
+    chi_squared = float(((observed - expected) ** 2 / expected).sum())
+    return {
+        "cramers_v": math.sqrt(chi_squared / n / (min(rows, cols) - 1)),
+        "chi_squared": chi_squared,
+        "dof": (rows - 1) * (cols - 1),
+        "n": n
+    }
+
+def _matrix_to_list(matrix: np.ndarray) -> List[List[Optional[float]]]:
+    return [[None if math.isnan(value) else float(value) for value in row] for row in matrix]
+
+def correlate_byte_range(file_path: str, start: int, end: int, numeric_columns: List[str],
+                         categorical_columns: List[str], shifts: List[float], max_categories: int,
+                         sample_size: int) -> CorrelationAccumulator:
+    """Worker entry point: accumulate one byte range of an uncompressed file"""
+    accumulator = CorrelationAccumulator(numeric_columns, categorical_columns, shifts, max_categories, sample_size)
+    for _, record in JSONLStreamer(Path(file_path)).stream_byte_range(start, end):
+        accumulator.add_record(record)
+    accumulator.flush()
+    return accumulator
+
+def accumulate_correlations(file_path: str, numeric_columns: List[str], categorical_columns: List[str],
+                            shifts: List[float], max_categories: int, sample_size: int, workers: int,
+                            min_shard_bytes: int, total_records: int = 0,
+                            progress_callback: Optional[Callable[[float], None]] = None) -> CorrelationAccumulator:
+    """Accumulate cross-column statistics in one pass, sharding uncompressed files by byte range"""
+    streamer = JSONLStreamer(Path(file_path))
+    file_size = streamer.file_path.stat().st_size
+    num_shards = max(1, min(workers, file_size // max(1, min_shard_bytes)))
+    ranges = streamer.split_byte_ranges(num_shards)
+
+    if len(ranges) == 1:
+        accumulator = CorrelationAccumulator(numeric_columns, categorical_columns, shifts, max_categories,
+                                             sample_size)
+        for record in streamer.stream_records():
+            accumulator.add_record(record)
+            if progress_callback and total_records and accumulator.total_count % 10000 == 0:
+                progress_callback(min(1.0, accumulator.total_count / total_records))
+        accumulator.flush()
+        return accumulator
+
+    results: List[Optional[CorrelationAccumulator]] = [None] * len(ranges)
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = {
+            executor.submit(correlate_byte_range, str(file_path), start, end, numeric_columns,
+                            categorical_columns, shifts, max_categories, sample_size): shard
+            for shard, (start, end) in enumerate(ranges)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(done / len(ranges))
+
+    accumulator = results[0]
+    for partial in results[1:]:
+        accumulator.merge(partial)
+    return accumulator
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import math
+from array import array
+from typing import Any, Callable, Dict, Iterable, List
+import numpy as np
+
+def canonical_json(record: Any) -> bytes:
+    """Key-order independent JSON encoding of a record"""
+    return json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+def record_digest(record: Any) -> bytes:
+    """128-bit BLAKE2b digest of a record's canonical JSON"""
+    return hashlib.blake2b(canonical_json(record), digest_size=16).digest()
+
+class BloomFilter:
+    """Bit-array Bloom filter with double hashing, checked and updated in vectorized batches"""
+
+    MAX_HASHES = 16
+
+    def __init__(self, num_bits: int, num_hashes: int):
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = max(1, min(self.MAX_HASHES, num_hashes))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+
+    @classmethod
+    def from_budget(cls, budget_bytes: int, expected_items: int) -> 'BloomFilter':
+        """Largest filter within budget, with the hash count that minimizes false positives"""
+        num_bits = budget_bytes * 8
+        num_hashes = round(num_bits / max(1, expected_items) * math.log(2))
+        return cls(num_bits, num_hashes)
+
+    def false_positive_rate(self, items: int) -> float:
+        return (1 - math.exp(-self.num_hashes * items / self.num_bits)) ** self.num_hashes
+
+    def check_and_add(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """Return which items were possibly present before this batch, then add them all"""
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            positions = (h1[:, None] + steps[None, :] * (h2[:, None] | np.uint64(1))) % np.uint64(self.num_bits)
+        byte_index = (positions >> np.uint64(3)).astype(np.int64)
+        masks = (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+        present = np.all(self.bits[byte_index] & masks, axis=1)
+        np.bitwise_or.at(self.bits, byte_index.ravel(), masks.ravel())
+        return present
+
+class DuplicateDetector:
+    """Duplicate record detection over fixed-size hashes of canonical JSON.
+
+    In exact mode every record costs hash_bits / 8 bytes and duplicates are
+    grouped by sorting the hashes. With a memory budget too small for that,
+    a Bloom filter flags records that may repeat an earlier one and a second
+    pass groups only those candidates, so groups stay exact (up to hash
+    collisions) while memory is bounded by the budget plus the candidates.
+    """
+
+    BATCH_SIZE = 65536
+    MAX_GROUP_ROWS = 100
+
+    def __init__(self, hash_bits: int = 64, memory_budget: int = 0, expected_records: int = 0):
+        if hash_bits not in (64, 128):
+            raise ValueError("hash_bits must be 64 or 128")
+        self.hash_bits = hash_bits
+        self.row_count = 0
+        self.low = array('Q')
+        self.high = array('Q')
+
+        # Sorting needs the hashes plus an 8-byte permutation index per record
+        exact_bytes = expected_records * (hash_bits // 8 + 8)
+        if memory_budget and exact_bytes > memory_budget:
+            self.mode = 'bloom'
+            self.bloom = BloomFilter.from_budget(memory_budget, expected_records)
+            self.candidates = set()
+        else:
+            self.mode = 'exact'
+            self.bloom = None
+            self.candidates = None
+
+    def _key(self, digest: bytes) -> bytes:
+        return digest[:self.hash_bits // 8]
+
+    def add(self, record: Any):
+        digest = record_digest(record)
+        self.low.append(int.from_bytes(digest[:8], 'little'))
+        if self.hash_bits == 128 or self.mode == 'bloom':
+            self.high.append(int.from_bytes(digest[8:], 'little'))
+        self.row_count += 1
+        if self.mode == 'bloom' and len(self.low) >= self.BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        """Bloom mode: move possibly-repeated hashes of the buffered batch into the candidate set"""
+        if not self.low:
+            return
+        low = np.frombuffer(self.low, dtype=np.uint64)
+        high = np.frombuffer(self.high, dtype=np.uint64)
+        present = self.bloom.check_and_add(low, high)
+
+        # Repeats within the batch are not visible to the filter yet
+        keys = low if self.hash_bits == 64 else np.stack([low, high], axis=1).view(np.dtype((np.void, 16))).ravel()
+        _, first_index = np.unique(keys, return_index=True)
+        repeated_in_batch = np.ones(len(low), dtype=bool)
+        repeated_in_batch[first_index] = False
+
+        for index in np.flatnonzero(present | repeated_in_batch):
+            digest = int(low[index]).to_bytes(8, 'little') + int(high[index]).to_bytes(8, 'little')
+            self.candidates.add(self._key(digest))
+
+        self.low = array('Q')
+        self.high = array('Q')
+
+    def result(self, rescan: Callable[[], Iterable[Any]], max_groups: int = 100) -> Dict[str, Any]:
+        """Duplicate summary with the largest groups of row ids; rescan replays the records
+        in the same order (only used in Bloom mode)"""
+        groups = self._exact_groups() if self.mode == 'exact' else self._candidate_groups(rescan)
+        groups.sort(key=lambda rows: (-len(rows), rows[0]))
+
+        result = {
+            "mode": self.mode,
+            "hash_bits": self.hash_bits,
+            "duplicate_count": sum(len(rows) - 1 for rows in groups),
+            "duplicate_group_count": len(groups),
+            "duplicate_groups": [
+                {"count": len(rows), "row_ids": rows[:self.MAX_GROUP_ROWS]}
+                for rows in groups[:max_groups]
+            ]
+        }
+        if self.mode == 'bloom':
+            result["bloom_false_positive_rate"] = self.bloom.false_positive_rate(self.row_count)
+        return result
+
+    def _exact_groups(self) -> List[List[int]]:
+        low = np.frombuffer(self.low, dtype=np.uint64)
+        if not len(low):
+            return []
+        if self.hash_bits == 64:
+            order = np.argsort(low, kind='stable')
+            sorted_low = low[order]
+            changes = sorted_low[1:] != sorted_low[:-1]
+        else:
+            high = np.frombuffer(self.high, dtype=np.uint64)
+            order = np.lexsort((high, low))  # Stable, so rows stay ascending within a group
+            sorted_low, sorted_high = low[order], high[order]
+            changes = (sorted_low[1:] != sorted_low[:-1]) | (sorted_high[1:] != sorted_high[:-1])
+
+        starts = np.flatnonzero(np.concatenate(([True], changes)))
+        ends = np.append(starts[1:], len(order))
+        repeated = (ends - starts) > 1
+        return [order[start:end].tolist() for start, end in zip(starts[repeated], ends[repeated])]
+
+    def _candidate_groups(self, rescan: Callable[[], Iterable[Any]]) -> List[List[int]]:
+        self._flush()
+        if not self.candidates:
+            return []
+        rows_by_key: Dict[bytes, List[int]] = {}
+        for row, record in enumerate(rescan()):
+            key = self._key(record_digest(record))
+            if key in self.candidates:
+                rows_by_key.setdefault(key, []).append(row)
+        return [rows for rows in rows_by_key.values() if len(rows) > 1]
@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from .sketches import HyperLogLog, RunningStats, SpaceSaving
+
+MAX_SHEET_ROWS = 1048576  # Excel's row limit per sheet, header row included
+MAX_CELL_CHARS = 32767  # Excel's text limit per cell
+
+STATS_HEADER = ['Column', 'Type', 'Count', 'Mean', 'Std', 'Min', 'Max', 'Unique', 'Most_Common']
+
+def cell_value(value: Any) -> Any:
+    """Excel-safe form of a JSON value: objects and arrays as JSON text, text cleaned and clipped"""
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)[:MAX_CELL_CHARS]
+    return value
+
+class ColumnSummary:
+    """Constant-memory statistics of one exported column for the statistics sheet.
+
+    A column is numeric when every non-null value is a number, matching how
+    pandas infers numeric dtypes. Distinct counts come from a HyperLogLog and
+    the most common value from a Space-Saving summary.
+    """
+
+    TOP_CAPACITY = 100
+
+    def __init__(self):
+        self.count = 0
+        self.numeric = True
+        self.numbers = RunningStats()
+        self.distinct = HyperLogLog(precision=12)
+        self.values = SpaceSaving(self.TOP_CAPACITY)
+
+    def add(self, value: Any):
+        if value is None:
+            return
+        self.count += 1
+        if self.numeric and isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.numbers.add(value)
+        else:
+            self.numeric = False
+        self.distinct.add(value)
+        self.values.add(value)
+
+    def row(self, column: str) -> List[Any]:
+        if self.numeric and self.count:
+            return [column, 'Numeric', self.count, self.numbers.mean, self.numbers.std_dev if self.count > 1 else None,
+                    self.numbers.min, self.numbers.max, None, None]
+        most_common = self.values.most_common(1, guaranteed=True)
+        return [column, 'Text', self.count, None, None, None, None, self.distinct.estimate(),
+                most_common[0][0] if most_common else None]
+
+def write_excel(records: Iterable[Dict[str, Any]], columns: List[str], include_stats: bool = False,
+                spill_dir: Optional[str] = None, chunk_bytes: int = 1024 * 1024) -> Iterator[bytes]:
+    """Write records to an .xlsx workbook in write-only mode and yield the file in chunks.
+
+    Rows are appended as they arrive, starting a new sheet ("Data 2", ...)
+    each time Excel's row limit is reached. The workbook is spilled to a
+    temporary file in spill_dir, so memory stays bounded for full-dataset
+    exports. The first chunk is only yielded after workbook.save(), so a
+    caller pulling it waits for every record to be read and written.
+    """
+    summaries = [ColumnSummary() for _ in columns] if include_stats else []
+    fd, path = tempfile.mkstemp(suffix='.xlsx', dir=spill_dir)
+    os.close(fd)
+    try:
+        workbook = Workbook(write_only=True)
+        sheet = None
+        sheet_rows = MAX_SHEET_ROWS
+        sheet_count = 0
+        for record in records:
+            if sheet_rows >= MAX_SHEET_ROWS:
+                sheet_count += 1
+                sheet = workbook.create_sheet('Data' if sheet_count == 1 else f'Data {sheet_count}')
+                sheet.append(columns)
+                sheet_rows = 1
+            if not isinstance(record, dict):
+                record = {}
+            row = [cell_value(record.get(column)) for column in columns]
+            sheet.append(row)
+            sheet_rows += 1
+            for summary, value in zip(summaries, row):
+                summary.add(value)
+        if sheet is None:
+            workbook.create_sheet('Data').append(columns)
+
+        if summaries:
+            stats_sheet = workbook.create_sheet('Statistics')
+            stats_sheet.append(STATS_HEADER)
+            for column, summary in zip(columns, summaries):
+                stats_sheet.append(summary.row(column))
+
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
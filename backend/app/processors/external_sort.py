@@ -0,0 +1,60 @@
+import heapq
+import json
+import tempfile
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+MAX_MERGE_RUNS = 256  # Runs merged at once (bounds open files and merge heap size)
+
+def _write_run(records: List[Dict[str, Any]], spill_dir: Optional[str]) -> IO[bytes]:
+    run = tempfile.TemporaryFile(dir=spill_dir)
+    for record in records:
+        run.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+    run.seek(0)
+    return run
+
+def _read_run(run: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    for line in run:
+        yield json.loads(line)
+
+def _merge_runs(runs: List[IO[bytes]], key: Callable[[Any], Any],
+                spill_dir: Optional[str]) -> IO[bytes]:
+    merged = tempfile.TemporaryFile(dir=spill_dir)
+    for record in heapq.merge(*[_read_run(run) for run in runs], key=key):
+        merged.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+    for run in runs:
+        run.close()
+    merged.seek(0)
+    return merged
+
+def external_sort(records: Iterable[Dict[str, Any]], key: Callable[[Any], Any], run_records: int,
+                  spill_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stable sort of a record stream holding at most run_records records in memory.
+
+    Sorted runs are spilled to anonymous temporary files as JSON lines and
+    k-way merged; inputs that fit in one run never touch the disk.
+    """
+    run: List[Dict[str, Any]] = []
+    runs: List[IO[bytes]] = []
+    try:
+        for record in records:
+            run.append(record)
+            if len(run) >= run_records:
+                run.sort(key=key)
+                runs.append(_write_run(run, spill_dir))
+                run = []
+
+        run.sort(key=key)
+        if not runs:
+            yield from run
+            return
+        if run:
+            runs.append(_write_run(run, spill_dir))
+            run = []
+
+        # Merging consecutive runs into the first one's place keeps the sort stable
+        while len(runs) > MAX_MERGE_RUNS:
+            runs[:MAX_MERGE_RUNS] = [_merge_runs(runs[:MAX_MERGE_RUNS], key, spill_dir)]
+        yield from heapq.merge(*[_read_run(run_file) for run_file in runs], key=key)
+    finally:
+        for run_file in runs:
+            run_file.close()
@@ -0,0 +1,135 @@
+import heapq
+import re
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .jsonl_streamer import JSONLStreamer
+
+# A segment is a list of (column, token, sorted row indexes) sorted by (column, token)
+Segment = List[Tuple[str, str, List[int]]]
+
+_TOKEN_RE = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    """Tokenize text for search indexing"""
+    # Simple tokenization - split on non-alphanumeric
+    tokens = _TOKEN_RE.findall(text.lower())
+    return [token for token in tokens if len(token) >= 2]  # Ignore single chars
+
+def _build_segment(records: Iterator[Tuple[Optional[int], Dict[str, Any]]]) -> Tuple[int, Segment, array, array]:
+    """Index (byte offset, record) pairs with shard-local row numbers.
+    
+    Also returns per-row byte offsets and token counts (used for BM25 length normalization).
+    """
+    index: Dict[str, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(list))
+    offsets = array('q')
+    lengths = array('I')
+    row_count = 0
+    
+    for row_idx, (offset, record) in enumerate(records):
+        row_count += 1
+        if offset is not None:
+            offsets.append(offset)
+        row_length = 0
+        for column, value in record.items():
+            if value is None:
+                continue
+            column_index = index[column]
+            tokens = tokenize(str(value))
+            row_length += len(tokens)
+            for token in tokens:
+                postings = column_index[token]
+                if not postings or postings[-1] != row_idx:
+                    postings.append(row_idx)
+        lengths.append(min(row_length, 0xFFFFFFFF))
+    
+    segment = [
+        (column, token, postings)
+        for column, column_index in index.items()
+        for token, postings in column_index.items()
+    ]
+    segment.sort(key=lambda entry: (entry[0], entry[1]))
+    return row_count, segment, offsets, lengths
+
+def index_byte_range(file_path: str, start: int, end: int) -> Tuple[int, Segment, array, array]:
+    """Worker entry point: build a sorted partial segment for one byte range"""
+    return _build_segment(JSONLStreamer(Path(file_path)).stream_byte_range(start, end))
+
+def merge_segments(segments: List[Segment], row_offsets: List[int]) -> Dict[str, Dict[str, List[int]]]:
+    """K-way merge of sorted segments into a combined index with global row numbers"""
+    def shifted(shard: int, segment: Segment):
+        offset = row_offsets[shard]
+        for column, token, postings in segment:
+            yield column, token, shard, [row + offset for row in postings] if offset else postings
+    
+    index: Dict[str, Dict[str, List[int]]] = {}
+    merged = heapq.merge(*(shifted(i, seg) for i, seg in enumerate(segments)))
+    
+    current_key = None
+    current_postings: List[int] = []
+    for column, token, _, postings in merged:
+        if (column, token) != current_key:
+            if current_key is not None:
+                index.setdefault(current_key[0], {})[current_key[1]] = current_postings
+            current_key = (column, token)
+            current_postings = list(postings)
+        else:
+            # Shards are merged in file order so postings stay sorted
+            current_postings.extend(postings)
+    
+    if current_key is not None:
+        index.setdefault(current_key[0], {})[current_key[1]] = current_postings
+    
+    return index
+
+def build_index(file_path: str, workers: int, min_shard_bytes: int,
+                progress_callback: Optional[Callable[[float], None]] = None
+                ) -> Tuple[Dict[str, Dict[str, List[int]]], Optional[array], array]:
+    """Build a token index, per-row byte offsets (None for compressed files) and per-row token counts.
+    
+    Uncompressed files are sharded by byte range across worker processes.
+    """
+    streamer = JSONLStreamer(Path(file_path))
+    file_size = streamer.file_path.stat().st_size
+    num_shards = max(1, min(workers, file_size // max(1, min_shard_bytes)))
+    ranges = streamer.split_byte_ranges(num_shards)
+    
+    if len(ranges) == 1:
+        # Not worth a process pool (small or compressed file)
+        if streamer.is_compressed:
+            records = ((None, record) for record in streamer.stream_records())
+        else:
+            records = streamer.stream_byte_range(0, file_size)
+        _, segment, offsets, lengths = _build_segment(records)
+        if progress_callback:
+            progress_callback(90)
+        return merge_segments([segment], [0]), None if streamer.is_compressed else offsets, lengths
+    
+    results: List[Optional[Tuple[int, Segment, array, array]]] = [None] * len(ranges)
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = {
+            executor.submit(index_byte_range, str(file_path), start, end): shard
+            for shard, (start, end) in enumerate(ranges)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback((done / len(ranges)) * 80)
+    
+    # Row numbers of a shard start after all records of the preceding shards
+    row_offsets = []
+    total = 0
+    offsets = array('q')
+    lengths = array('I')
+    for row_count, _, shard_offsets, shard_lengths in results:
+        row_offsets.append(total)
+        total += row_count
+        offsets.extend(shard_offsets)
+        lengths.extend(shard_lengths)
+    
+    index = merge_segments([segment for _, segment, _, _ in results], row_offsets)
+    if progress_callback:
+        progress_callback(90)
+    return index, offsets, lengths
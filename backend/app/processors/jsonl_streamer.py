@@ -1,7 +1,7 @@
 import json
 import ijson
 from pathlib import Path
-from typing import Iterator, Dict, Any, List, Optional
+from typing import Iterator, Dict, Any, List, Optional, Tuple
 import gzip
 import bz2
 from ..core.config import settings
@@ -21,6 +21,35 @@ class JSONLStreamer:
             return 'bz2'
         return None
     
+    def open_binary(self):
+        """Open file for raw line access, decompressing if needed"""
+        if self.is_compressed == 'gzip':
+            return gzip.open(self.file_path, 'rb')
+        elif self.is_compressed == 'bz2':
+            return bz2.open(self.file_path, 'rb')
+        else:
+            return open(self.file_path, 'rb')
+    
+    def iter_lines_with_position(self) -> Iterator[Tuple[bytes, int]]:
+        """Yield raw lines with the position read so far in the (possibly compressed) file"""
+        with open(self.file_path, 'rb') as raw:
+            if self.is_compressed == 'gzip':
+                f = gzip.GzipFile(fileobj=raw)
+            elif self.is_compressed == 'bz2':
+                f = bz2.BZ2File(raw)
+            else:
+                f = raw
+            
+            with f:
+                if f is raw:
+                    position = 0
+                    for line in f:
+                        position += len(line)
+                        yield line, position
+                else:
+                    for line in f:
+                        yield line, raw.tell()
+    
     def _open_file(self, mode='r'):
         """Open file with appropriate compression handler"""
         if self.is_compressed == 'gzip':
@@ -59,6 +88,68 @@ class JSONLStreamer:
                 
                 record_index += 1
     
+    def split_byte_ranges(self, num_ranges: int) -> List[Tuple[int, int]]:
+        """Split an uncompressed file into newline-aligned byte ranges"""
+        file_size = self.file_path.stat().st_size
+        if self.is_compressed or num_ranges <= 1 or file_size == 0:
+            return [(0, file_size)]
+        
+        boundaries = [0]
+        with open(self.file_path, 'rb') as f:
+            for i in range(1, num_ranges):
+                target = max(boundaries[-1], (file_size * i) // num_ranges)
+                f.seek(target)
+                if target > 0:
+                    f.readline()  # Resync to the start of the next line
+                position = f.tell()
+                if position >= file_size:
+                    break
+                if position > boundaries[-1]:
+                    boundaries.append(position)
+        boundaries.append(file_size)
+        
+        return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+    
+    def stream_byte_range(self, start: int, end: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Stream (byte offset, record) for lines starting within [start, end) of an uncompressed file"""
+        if self.is_compressed:
+            raise ValueError("Byte range access is not supported for compressed files")
+        
+        with open(self.file_path, 'rb') as f:
+            f.seek(start)
+            position = start
+            for line in f:
+                if position >= end:
+                    break
+                offset = position
+                position += len(line)
+                
+                line = line.strip()
+                if not line:
+                    continue
+                
+                try:
+                    yield offset, json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+    
+    def read_records_at(self, offsets: List[int]) -> List[Optional[Dict[str, Any]]]:
+        """Random access: read the records starting at the given byte offsets (uncompressed files)"""
+        if self.is_compressed:
+            raise ValueError("Random access is not supported for compressed files")
+        
+        records: List[Optional[Dict[str, Any]]] = [None] * len(offsets)
+        with open(self.file_path, 'rb') as f:
+            # Seek in file order, then return in the requested order
+            for position in sorted(range(len(offsets)), key=lambda i: offsets[i]):
+                f.seek(offsets[position])
+                try:
+                    records[position] = json.loads(f.readline())
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+        
+        return records
+    
     def count_records(self) -> int:
         """Count total records in file"""
         count = 0
@@ -0,0 +1,245 @@
+import json
+import re
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+from .jsonl_streamer import JSONLStreamer
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+_WORD_PIECE_RE = re.compile(r'[A-Za-z0-9_]{2,}')
+
+# Pieces of "None": str() renders nested nulls that way while the raw JSON line has "null"
+PREFILTER_STOP_WORDS = frozenset({'n', 'o', 'e', 'no', 'on', 'ne', 'non', 'one', 'none'})
+
+def prefilter_safe(piece: str) -> bool:
+    """Whether a lowercase piece of str(value) must also appear in the record's raw JSON line.
+
+    JSON writes ASCII letters verbatim, but numbers may be re-formatted by
+    float parsing and nested nulls are rendered as None.
+    """
+    return piece.isascii() and any(c.isalpha() for c in piece) and piece not in PREFILTER_STOP_WORDS
+
+def _collect_runs(parsed, runs: List[str]):
+    """Collect literal runs that every match of the parsed pattern must contain"""
+    current: List[str] = []
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(av))
+            continue
+
+        if current:
+            runs.append(''.join(current))
+            current = []
+
+        if op is sre_parse.SUBPATTERN:
+            _collect_runs(av[-1], runs)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            _collect_runs(av[2], runs)
+        # Branches, classes and optional repeats contribute no required literal
+
+    if current:
+        runs.append(''.join(current))
+
+def required_literals(pattern: str, max_literals: int = 4) -> List[bytes]:
+    """Extract lowercase ASCII literals that must appear in any line matching pattern.
+
+    Only alphanumeric pieces passing prefilter_safe are kept, so a raw-bytes
+    check on the line can never reject a record whose value matches.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return []
+
+    runs: List[str] = []
+    _collect_runs(parsed, runs)
+
+    literals = set()
+    for run in runs:
+        for piece in _WORD_PIECE_RE.findall(run):
+            piece = piece.lower()
+            if prefilter_safe(piece):
+                literals.add(piece.encode('ascii'))
+
+    # Longest literals are the most selective
+    return sorted(literals, key=len, reverse=True)[:max_literals]
+
+def is_record(line: bytes) -> bool:
+    """Whether a line counts as a row: it decodes as JSON, as for the search index and stream_records"""
+    try:
+        json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return False
+    return True
+
+def _may_match(line: bytes, literals: Sequence[bytes]) -> bool:
+    lowered = line.lower()
+    return all(literal in lowered for literal in literals)
+
+def _scan_lines(lines: Iterable[Tuple[Optional[int], bytes]], pattern: str, column: str,
+                literals: Sequence[bytes], limit: int,
+                row_offsets: Optional[Sequence[int]] = None) -> Tuple[int, List[int]]:
+    """Scan (byte offset, raw line) pairs, returning (records seen, local matching row numbers).
+
+    Rows are numbered like the search index, counting only lines that decode
+    as JSON. Given the index's byte offset of each local row, a line's row is
+    looked up by its offset, so lines rejected by the literal prefilter are
+    never decoded; without them such lines are decoded just to be counted.
+    """
+    regex = re.compile(pattern, re.IGNORECASE)
+    row_count = 0
+    matches: List[int] = []
+
+    for offset, line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        if row_offsets is not None:
+            if len(matches) >= limit:
+                break  # The row count is known from the offsets
+            # Lines the index skipped as invalid JSON have no offset of their own
+            while row_count < len(row_offsets) and row_offsets[row_count] < offset:
+                row_count += 1
+            if row_count == len(row_offsets) or row_offsets[row_count] != offset:
+                continue
+            if not _may_match(line, literals):
+                continue
+        elif len(matches) >= limit or not _may_match(line, literals):
+            # Only the record count matters for rows after the limit or rejected by the prefilter
+            row_count += is_record(line)
+            continue
+
+        try:
+            record = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+
+        row = row_count
+        if row_offsets is None:
+            row_count += 1
+
+        value = record.get(column) if isinstance(record, dict) else None
+        if value is not None and regex.search(str(value)):
+            matches.append(row)
+
+    return (len(row_offsets) if row_offsets is not None else row_count), matches
+
+def _iter_byte_range(file_path: str, start: int, end: int) -> Iterable[Tuple[int, bytes]]:
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            yield position, line
+            position += len(line)
+
+def scan_byte_range(file_path: str, start: int, end: int, pattern: str, column: str,
+                    literals: Sequence[bytes], limit: int,
+                    row_offsets: Optional[Sequence[int]] = None) -> Tuple[int, List[int]]:
+    """Worker entry point: regex scan of one byte range, given the offsets of its rows if indexed"""
+    return _scan_lines(_iter_byte_range(file_path, start, end), pattern, column, literals, limit, row_offsets)
+
+def scan_offsets(file_path: str, rows: Sequence[int], offsets: Sequence[int], pattern: str,
+                 column: str, literals: Sequence[bytes], limit: int) -> List[int]:
+    """Worker entry point: regex check of candidate rows read by byte offset"""
+    regex = re.compile(pattern, re.IGNORECASE)
+    matches: List[int] = []
+
+    with open(file_path, 'rb') as f:
+        for row, offset in zip(rows, offsets):
+            if len(matches) >= limit:
+                break
+            f.seek(offset)
+            line = f.readline()
+            if not _may_match(line, literals):
+                continue
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            value = record.get(column) if isinstance(record, dict) else None
+            if value is not None and regex.search(str(value)):
+                matches.append(row)
+
+    return matches
+
+def regex_scan(file_path: str, pattern: str, column: str, limit: int, workers: int,
+               min_shard_bytes: int, row_offsets: Optional[Sequence[int]] = None) -> List[int]:
+    """Literal-prefiltered regex scan, sharded by byte range across processes.
+
+    row_offsets, the search index's byte offset per row, lets shards number
+    their rows without decoding the lines the prefilter rejects.
+    """
+    streamer = JSONLStreamer(Path(file_path))
+    literals = required_literals(pattern)
+
+    if streamer.is_compressed:
+        with streamer.open_binary() as f:
+            return _scan_lines(((None, line) for line in f), pattern, column, literals, limit)[1]
+
+    file_size = streamer.file_path.stat().st_size
+    num_shards = max(1, min(workers, file_size // max(1, min_shard_bytes)))
+    ranges = streamer.split_byte_ranges(num_shards)
+
+    def shard_offsets(start: int, end: int) -> Optional[Sequence[int]]:
+        if row_offsets is None:
+            return None
+        return row_offsets[bisect_left(row_offsets, start):bisect_left(row_offsets, end)]
+
+    if len(ranges) == 1:
+        return scan_byte_range(str(file_path), 0, file_size, pattern, column, literals, limit,
+                               shard_offsets(0, file_size))[1]
+
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [
+            executor.submit(scan_byte_range, str(file_path), start, end, pattern, column, literals, limit,
+                            shard_offsets(start, end))
+            for start, end in ranges
+        ]
+        results = [future.result() for future in futures]
+
+    matching_rows: List[int] = []
+    row_offset = 0
+    for row_count, matches in results:
+        matching_rows.extend(row + row_offset for row in matches)
+        if len(matching_rows) >= limit:
+            break
+        row_offset += row_count
+
+    return matching_rows[:limit]
+
+def regex_scan_candidates(file_path: str, pattern: str, column: str, candidates: List[int],
+                          row_offsets: Sequence[int], limit: int, workers: int,
+                          min_shard_rows: int = 10000) -> List[int]:
+    """Regex check restricted to index candidate rows, seeking by byte offset"""
+    literals = required_literals(pattern)
+    offsets = [row_offsets[row] for row in candidates]
+
+    num_shards = max(1, min(workers, len(candidates) // min_shard_rows))
+    if num_shards == 1:
+        return scan_offsets(str(file_path), candidates, offsets, pattern, column, literals, limit)
+
+    shard_size = -(-len(candidates) // num_shards)
+    with ProcessPoolExecutor(max_workers=num_shards) as executor:
+        futures = [
+            executor.submit(
+                scan_offsets, str(file_path),
+                candidates[i:i + shard_size], offsets[i:i + shard_size],
+                pattern, column, literals, limit
+            )
+            for i in range(0, len(candidates), shard_size)
+        ]
+        matching_rows: List[int] = []
+        for future in futures:
+            matching_rows.extend(future.result())
+            if len(matching_rows) >= limit:
+                break
+
+    return matching_rows[:limit]
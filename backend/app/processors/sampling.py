@@ -0,0 +1,313 @@
+import bz2
+import gzip
+import json
+import math
+import random
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .jsonl_streamer import JSONLStreamer
+
+Z_95 = 1.959963984540054
+_SEEK_BACK_CHUNK = 4096
+EXACT_COUNT_BYTES = 1024 * 1024  # Files up to this size are counted rather than estimated
+DECOMPRESSION_PROBE_BYTES = 4 * 1024 * 1024
+
+class RecordSample:
+    """Records drawn with replacement at uniform random byte offsets.
+
+    A random offset lands in a line with probability proportional to the line's
+    length, so each record carries an inverse-length weight; weighted estimates
+    are then unbiased for the per-record population.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], positions: List[int], weights: List[float], method: str,
+                 total_records: Optional[float], total_records_ci: Optional[Tuple[float, float]]):
+        self.records = records
+        self.positions = positions  # Line start offset (row number for prefix samples) per record
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.method = method
+        self.total_records = total_records
+        self.total_records_ci = total_records_ci
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def effective_size(self) -> float:
+        """Kish effective sample size of the weighted sample"""
+        return effective_sample_size(self.weights)
+
+def _line_at(f, offset: int) -> Tuple[int, bytes]:
+    """Return (start offset, full line) for the line containing the byte at offset"""
+    start = offset
+    while start > 0:
+        chunk_start = max(0, start - _SEEK_BACK_CHUNK)
+        f.seek(chunk_start)
+        newline = f.read(start - chunk_start).rfind(b'\n')
+        if newline >= 0:
+            start = chunk_start + newline + 1
+            break
+        start = chunk_start
+    f.seek(start)
+    return start, f.readline()
+
+def _read_lines(f, offset: int, num_lines: int) -> Tuple[int, List[bytes]]:
+    """Resync to the line containing the byte at offset and read num_lines lines from it,
+    returning (start offset of the first line, lines)"""
+    start, line = _line_at(f, offset)
+    lines = [line]
+    while len(lines) < num_lines:
+        line = f.readline()
+        if not line:
+            break
+        lines.append(line)
+    return start, lines
+
+def _decode_records(lines: Sequence[bytes]) -> List[Dict[str, Any]]:
+    return [record for record in map(_decode, lines) if record is not None]
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return record if isinstance(record, dict) else None
+
+def sample_records(file_path: str, sample_size: int, seed: Optional[int] = None) -> RecordSample:
+    """Draw a uniform random sample of records by seeking to random byte offsets.
+
+    Compressed files cannot be seeked, so they fall back to the first
+    sample_size records and leave the record total to the caller.
+    """
+    streamer = JSONLStreamer(Path(file_path))
+
+    if streamer.is_compressed:
+        records = [record for record in streamer.stream_records(limit=sample_size) if isinstance(record, dict)]
+        return RecordSample(records, list(range(len(records))), [1.0] * len(records), 'prefix', None, None)
+
+    file_size = streamer.file_path.stat().st_size
+    if file_size == 0 or sample_size <= 0:
+        return RecordSample([], [], [], 'offset', 0.0, (0.0, 0.0))
+
+    rng = random.Random(seed)
+    offsets = sorted(rng.randrange(file_size) for _ in range(sample_size))
+
+    records: List[Dict[str, Any]] = []
+    positions: List[int] = []
+    weights: List[float] = []
+    # Horvitz-Thompson terms: file_size / line length for records, 0 otherwise
+    count_terms = np.zeros(len(offsets), dtype=np.float64)
+
+    with open(streamer.file_path, 'rb') as f:
+        for i, offset in enumerate(offsets):
+            start, (line,) = _read_lines(f, offset, 1)
+            record = _decode(line)
+            if record is None:
+                continue
+            records.append(record)
+            positions.append(start)
+            weights.append(1.0 / len(line))
+            count_terms[i] = file_size / len(line)
+
+    total = float(count_terms.mean())
+    margin = Z_95 * float(count_terms.std(ddof=1)) / math.sqrt(len(offsets)) if len(offsets) > 1 else 0.0
+    return RecordSample(records, positions, weights, 'offset', total, (max(0.0, total - margin), total + margin))
+
+class StratifiedSample:
+    """Records read at one random offset per equal-size stratum of the file, with the
+    record total estimated from the line densities observed in each stratum"""
+
+    def __init__(self, records: List[Dict[str, Any]], total_records: float,
+                 total_records_ci: Tuple[float, float], method: str, decompressed_size: Optional[int] = None):
+        self.records = records
+        self.total_records = total_records
+        self.total_records_ci = total_records_ci
+        self.method = method
+        self.decompressed_size = decompressed_size
+
+def _density_at(f, offset: int, num_lines: int, records: List[Dict[str, Any]]) -> Optional[float]:
+    """Records per byte over num_lines lines read from the line after offset; decoded
+    records are appended to records"""
+    # The line holding offset is skipped: it is length-biased and would skew the density
+    _, lines = _read_lines(f, offset, num_lines + 1)
+    lines = lines[1:] if offset > 0 else lines[:num_lines]
+    if not lines:
+        return None
+    records.extend(_decode_records(lines))
+    count = sum(1 for line in lines if line.strip())
+
+    # Less the second-order bias of inverting a small-sample mean length
+    lengths = np.array([len(line) for line in lines], dtype=np.float64)
+    squared_cv = float(lengths.var(ddof=1)) / float(lengths.mean()) ** 2 if len(lengths) > 1 else 0.0
+    return count / float(lengths.sum()) * (1 - squared_cv / len(lengths))
+
+def _exact_sample(lines: List[bytes], sample_size: int,
+                  decompressed_size: Optional[int] = None) -> StratifiedSample:
+    """Sample of a file read whole: the first sample_size lines' records and the exact record count"""
+    total = float(sum(1 for line in lines if line.strip()))
+    return StratifiedSample(_decode_records(lines[:sample_size]), total, (total, total), 'exact', decompressed_size)
+
+def stratified_sample(file_path: str, offsets: int, records_per_offset: int,
+                      seed: Optional[int] = None) -> StratifiedSample:
+    """Sample records across the whole file and estimate how many it holds.
+
+    The file is cut into offsets / 2 equal byte ranges with two random offsets
+    each; every offset is resynced to the next line start and
+    records_per_offset lines are read there. Each stratum's records per byte
+    times its size estimates its record count, and the difference between its
+    two draws gives an unbiased variance for the 95% interval. Small files are
+    counted exactly and compressed files are estimated from their head (see
+    compressed_head_sample).
+    """
+    streamer = JSONLStreamer(Path(file_path))
+    if streamer.is_compressed:
+        return compressed_head_sample(streamer, offsets * records_per_offset)
+
+    file_size = streamer.file_path.stat().st_size
+    if file_size <= EXACT_COUNT_BYTES or offsets <= 0:
+        with open(streamer.file_path, 'rb') as f:
+            return _exact_sample(f.readlines(), max(1, offsets) * records_per_offset)
+
+    rng = random.Random(seed)
+    strata = max(1, offsets // 2)
+    records: List[Dict[str, Any]] = []
+    total = 0.0
+    variance = 0.0
+    with open(streamer.file_path, 'rb') as f:
+        for stratum in range(strata):
+            start = file_size * stratum // strata
+            end = file_size * (stratum + 1) // strata
+            draws = [_density_at(f, start + rng.randrange(end - start), records_per_offset, records)
+                     for _ in range(2)]
+            draws = [density for density in draws if density is not None]
+            if not draws:
+                continue  # Both offsets fell in the file's last line
+            total += (end - start) * sum(draws) / len(draws)
+            if len(draws) == 2:
+                variance += ((end - start) * (draws[0] - draws[1])) ** 2 / 4
+
+    margin = Z_95 * math.sqrt(variance)
+    return StratifiedSample(records, total, (max(0.0, total - margin), total + margin), 'stratified')
+
+def estimate_decompressed_size(streamer: JSONLStreamer,
+                               probe_bytes: int = DECOMPRESSION_PROBE_BYTES) -> Tuple[int, bytes, bool]:
+    """Return (estimated decompressed size, decompressed head, whether the size is exact).
+
+    The head's compression ratio extrapolates to the whole file. For gzip the
+    trailer's ISIZE (the size modulo 2**32, wrapped as often as the
+    extrapolation suggests) is used instead unless it is smaller than the head
+    plus the rest of the compressed bytes, which happens for multi-member files
+    whose trailer only covers the last member.
+    """
+    compressed_size = streamer.file_path.stat().st_size
+    with open(streamer.file_path, 'rb') as raw:
+        f = gzip.GzipFile(fileobj=raw) if streamer.is_compressed == 'gzip' else bz2.BZ2File(raw)
+        with f:
+            head = f.read(probe_bytes)
+            if len(head) < probe_bytes:
+                return len(head), head, True
+            consumed = raw.tell()
+    estimate = compressed_size * len(head) / max(1, consumed)
+
+    if streamer.is_compressed == 'gzip' and compressed_size >= 4:
+        with open(streamer.file_path, 'rb') as raw:
+            raw.seek(-4, 2)
+            isize = int.from_bytes(raw.read(4), 'little')
+        wraps = max(0, round((estimate - isize) / 2 ** 32))
+        candidate = isize + wraps * 2 ** 32
+        if candidate >= len(head) + compressed_size - consumed:
+            return candidate, head, True
+    return int(estimate), head, False
+
+def compressed_head_sample(streamer: JSONLStreamer, sample_size: int) -> StratifiedSample:
+    """Records from the head of a compressed file, with the record total estimated as the
+    decompressed size over the head's mean line length. The interval only reflects the
+    line length spread within the head, so it assumes the head is representative of
+    the rest of the file."""
+    decompressed_size, head, _ = estimate_decompressed_size(streamer)
+    complete = head if len(head) == decompressed_size else head[:head.rfind(b'\n') + 1]
+    lines = complete.splitlines(keepends=True)
+    if len(head) == decompressed_size:
+        return _exact_sample(lines, sample_size, decompressed_size)
+
+    records = _decode_records(lines[:sample_size])
+    if not lines:
+        # Not one complete line in the head: only an upper bound is known
+        bound = decompressed_size / len(head)
+        return StratifiedSample([], bound, (0.0, bound), 'compressed_head', decompressed_size)
+    lengths = np.array([len(line) for line in lines], dtype=np.float64)
+    record_share = sum(1 for line in lines if line.strip()) / len(lines)
+    mean_length = float(lengths.mean())
+    total = decompressed_size / mean_length * record_share
+    relative_error = float(lengths.std(ddof=1)) / mean_length / math.sqrt(len(lengths)) if len(lengths) > 1 else 0.0
+    margin = Z_95 * total * relative_error
+    return StratifiedSample(records, total, (max(0.0, total - margin), total + margin), 'compressed_head',
+                            decompressed_size)
+
+def effective_sample_size(weights: Sequence[float]) -> float:
+    weights = np.asarray(weights, dtype=np.float64)
+    squared = float(np.sum(weights ** 2))
+    return float(np.sum(weights)) ** 2 / squared if squared > 0 else 0.0
+
+def estimate_distinct(sample_values: Sequence[Any], population: int) -> int:
+    """Haas-Stokes (Duj1) distinct-count estimate from a sample of distinct rows:
+    n * d / (n - f1 + f1 * n / N), clamped to [d, N]"""
+    n = len(sample_values)
+    if n == 0 or population <= 0:
+        return 0
+    frequencies = Counter(sample_values)
+    d = len(frequencies)
+    f1 = sum(1 for count in frequencies.values() if count == 1)
+    population = max(population, n)
+    estimate = n * d / (n - f1 + f1 * n / population)
+    return int(round(min(max(estimate, d), population)))
+
+def weighted_proportion(flags: Sequence[bool], weights: Sequence[float]) -> Dict[str, float]:
+    """Weighted share of flagged records with a 95% Wilson interval on the effective size"""
+    flags = np.asarray(flags, dtype=bool)
+    weights = np.asarray(weights, dtype=np.float64)
+    total_weight = float(weights.sum())
+    if total_weight == 0:
+        return {"estimate": 0.0, "ci_low": 0.0, "ci_high": 1.0}
+
+    p = float(weights[flags].sum()) / total_weight
+    n = effective_sample_size(weights)
+    denominator = 1 + Z_95 ** 2 / n
+    center = (p + Z_95 ** 2 / (2 * n)) / denominator
+    margin = Z_95 * math.sqrt(p * (1 - p) / n + Z_95 ** 2 / (4 * n * n)) / denominator
+    return {"estimate": p, "ci_low": max(0.0, center - margin), "ci_high": min(1.0, center + margin)}
+
+def weighted_mean(values: Sequence[float], weights: Sequence[float]) -> Dict[str, float]:
+    """Weighted mean and standard deviation with a 95% normal interval for the mean"""
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    mean = float(np.average(values, weights=weights))
+    std_dev = math.sqrt(float(np.average((values - mean) ** 2, weights=weights)))
+    margin = Z_95 * std_dev / math.sqrt(max(1.0, effective_sample_size(weights)))
+    return {"estimate": mean, "std_dev": std_dev, "ci_low": mean - margin, "ci_high": mean + margin}
+
+def weighted_quantiles(values: Sequence[float], weights: Sequence[float],
+                       quantiles: Sequence[float]) -> List[Dict[str, float]]:
+    """Weighted quantiles with 95% intervals from the binomial spread of the rank"""
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+    cumulative = np.cumsum(weights[order])
+    cumulative /= cumulative[-1]
+    n = max(1.0, effective_sample_size(weights))
+
+    def at_rank(q: float) -> float:
+        index = int(np.searchsorted(cumulative, min(max(q, 0.0), 1.0), side='left'))
+        return float(sorted_values[min(index, len(sorted_values) - 1)])
+
+    results = []
+    for q in quantiles:
+        margin = Z_95 * math.sqrt(q * (1 - q) / n)
+        results.append({"estimate": at_rank(q), "ci_low": at_rank(q - margin), "ci_high": at_rank(q + margin)})
+    return results
@@ -0,0 +1,335 @@
+import hashlib
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .jsonl_streamer import JSONLStreamer
+from .sketches import HyperLogLog
+from .timestamps import TimestampParser
+
+def value_type(value: Any, timestamps: TimestampParser) -> str:
+    """Data type name (a DataType value) of a single JSON value"""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, (list, tuple)):
+        return 'array'
+    if isinstance(value, dict):
+        return 'object'
+    if isinstance(value, str) and len(value) >= 8 and value[0].isdigit() and timestamps.detect(value):
+        return 'date'
+    return 'string'
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+class FieldStats:
+    """Type counts, presence and a distinct-count sketch for one field path"""
+
+    __slots__ = ('top_level', 'present_count', 'null_count', 'type_counts', 'integer_count', 'distinct',
+                 'sample_values')
+
+    def __init__(self, distinct_precision: int, top_level: bool = False):
+        self.top_level = top_level  # A key of the records themselves
+        self.present_count = 0  # Records containing the path at least once
+        self.null_count = 0
+        self.type_counts: Counter = Counter()
+        self.integer_count = 0  # Numbers that are integers within the int64 range
+        self.distinct = HyperLogLog(distinct_precision)
+        self.sample_values: List[str] = []
+
+    def merge(self, other: 'FieldStats', max_samples: int):
+        self.top_level = self.top_level or other.top_level
+        self.present_count += other.present_count
+        self.null_count += other.null_count
+        self.type_counts.update(other.type_counts)
+        self.integer_count += other.integer_count
+        self.distinct.merge(other.distinct)
+        for sample in other.sample_values:
+            if len(self.sample_values) < max_samples and sample not in self.sample_values:
+                self.sample_values.append(sample)
+
+    @property
+    def primary_type(self) -> str:
+        return self.type_counts.most_common(1)[0][0] if self.type_counts else 'null'
+
+# One bit per data type in segment type masks
+TYPE_BITS = {name: 1 << bit for bit, name in enumerate(
+    ['null', 'boolean', 'number', 'string', 'date', 'array', 'object'])}
+NULL_BIT = TYPE_BITS['null']
+
+def type_names(mask: int) -> List[str]:
+    return [name for name, bit in TYPE_BITS.items() if mask & bit]
+
+class SegmentProfile:
+    """Field paths and the types seen for them within one byte segment of the file"""
+
+    __slots__ = ('index', 'record_count', 'types')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.record_count = 0
+        self.types: Dict[str, int] = {}  # path -> TYPE_BITS mask
+
+    def merge(self, other: 'SegmentProfile'):
+        self.record_count += other.record_count
+        for path, mask in other.types.items():
+            self.types[path] = self.types.get(path, 0) | mask
+
+    def schema_hash(self) -> str:
+        signature = '\0'.join(f"{path}:{mask}" for path, mask in sorted(self.types.items()))
+        return hashlib.blake2b(signature.encode('utf-8'), digest_size=8).hexdigest()
+
+class SchemaAccumulator:
+    """Incremental, mergeable schema inference over dotted field paths.
+
+    Nested objects extend the path with `.key` and array elements with `[]`,
+    so `{"a": {"b": [{"c": 1}]}}` yields the paths a, a.b, a.b[] and a.b[].c.
+    Memory is bounded by MAX_PATHS field summaries (further paths are only
+    counted) and time by inspecting at most MAX_ARRAY_ITEMS elements per array
+    and MAX_DEPTH levels of nesting.
+
+    With segment_bytes set, records are also profiled per byte segment (by the
+    offset their line starts at), so partitions that split a segment merge
+    into the same profile and schema drift can be located in the file.
+    """
+
+    MAX_PATHS = 2000
+    MAX_ARRAY_ITEMS = 100
+    MAX_DEPTH = 16
+    SAMPLE_VALUES = 10
+    DISTINCT_PRECISION = 10  # 1 KB per field, about 3% standard error
+    MAX_SEGMENTS = 1000
+
+    def __init__(self, segment_bytes: int = 0):
+        self.segment_bytes = segment_bytes
+        self.segments: Dict[int, SegmentProfile] = {}
+        self._segment: Optional[SegmentProfile] = None
+        self.record_count = 0
+        self.invalid_count = 0  # Non-empty lines that are not JSON objects
+        self.fields: Dict[str, FieldStats] = {}
+        self.overflow_count = 0  # Observations of paths beyond MAX_PATHS
+        self.timestamps = TimestampParser()
+
+    def add(self, record: Any, offset: int = 0):
+        """Add a record; offset is the byte offset of its line, used for segment profiles"""
+        if not isinstance(record, dict):
+            self.invalid_count += 1
+            return
+        self.record_count += 1
+        if self.segment_bytes:
+            index = offset // self.segment_bytes
+            if self._segment is None or self._segment.index != index:
+                self._segment = self.segments.setdefault(index, SegmentProfile(index))
+            self._segment.record_count += 1
+        self._walk(record, '', set(), 0)
+
+    def _walk(self, obj: Dict[str, Any], prefix: str, seen: set, depth: int):
+        for key, value in obj.items():
+            path = prefix + str(key)
+            self._observe(path, value, seen, depth == 0)
+            if depth < self.MAX_DEPTH:
+                if isinstance(value, dict):
+                    self._walk(value, path + '.', seen, depth + 1)
+                elif isinstance(value, list):
+                    self._walk_array(value, path + '[]', seen, depth + 1)
+
+    def _walk_array(self, items: List[Any], path: str, seen: set, depth: int):
+        for item in items[:self.MAX_ARRAY_ITEMS]:
+            self._observe(path, item, seen, False)
+            if depth < self.MAX_DEPTH:
+                if isinstance(item, dict):
+                    self._walk(item, path + '.', seen, depth + 1)
+                elif isinstance(item, list):
+                    self._walk_array(item, path + '[]', seen, depth + 1)
+
+    def _observe(self, path: str, value: Any, seen: set, top_level: bool):
+        stats = self.fields.get(path)
+        if stats is None:
+            if len(self.fields) >= self.MAX_PATHS:
+                self.overflow_count += 1
+                return
+            stats = self.fields[path] = FieldStats(self.DISTINCT_PRECISION)
+        stats.top_level = stats.top_level or top_level
+        if path not in seen:
+            seen.add(path)
+            stats.present_count += 1
+        data_type = value_type(value, self.timestamps)
+        if self._segment is not None:
+            types = self._segment.types
+            types[path] = types.get(path, 0) | TYPE_BITS[data_type]
+        if value is None:
+            stats.null_count += 1
+            return
+
+        stats.type_counts[data_type] += 1
+        if data_type == 'number' and isinstance(value, int) and INT64_MIN <= value <= INT64_MAX:
+            stats.integer_count += 1
+        # Nested containers are summarized by their own paths; only top-level ones are hashed whole
+        if top_level or data_type not in ('object', 'array'):
+            text = str(value)
+            stats.distinct.add(text)
+            if len(stats.sample_values) < self.SAMPLE_VALUES and text not in stats.sample_values:
+                stats.sample_values.append(text)
+
+    def merge(self, other: 'SchemaAccumulator'):
+        """Fold in the accumulator of a later partition"""
+        self.record_count += other.record_count
+        self.invalid_count += other.invalid_count
+        self.overflow_count += other.overflow_count
+        for index, segment in other.segments.items():
+            if index in self.segments:
+                self.segments[index].merge(segment)
+            else:
+                self.segments[index] = segment
+        for path, stats in other.fields.items():
+            mine = self.fields.get(path)
+            if mine is not None:
+                mine.merge(stats, self.SAMPLE_VALUES)
+            elif len(self.fields) < self.MAX_PATHS:
+                self.fields[path] = stats
+            else:
+                self.overflow_count += stats.null_count + sum(stats.type_counts.values())
+
+    @property
+    def line_count(self) -> int:
+        return self.record_count + self.invalid_count
+
+    def top_level_paths(self) -> List[str]:
+        return sorted(path for path, stats in self.fields.items() if stats.top_level)
+
+def _scan_lines(lines: Iterable[Tuple[int, bytes]], accumulator: SchemaAccumulator):
+    for offset, line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            accumulator.invalid_count += 1
+            continue
+        accumulator.add(record, offset)
+
+def _range_lines(file_path: str, start: int, end: int) -> Iterable[Tuple[int, bytes]]:
+    """(line start offset, line) for lines starting within [start, end)"""
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            yield position, line
+            position += len(line)
+
+def schema_byte_range(file_path: str, start: int, end: int, segment_bytes: int = 0) -> SchemaAccumulator:
+    """Worker entry point: accumulate the schema of one byte range of an uncompressed file"""
+    accumulator = SchemaAccumulator(segment_bytes)
+    _scan_lines(_range_lines(file_path, start, end), accumulator)
+    return accumulator
+
+def accumulate_schema(file_path: str, workers: int, min_shard_bytes: int, segment_bytes: int = 0,
+                      progress_callback: Optional[Callable[[float], None]] = None) -> SchemaAccumulator:
+    """Infer the schema of the whole file in one pass, sharding uncompressed files by byte range.
+
+    segment_bytes enables segment profiles; it is raised as needed to keep at
+    most MAX_SEGMENTS segments (compressed files are segmented by compressed
+    offset).
+    """
+    streamer = JSONLStreamer(Path(file_path))
+    file_size = streamer.file_path.stat().st_size
+    if segment_bytes:
+        segment_bytes = max(segment_bytes, -(-file_size // SchemaAccumulator.MAX_SEGMENTS))
+    num_shards = max(1, min(workers, file_size // max(1, min_shard_bytes)))
+    ranges = streamer.split_byte_ranges(num_shards)
+
+    if len(ranges) == 1:
+        accumulator = SchemaAccumulator(segment_bytes)
+        if streamer.is_compressed:
+            lines = ((position, line) for line, position in streamer.iter_lines_with_position())
+        else:
+            lines = _range_lines(str(streamer.file_path), 0, file_size)
+        _scan_lines(lines, accumulator)
+        return accumulator
+
+    results: List[Optional[SchemaAccumulator]] = [None] * len(ranges)
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = {
+            executor.submit(schema_byte_range, str(file_path), start, end, segment_bytes): shard
+            for shard, (start, end) in enumerate(ranges)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(done / len(ranges))
+
+    # Merge in file order so sample values and field order follow the file
+    accumulator = results[0]
+    for partial in results[1:]:
+        accumulator.merge(partial)
+    return accumulator
+
+def schema_drift(accumulator: SchemaAccumulator, max_events: int = 500) -> Dict[str, Any]:
+    """Segment schema hashes and the points where fields appear, disappear or change type.
+
+    A field appears in the first segment it is seen in (after the first
+    segment) and disappears after the last one when it is absent from every
+    later segment. A type change is a change in the non-null types seen for a
+    field between consecutive segments containing it. Events are located to
+    the segment: their row and offset are where that segment starts.
+    """
+    segments = [accumulator.segments[index] for index in sorted(accumulator.segments)]
+    segment_bytes = accumulator.segment_bytes
+    profile = []
+    events = []
+    first_rows = []
+    last_seen: Dict[str, int] = {}
+    previous_types: Dict[str, int] = {}
+
+    row = 0
+    for position, segment in enumerate(segments):
+        offset = segment.index * segment_bytes
+        first_rows.append(row)
+        profile.append({
+            "segment": segment.index,
+            "offset": offset,
+            "first_row": row,
+            "record_count": segment.record_count,
+            "field_count": len(segment.types),
+            "schema_hash": segment.schema_hash()
+        })
+        for path, mask in sorted(segment.types.items()):
+            types = mask & ~NULL_BIT
+            if path not in last_seen:
+                if position > 0:
+                    events.append({"event": "appeared", "path": path, "segment": segment.index,
+                                   "offset": offset, "row": row, "types": type_names(mask)})
+            elif types and previous_types.get(path) and types != previous_types[path]:
+                events.append({"event": "type_changed", "path": path, "segment": segment.index,
+                               "offset": offset, "row": row, "from": type_names(previous_types[path]),
+                               "to": type_names(types)})
+            last_seen[path] = position
+            if types:
+                previous_types[path] = types
+        row += segment.record_count
+
+    for path, position in last_seen.items():
+        if position < len(segments) - 1:
+            following = segments[position + 1]
+            events.append({"event": "disappeared", "path": path, "segment": following.index,
+                           "offset": following.index * segment_bytes, "row": first_rows[position + 1]})
+
+    events.sort(key=lambda event: (event["row"], event["path"]))
+    hash_changes = sum(1 for before, after in zip(profile, profile[1:]) if before["schema_hash"] != after["schema_hash"])
+    return {
+        "segment_bytes": segment_bytes,
+        "segment_count": len(profile),
+        "distinct_schemas": len({segment["schema_hash"] for segment in profile}),
+        "schema_changes": hash_changes,
+        "event_count": len(events),
+        "events": events[:max_events],
+        "truncated": len(events) > max_events,
+        "segments": profile
+    }
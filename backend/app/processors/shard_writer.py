@@ -0,0 +1,210 @@
+import gzip
+import re
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+import zstandard
+
+# Codec -> (file suffix, content type)
+CODECS = {
+    'gzip': ('.gz', 'application/gzip'),
+    'zstd': ('.zst', 'application/zstd'),
+}
+
+MAX_PENDING_CHUNKS = 2  # Compressed chunks in flight per shard (beyond the one being filled)
+
+_UNSAFE_NAME_CHARS = re.compile(r'[^\w.-]')
+
+def _gzip_chunk(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+def _zstd_chunk(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+_COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {'gzip': _gzip_chunk, 'zstd': _zstd_chunk}
+
+def compressor(codec: str) -> Callable[[bytes], bytes]:
+    """Function compressing one chunk into a self-contained gzip member or zstd frame.
+
+    Concatenated members (frames) form a valid gzip (zstd) stream, so chunks
+    can be compressed independently and in parallel, as pigz and zstdmt do.
+    """
+    if codec not in _COMPRESSORS:
+        raise ValueError(f"Unsupported compression: {codec} (expected one of {', '.join(_COMPRESSORS)})")
+    return _COMPRESSORS[codec]
+
+def parallel_compress(chunks: Iterable[bytes], codec: str, workers: int) -> Iterator[bytes]:
+    """Compress a chunk stream on a thread pool, yielding compressed chunks in order.
+
+    zlib and zstd release the GIL, so chunks compress concurrently while the
+    caller keeps encoding; at most 2 * workers chunks are held in memory. The
+    first chunk is compressed inline so the output starts with its input.
+    """
+    compress = compressor(codec)
+    chunks = iter(chunks)
+    for first in chunks:
+        yield compress(first)
+        break
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(compress, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def partition_name(column: str, value: Optional[str]) -> str:
+    """Hive-style file name stem column=value, with characters unsafe in paths replaced"""
+    safe_column = _UNSAFE_NAME_CHARS.sub('_', column)[:100]
+    safe_value = "__null__" if value is None else _UNSAFE_NAME_CHARS.sub('_', value)[:100] or "__empty__"
+    return f"{safe_column}={safe_value}"
+
+class ChunkSink:
+    """Write-only file object whose contents are drained as they are produced"""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+class Shard:
+    """One output file being written: a spill file plus its buffered and in-flight chunks"""
+
+    def __init__(self, name: str, file: IO[bytes]):
+        self.name = name
+        self.file = file
+        self.rows = 0
+        self.raw_bytes = 0  # Uncompressed bytes written
+        self.finished = False
+        self.zipped = False
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.pending: Deque[Future] = deque()
+
+class ShardWriter:
+    """Writes export shards to spill files, compressing their chunks on a shared thread pool.
+
+    Any number of shards may be open at once (one per column value when
+    partitioning by column); each buffers up to buffer_bytes before handing
+    the chunk to the pool, and compressed chunks are written in order per
+    shard. Shards are added to one streamed zip archive as they are finished,
+    so sequential partitions reach the client while later ones are written.
+    """
+
+    def __init__(self, codec: Optional[str], workers: int, buffer_bytes: int, spill_dir: Optional[str] = None):
+        self.compress = compressor(codec) if codec else None
+        self.executor = ThreadPoolExecutor(max_workers=workers) if codec else None
+        self.buffer_bytes = buffer_bytes
+        self.spill_dir = spill_dir
+        self.shards: List[Shard] = []
+        self._names: set = set()
+        self._sink = ChunkSink()  # Not seekable, so entries carry data descriptors and stream in order
+        self._archive: Optional[zipfile.ZipFile] = None
+
+    def open_shard(self, name: str, suffix: str, header: bytes = b'') -> Shard:
+        unique = name
+        duplicate = 0
+        while unique + suffix in self._names:
+            duplicate += 1
+            unique = f"{name}-{duplicate}"
+        self._names.add(unique + suffix)
+
+        shard = Shard(unique + suffix, tempfile.TemporaryFile(dir=self.spill_dir))
+        self.shards.append(shard)
+        if header:
+            self.write(shard, header)
+        return shard
+
+    def write(self, shard: Shard, data: bytes):
+        shard.buffer.append(data)
+        shard.buffered += len(data)
+        shard.raw_bytes += len(data)
+        if shard.buffered >= self.buffer_bytes:
+            self._flush(shard)
+
+    def _flush(self, shard: Shard):
+        chunk = b''.join(shard.buffer)
+        shard.buffer = []
+        shard.buffered = 0
+        if self.executor is None:
+            shard.file.write(chunk)
+            return
+        shard.pending.append(self.executor.submit(self.compress, chunk))
+        while len(shard.pending) > MAX_PENDING_CHUNKS:
+            shard.file.write(shard.pending.popleft().result())
+
+    def finish(self, shard: Shard):
+        """Write out a shard's remaining chunks; sequential partitions call this as each one fills"""
+        if shard.finished:
+            return
+        if shard.buffered:
+            self._flush(shard)
+        while shard.pending:
+            shard.file.write(shard.pending.popleft().result())
+        shard.finished = True
+
+    def zip_shard(self, shard: Shard, read_bytes: int = 1024 * 1024) -> Iterator[bytes]:
+        """Finish a shard and yield its zip entry as it is written, releasing its spill file"""
+        self.finish(shard)
+        if self._archive is None:
+            self._archive = zipfile.ZipFile(self._sink, 'w', zipfile.ZIP_STORED)
+        shard.file.seek(0)
+        info = zipfile.ZipInfo(shard.name, date_time=time.localtime()[:6])
+        info.external_attr = 0o644 << 16
+        with self._archive.open(info, 'w', force_zip64=True) as entry:
+            while True:
+                chunk = shard.file.read(read_bytes)
+                if not chunk:
+                    break
+                entry.write(chunk)
+                data = self._sink.drain()
+                if data:
+                    yield data
+        shard.file.close()
+        shard.zipped = True
+        data = self._sink.drain()
+        if data:
+            yield data
+
+    def stream_zip(self, read_bytes: int = 1024 * 1024) -> Iterator[bytes]:
+        """Add every shard not yet zipped and yield the rest of the archive, ending with its directory"""
+        for shard in self.shards:
+            if not shard.zipped:
+                yield from self.zip_shard(shard, read_bytes)
+        if self._archive is None:
+            self._archive = zipfile.ZipFile(self._sink, 'w', zipfile.ZIP_STORED)
+        self._archive.close()
+        yield self._sink.drain()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        for shard in self.shards:
+            shard.file.close()
@@ -0,0 +1,160 @@
+import re
+from collections import Counter
+from typing import Any, Dict, List
+import numpy as np
+from .sketches import HyperLogLog, KLLSketch, RunningStats, SpaceSaving
+
+_WORD = re.compile(r'\w+')
+
+CHAR_CLASSES = ["letter", "digit", "whitespace", "punctuation", "control", "non_ascii"]
+
+def _ascii_classes() -> np.ndarray:
+    table = np.full(128, CHAR_CLASSES.index("control"), dtype=np.uint8)
+    for code in range(32, 127):
+        char = chr(code)
+        if char.isalpha():
+            table[code] = CHAR_CLASSES.index("letter")
+        elif char.isdigit():
+            table[code] = CHAR_CLASSES.index("digit")
+        elif char == ' ':
+            table[code] = CHAR_CLASSES.index("whitespace")
+        else:
+            table[code] = CHAR_CLASSES.index("punctuation")
+    for char in '\t\n\r\x0b\x0c':
+        table[ord(char)] = CHAR_CLASSES.index("whitespace")
+    return table
+
+_ASCII_CLASSES = _ascii_classes()
+
+# Unicode block ranges (start code point, script); each range runs to the next start
+_SCRIPT_RANGES = [
+    (0x0000, "latin"), (0x0370, "greek"), (0x0400, "cyrillic"), (0x0530, "other"),
+    (0x0590, "hebrew"), (0x0600, "arabic"), (0x0700, "other"), (0x0900, "indic"),
+    (0x0E00, "thai"), (0x0E80, "other"), (0x1E00, "latin"), (0x1F00, "greek"),
+    (0x2000, "symbols"), (0x2C00, "other"), (0x3040, "kana"), (0x3100, "cjk"),
+    (0xA000, "other"), (0xAC00, "hangul"), (0xD7B0, "other"), (0xF900, "cjk"),
+    (0xFB00, "other"), (0x1F000, "symbols"), (0x1FB00, "other"), (0x20000, "cjk"),
+    (0x30000, "other"),
+]
+SCRIPTS = sorted(set(name for _, name in _SCRIPT_RANGES))
+_SCRIPT_STARTS = np.array([start for start, _ in _SCRIPT_RANGES], dtype=np.uint32)
+_SCRIPT_INDEX = np.array([SCRIPTS.index(name) for _, name in _SCRIPT_RANGES], dtype=np.int64)
+
+class TextAccumulator:
+    """Constant-memory, mergeable text statistics for one column.
+
+    Lengths feed running moments and a KLL sketch; words over the whole column
+    feed a Space-Saving summary and a HyperLogLog. Texts are buffered up to
+    BATCH_CHARS characters so words are counted once per batch and character
+    classes are profiled with one vectorized pass over the batch's code points.
+    Scripts are taken from the Unicode block of each letter and non-ASCII
+    character, a cheap proxy for the languages present.
+    """
+
+    WORD_CAPACITY = 1000
+    BATCH_CHARS = 1 << 20
+
+    def __init__(self, char_stats: bool = False):
+        self.char_stats = char_stats
+        self.text_count = 0
+        self.word_total = 0
+        self.lengths = RunningStats()
+        self.length_quantiles = KLLSketch()
+        self.words = SpaceSaving(self.WORD_CAPACITY)
+        self.distinct_words = HyperLogLog()
+        self.class_counts = np.zeros(len(CHAR_CLASSES), dtype=np.int64)
+        self.script_counts = np.zeros(len(SCRIPTS), dtype=np.int64)
+        self._buffer: List[str] = []
+        self._buffered_chars = 0
+
+    def add(self, text: str):
+        self.text_count += 1
+        self.lengths.add(len(text))
+        self.length_quantiles.add(len(text))
+        self._buffer.append(text)
+        self._buffered_chars += len(text)
+        if self._buffered_chars >= self.BATCH_CHARS:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        batch = '\n'.join(self._buffer)  # Separator keeps words of adjacent texts apart
+        separators = len(self._buffer) - 1
+        self._buffer = []
+        self._buffered_chars = 0
+
+        word_counts = Counter(_WORD.findall(batch.lower()))
+        for word, count in word_counts.items():
+            self.words.add(word, count)
+            self.distinct_words.add(word)
+        self.word_total += sum(word_counts.values())
+
+        if self.char_stats:
+            self._profile_chars(batch, separators)
+
+    def _profile_chars(self, batch: str, separators: int):
+        codes = np.frombuffer(batch.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        is_ascii = codes < 128
+        classes = np.full(codes.size, CHAR_CLASSES.index("non_ascii"), dtype=np.uint8)
+        classes[is_ascii] = _ASCII_CLASSES[codes[is_ascii]]
+        counts = np.bincount(classes, minlength=len(CHAR_CLASSES))
+        counts[CHAR_CLASSES.index("whitespace")] -= separators
+        self.class_counts += counts
+
+        scripted = codes[(classes == CHAR_CLASSES.index("letter")) | ~is_ascii]
+        ranges = np.searchsorted(_SCRIPT_STARTS, scripted, side='right') - 1
+        self.script_counts += np.bincount(_SCRIPT_INDEX[ranges], minlength=len(SCRIPTS))
+
+    def merge(self, other: 'TextAccumulator'):
+        self.flush()
+        other.flush()
+        self.text_count += other.text_count
+        self.word_total += other.word_total
+        self.lengths.merge(other.lengths)
+        self.length_quantiles.merge(other.length_quantiles)
+        self.words.merge(other.words)
+        self.distinct_words.merge(other.distinct_words)
+        self.class_counts += other.class_counts
+        self.script_counts += other.script_counts
+
+    def summary(self) -> Dict[str, Any]:
+        self.flush()
+        if not self.text_count:
+            return {}
+
+        median, p95, p99 = self.length_quantiles.quantiles([0.5, 0.95, 0.99])
+        summary = {
+            "length_stats": {
+                "min": int(self.lengths.min),
+                "max": int(self.lengths.max),
+                "mean": self.lengths.mean,
+                "median": median,
+                "std_dev": self.lengths.std_dev,
+                "percentile_95": p95,
+                "percentile_99": p99
+            },
+            "most_common_words": self.words.most_common(10, guaranteed=True),
+            "unique_word_count": self.distinct_words.estimate(),
+            "total_words": self.word_total,
+            "avg_words_per_text": self.word_total / self.text_count
+        }
+        if self.char_stats:
+            summary["char_stats"] = self._char_summary()
+        return summary
+
+    def _char_summary(self) -> Dict[str, Any]:
+        total_chars = int(self.class_counts.sum())
+        total_scripted = int(self.script_counts.sum())
+        return {
+            "total_chars": total_chars,
+            "classes": {
+                name: {"count": int(count), "percentage": float(count) / total_chars * 100 if total_chars else 0.0}
+                for name, count in zip(CHAR_CLASSES, self.class_counts)
+            },
+            "scripts": {
+                name: {"count": int(count), "percentage": float(count) / total_scripted * 100}
+                for name, count in sorted(zip(SCRIPTS, self.script_counts), key=lambda item: -item[1])
+                if count
+            }
+        }
@@ -0,0 +1,140 @@
+import calendar
+import re
+import warnings
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+_TIME = r'(?:[T ](\d{1,2}):(\d{2})(?::(\d{2})(?:\.\d{1,9})?)?)?'
+_ZONE = r'(?:Z|[+-]\d{2}(?::?\d{2})?)'
+
+def _days_from_civil(year: int, month: int, day: int) -> int:
+    """Days since 1970-01-01 in the proleptic Gregorian calendar"""
+    year -= month <= 2
+    era = (year if year >= 0 else year - 399) // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def _from_fields(year: int, month: int, day: int, hour: Optional[str], minute: Optional[str],
+                 second: Optional[str]) -> Optional[int]:
+    if not (1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]):
+        return None
+    seconds = _days_from_civil(year, month, day) * 86400
+    if hour is not None:
+        if int(hour) > 23 or int(minute) > 59 or (second is not None and int(second) > 60):
+            return None
+        seconds += int(hour) * 3600 + int(minute) * 60 + int(second or 0)
+    return seconds
+
+def _parse_iso(value: str) -> Optional[int]:
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() // 1)
+
+def _parse_month_first(match) -> Optional[int]:
+    month, day, year, hour, minute, second = match.groups()
+    return _from_fields(int(year), int(month), int(day), hour, minute, second)
+
+def _parse_year_first(match) -> Optional[int]:
+    year, month, day, hour, minute, second = match.groups()
+    return _from_fields(int(year), int(month), int(day), hour, minute, second)
+
+class TimestampParser:
+    """Timestamp parser that detects a column's format once and reuses it.
+
+    Values parse to integer epoch seconds (naive times are taken as UTC). Naive
+    ISO-8601 batches are converted by NumPy in one call; other formats fall back
+    to per-value parsing with the cached format tried first.
+    """
+
+    # name -> (full-match pattern, parser taking the match)
+    FORMATS: Dict[str, Tuple['re.Pattern', Callable[[Any], Optional[int]]]] = {
+        'iso': (re.compile(r'\d{4}-\d{2}-\d{2}' + _TIME), lambda match: _parse_iso(match.string)),
+        'iso_tz': (re.compile(r'\d{4}-\d{2}-\d{2}' + _TIME + _ZONE), lambda match: _parse_iso(match.string)),
+        'mdy': (re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})' + _TIME.replace('[T ]', ' ')), _parse_month_first),
+        'ymd_slash': (re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2})' + _TIME.replace('[T ]', ' ')), _parse_year_first),
+    }
+
+    def __init__(self):
+        self.format: Optional[str] = None
+        self.format_counts: Counter = Counter()
+        self.failures = 0
+
+    def detect(self, value: Any) -> Optional[str]:
+        """Name of the format value is written in, trying the cached format first"""
+        if not isinstance(value, str):
+            return None
+        value = value.strip()
+        order = [self.format] if self.format else []
+        order += [name for name in self.FORMATS if name != self.format]
+        for name in order:
+            pattern, parse = self.FORMATS[name]
+            match = pattern.fullmatch(value)
+            if match and parse(match) is not None:
+                self.format = name
+                return name
+        return None
+
+    def parse(self, value: Any) -> Optional[int]:
+        """Epoch seconds of one value, or None (counted as a failure) when it is not a timestamp"""
+        if not isinstance(value, str):
+            self.failures += 1
+            return None
+        value = value.strip()
+        if self.format:
+            pattern, parse = self.FORMATS[self.format]
+            match = pattern.fullmatch(value)
+            if match:
+                parsed = parse(match)
+                if parsed is not None:
+                    self.format_counts[self.format] += 1
+                    return parsed
+        name = self.detect(value)
+        if name is None:
+            self.failures += 1
+            return None
+        pattern, parse = self.FORMATS[name]
+        self.format_counts[name] += 1
+        return parse(pattern.fullmatch(value))
+
+    def parse_many(self, values: Sequence[Any]) -> np.ndarray:
+        """Epoch seconds (int64) of every value that parses; failures are counted and dropped"""
+        if not len(values):
+            return np.empty(0, dtype=np.int64)
+
+        if self.format is None:
+            self.detect(values[0])
+        # NumPy also accepts partial dates such as "2024-01", so require a full date first
+        if self.format == 'iso' and all(
+            isinstance(value, str) and len(value) >= 10 and value[4] == '-' and value[7] == '-'
+            for value in values
+        ):
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('error')  # Time zone suffixes only warn in NumPy
+                    micros = np.array(values, dtype='datetime64[us]').astype(np.int64)
+                self.format_counts['iso'] += len(values)
+                return micros // 1_000_000
+            except (ValueError, TypeError, Warning):
+                pass
+
+        parsed = [self.parse(value) for value in values]
+        return np.array([value for value in parsed if value is not None], dtype=np.int64)
+
+    def merge(self, other: 'TimestampParser'):
+        self.format_counts.update(other.format_counts)
+        self.failures += other.failures
+        if self.format is None:
+            self.format = other.format
+
+def format_timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
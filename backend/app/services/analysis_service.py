@@ -1,244 +1,929 @@
 from typing import Dict, Any, List, Optional, Union
 import statistics
 import math
-from collections import Counter
+import json
 from datetime import datetime
-import re
+import sqlite3
+import threading
+from concurrent.futures import wait
+import numpy as np
+from cachetools import LRUCache
+from ..core.config import settings
 from ..core.task_manager import task_manager
+from ..processors.column_stats import ColumnAccumulator, accumulate_columns
+from ..processors.correlation import accumulate_correlations
+from ..processors.duplicates import DuplicateDetector
 from ..processors.jsonl_streamer import JSONLStreamer
+from ..processors.sampling import (
+    RecordSample, Z_95, effective_sample_size, estimate_distinct, sample_records,
+    weighted_mean, weighted_proportion, weighted_quantiles
+)
+from ..processors.sketches import HyperLogLog, SpaceSaving, StreamingHistogram
+from ..processors.timestamps import TimestampParser, format_timestamp
+from ..services.analysis_store import analysis_store, file_fingerprint
 from ..services.file_loader import file_loader_service
 from ..models.file_info import DataType
 
 class AnalysisService:
     """On-demand data analysis service"""
     
+    TIME_BUCKETS = {"hour": 1, "day": 24, "week": 7 * 24}  # Widths in hours
+    MAX_TIME_BUCKETS = 500
+    WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    ANALYSIS_VERSION = 5  # Bump when stored result formats change
+    SAMPLE_CACHE_SIZE = 8
+    
     def __init__(self):
-        self.analysis_cache: Dict[str, Any] = {}
+        # (fingerprint, kind, key) -> (result, sketches), in front of the persistent store
+        self.analysis_cache = LRUCache(maxsize=settings.analysis_memory_cache_size)
+        self.sample_cache = LRUCache(maxsize=self.SAMPLE_CACHE_SIZE)  # fingerprint -> RecordSample
+        self.column_tasks: Dict[str, str] = {}  # file_id_column -> in-flight task id
+        self.overview_tasks: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
     
-    def analyze_column(self, file_id: str, column: str) -> str:
-        """Start column analysis task"""
-        task_id = task_manager.submit_task(
-            self._analyze_column_task,
-            f"Analyze column '{column}'",
-            file_id, column
-        )
+    def _locate(self, file_id: str) -> Optional[tuple]:
+        """(fingerprint, path) of a loaded file's current contents"""
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            return None
+        try:
+            return file_fingerprint(metadata.file_path), metadata.file_path
+        except OSError:
+            return None
+    
+    def _load_result(self, file_id: str, kind: str, key: str = "") -> Optional[tuple]:
+        """Stored (result, sketches) for the file's current contents"""
+        located = self._locate(file_id)
+        if not located:
+            return None
+        
+        cache_key = (located[0], kind, key)
+        with self._cache_lock:
+            entry = self.analysis_cache.get(cache_key)
+        if entry is None:
+            entry = analysis_store.get(located[0], kind, key, self.ANALYSIS_VERSION)
+            if entry is None:
+                return None
+            with self._cache_lock:
+                self.analysis_cache[cache_key] = entry
+        return entry
+    
+    def _save_result(self, file_id: str, kind: str, key: str, result: Any, sketches: Any = None):
+        located = self._locate(file_id)
+        if not located:
+            return
+        
+        fingerprint, path = located
+        with self._cache_lock:
+            self.analysis_cache[(fingerprint, kind, key)] = (result, sketches)
+        try:
+            analysis_store.put(fingerprint, path, kind, key, self.ANALYSIS_VERSION, result, sketches)
+        except sqlite3.Error:
+            pass  # The in-memory entry still serves this process
+    
+    def analyze_column(self, file_id: str, column: str, bins: int = 20, log_scale: bool = False,
+                       time_bucket: str = "auto") -> str:
+        """Start column analysis task, attaching to an in-flight analysis of the column"""
+        cache_key = f"{file_id}_{column}"
+        with self._lock:
+            running_task_id = self.column_tasks.get(cache_key)
+            if running_task_id:
+                return task_manager.submit_task(
+                    self._await_column_task,
+                    f"Analyze column '{column}'",
+                    running_task_id, file_id, column, bins, log_scale, time_bucket
+                )
+            
+            task_id = task_manager.submit_task(
+                self._analyze_column_task,
+                f"Analyze column '{column}'",
+                file_id, column, bins, log_scale, time_bucket
+            )
+            self.column_tasks[cache_key] = task_id
         return task_id
     
-    def _analyze_column_task(self, task_id: str, file_id: str, column: str) -> Dict[str, Any]:
-        """Background task for column analysis"""
+    def analyze_columns(self, file_id: str, columns: Optional[List[str]] = None, bins: int = 20,
+                        log_scale: bool = False, time_bucket: str = "auto") -> Dict[str, Any]:
+        """Start one batch task analyzing every requested column (all when None) in a single scan.
+        
+        Columns that are already cached are skipped and columns with an analysis in
+        flight are attached to the running task instead of being scanned again.
+        """
         metadata = file_loader_service.get_file_metadata(file_id)
         if not metadata:
             raise ValueError(f"File not found: {file_id}")
         
-        # Find column info
-        column_info = None
-        for col in metadata.columns:
-            if col.name == column:
-                column_info = col
-                break
+        known_columns = [col.name for col in metadata.columns]
+        if columns is None:
+            columns = known_columns
+        missing = [column for column in columns if column not in known_columns]
+        if missing:
+            raise ValueError(f"Columns not found: {', '.join(missing)}")
         
-        if not column_info:
-            raise ValueError(f"Column not found: {column}")
+        columns = list(dict.fromkeys(columns))
+        cached = [column for column in columns if self._load_result(file_id, "column", column)]
+        attached: Dict[str, str] = {}
+        pending: List[str] = []
+        task_id = None
         
-        task_manager.update_progress(task_id, 10)
+        with self._lock:
+            for column in columns:
+                cache_key = f"{file_id}_{column}"
+                if column in cached:
+                    continue
+                if cache_key in self.column_tasks:
+                    attached[column] = self.column_tasks[cache_key]
+                else:
+                    pending.append(column)
+            
+            if pending:
+                task_id = task_manager.submit_task(
+                    self._analyze_columns_task,
+                    f"Analyze {len(pending)} columns",
+                    file_id, pending, bins, log_scale, time_bucket
+                )
+                for column in pending:
+                    self.column_tasks[f"{file_id}_{column}"] = task_id
         
-        # Collect column values
-        streamer = JSONLStreamer(metadata.file_path)
-        values = []
-        null_count = 0
-        total_count = 0
+        return {
+            "task_id": task_id,
+            "columns": pending,
+            "attached": attached,
+            "cached": cached
+        }
+    
+    def _analyze_column_task(self, task_id: str, file_id: str, column: str, bins: int = 20,
+                             log_scale: bool = False, time_bucket: str = "auto") -> Dict[str, Any]:
+        """Background task for column analysis"""
+        return self._analyze_columns_task(task_id, file_id, [column], bins, log_scale, time_bucket)[column]
+    
+    def _await_column_task(self, task_id: str, running_task_id: str, file_id: str, column: str,
+                           bins: int = 20, log_scale: bool = False, time_bucket: str = "auto") -> Dict[str, Any]:
+        """Background task that follows an in-flight analysis instead of rescanning"""
+        future = task_manager.futures.get(running_task_id)
+        while future is not None and not future.done():
+            running_task = task_manager.get_task(running_task_id)
+            if running_task:
+                task_manager.update_progress(task_id, running_task.progress)
+            wait([future], timeout=0.5)
         
-        for record in streamer.stream_records():
-            total_count += 1
-            value = record.get(column)
+        analysis = self.get_cached_analysis(file_id, column, bins, log_scale, time_bucket)
+        if analysis is None:
+            running_task = task_manager.get_task(running_task_id)
+            error = running_task.error if running_task and running_task.error else "analysis did not complete"
+            raise ValueError(f"Analysis of column '{column}' failed: {error}")
+        return analysis
+    
+    def _analyze_columns_task(self, task_id: str, file_id: str, columns: List[str], bins: int = 20,
+                              log_scale: bool = False, time_bucket: str = "auto") -> Dict[str, Dict[str, Any]]:
+        """Background task analyzing several columns in one streaming pass"""
+        try:
+            metadata = file_loader_service.get_file_metadata(file_id)
+            if not metadata:
+                raise ValueError(f"File not found: {file_id}")
             
-            if value is None:
-                null_count += 1
-            else:
-                values.append(value)
+            # Find column info
+            column_infos = {col.name: col for col in metadata.columns}
+            for column in columns:
+                if column not in column_infos:
+                    raise ValueError(f"Column not found: {column}")
             
-            # Update progress
-            if total_count % 1000 == 0:
-                progress = 10 + (total_count / metadata.total_records) * 70
-                task_manager.update_progress(task_id, progress)
-        
-        task_manager.update_progress(task_id, 80)
+            task_manager.update_progress(task_id, 10)
+            
+            # One streaming pass for all columns (sharded across processes for large files)
+            accumulators = accumulate_columns(
+                metadata.file_path,
+                [(column, column_infos[column].data_type.value) for column in columns],
+                settings.analysis_workers or settings.max_workers,
+                settings.analysis_shard_min_bytes,
+                metadata.total_records,
+                settings.text_char_stats,
+                lambda fraction: task_manager.update_progress(task_id, 10 + fraction * 70)
+            )
+            
+            task_manager.update_progress(task_id, 80)
+            
+            results = {}
+            for column in columns:
+                results[column] = self._summarize_column(
+                    file_id, column_infos[column], accumulators[column], bins, log_scale, time_bucket
+                )
+            
+            task_manager.update_progress(task_id, 100)
+            return results
+        finally:
+            with self._lock:
+                for column in columns:
+                    cache_key = f"{file_id}_{column}"
+                    if self.column_tasks.get(cache_key) == task_id:
+                        del self.column_tasks[cache_key]
+    
+    def _summarize_column(self, file_id: str, column_info, accumulator: ColumnAccumulator, bins: int,
+                          log_scale: bool, time_bucket: str) -> Dict[str, Any]:
+        """Turn a column accumulator into the analysis result and cache it"""
+        column = column_info.name
+        total_count = accumulator.total_count
+        null_count = accumulator.null_count
         
         # Analyze based on data type
         analysis = {
             "column": column,
             "data_type": column_info.data_type.value,
             "total_records": total_count,
-            "non_null_count": len(values),
+            "non_null_count": accumulator.non_null_count,
             "null_count": null_count,
             "null_percentage": (null_count / total_count) * 100 if total_count > 0 else 0,
         }
         
         if column_info.data_type == DataType.STRING:
-            analysis.update(self._analyze_text_column(values))
+            analysis.update(accumulator.text.summary())
         elif column_info.data_type == DataType.NUMBER:
-            analysis.update(self._analyze_numeric_column(values))
+            analysis.update(self._analyze_numeric_column(accumulator, bins, log_scale))
         elif column_info.data_type == DataType.DATE:
-            analysis.update(self._analyze_date_column(values))
+            analysis.update(self._analyze_date_column(accumulator))
+            analysis["time_histogram"] = self._create_time_histogram(accumulator.time_histogram, time_bucket)
         
         # Common analysis
-        analysis.update(self._analyze_common(values))
+        analysis.update(self._analyze_common(accumulator.value_counts, accumulator.distinct))
         
-        task_manager.update_progress(task_id, 100)
-        
-        # Cache result
-        cache_key = f"{file_id}_{column}"
-        self.analysis_cache[cache_key] = analysis
+        # Store result; the column type's histograms are kept so they can be re-binned without a rescan
+        if column_info.data_type == DataType.NUMBER:
+            histograms = {"linear": accumulator.histogram, "log": accumulator.log_histogram}
+        elif column_info.data_type == DataType.DATE:
+            histograms = {"time": accumulator.time_histogram}
+        else:
+            histograms = {}
+        self._save_result(file_id, "column", column, analysis,
+                          {name: histogram.to_state() for name, histogram in histograms.items()})
         
         return analysis
     
-    def _analyze_text_column(self, values: List[Any]) -> Dict[str, Any]:
-        """Analyze text column"""
-        str_values = [str(v) for v in values if v is not None]
+    def approximate_column_analysis(self, file_id: str, column: str, bins: int = 20, log_scale: bool = False,
+                                    time_bucket: str = "auto") -> Dict[str, Any]:
+        """Estimate column statistics from a random record sample and refine in the background.
         
-        if not str_values:
-            return {}
+        Returns the exact result when it is already cached; otherwise returns the
+        estimate together with the task computing the exact analysis.
+        """
+        exact = self.get_cached_analysis(file_id, column, bins, log_scale, time_bucket)
+        if exact:
+            return {"status": "completed", "result": exact}
         
-        # Length statistics
-        lengths = [len(s) for s in str_values]
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {file_id}")
         
-        # Word analysis (sample only for performance)
-        sample_size = min(1000, len(str_values))
-        sample_values = str_values[:sample_size]
+        column_info = next((col for col in metadata.columns if col.name == column), None)
+        if not column_info:
+            raise ValueError(f"Column not found: {column}")
         
-        all_words = []
-        for text in sample_values:
-            words = re.findall(r'\b\w+\b', text.lower())
-            all_words.extend(words)
+        sample = self._get_sample(file_id, metadata.file_path)
+        total_records, total_records_ci = self._estimate_total_records(metadata, sample)
+        analysis = self._summarize_sample_column(sample, column_info, total_records, total_records_ci,
+                                                 bins, log_scale)
         
-        word_counts = Counter(all_words)
+        task_id = self.analyze_column(file_id, column, bins, log_scale, time_bucket)
+        return {"status": "approximate", "result": analysis, "task_id": task_id}
+    
+    def _get_sample(self, file_id: str, file_path: str) -> RecordSample:
+        """Random record sample shared by all approximate analyses of a file"""
+        fingerprint = file_fingerprint(file_path)
+        with self._cache_lock:
+            sample = self.sample_cache.get(fingerprint)
+        if sample is None:
+            sample = sample_records(file_path, settings.analysis_sample_size)
+            with self._cache_lock:
+                self.sample_cache[fingerprint] = sample
+        return sample
+    
+    def _estimate_total_records(self, metadata, sample: RecordSample):
+        """Record total with a 95% interval (exact once the file has been fully counted)"""
+        if metadata.processing_status == "full_analysis_complete":
+            return metadata.total_records, None
+        if sample.total_records is None:
+            estimate = metadata.estimated_records or metadata.total_records
+            return estimate, metadata.estimated_records_ci
+        low, high = sample.total_records_ci
+        return round(sample.total_records), [round(low), round(high)]
+    
+    def _summarize_sample_column(self, sample: RecordSample, column_info, total_records: int,
+                                 total_records_ci: Optional[List[int]], bins: int,
+                                 log_scale: bool) -> Dict[str, Any]:
+        """Weighted estimates of a column's statistics from a record sample"""
+        column = column_info.name
+        values = [record.get(column) for record in sample.records]
+        weights = sample.weights
+        present = np.array([value is not None for value in values], dtype=bool)
+        null_share = weighted_proportion(~present, weights)
         
-        return {
-            "length_stats": {
-                "min": min(lengths),
-                "max": max(lengths),
-                "mean": statistics.mean(lengths),
-                "median": statistics.median(lengths),
-                "std_dev": statistics.stdev(lengths) if len(lengths) > 1 else 0
+        analysis = {
+            "column": column,
+            "data_type": column_info.data_type.value,
+            "approximate": True,
+            "sampling": {
+                "method": sample.method,
+                "sample_size": len(sample),
+                "effective_sample_size": sample.effective_size,
+                "confidence_level": 0.95
             },
-            "most_common_words": word_counts.most_common(10),
-            "unique_word_count": len(word_counts),
-            "avg_words_per_text": len(all_words) / len(sample_values) if sample_values else 0
+            "total_records": total_records,
+            "total_records_ci": total_records_ci,
+            "non_null_count": round(total_records * (1 - null_share["estimate"])),
+            "null_count": round(total_records * null_share["estimate"]),
+            "null_percentage": null_share["estimate"] * 100,
+            "null_percentage_ci": [null_share["ci_low"] * 100, null_share["ci_high"] * 100]
         }
+        
+        present_values = [value for value in values if value is not None]
+        present_weights = weights[present]
+        if not present_values:
+            return analysis
+        non_null_total = analysis["non_null_count"]
+        
+        if column_info.data_type == DataType.NUMBER:
+            numbers, number_weights = [], []
+            for value, weight in zip(present_values, present_weights):
+                try:
+                    numbers.append(float(value))
+                except (ValueError, TypeError):
+                    continue
+                number_weights.append(weight)
+            if numbers:
+                analysis["numeric_stats"] = self._sample_numeric_stats(numbers, number_weights, bins, log_scale)
+        elif column_info.data_type == DataType.STRING:
+            lengths = [len(str(value)) for value in present_values]
+            length_mean = weighted_mean(lengths, present_weights)
+            analysis["length_stats"] = {
+                "min": min(lengths),
+                "max": max(lengths),
+                "mean": length_mean["estimate"],
+                "mean_ci": [length_mean["ci_low"], length_mean["ci_high"]],
+                "median": weighted_quantiles(lengths, present_weights, [0.5])[0]["estimate"],
+                "std_dev": length_mean["std_dev"]
+            }
+        elif column_info.data_type == DataType.DATE:
+            seconds = TimestampParser().parse_many(present_values)
+            if seconds.size:
+                earliest, latest = int(seconds.min()), int(seconds.max())
+                analysis["date_range"] = {
+                    "earliest": format_timestamp(earliest),
+                    "latest": format_timestamp(latest),
+                    "span_days": (latest - earliest) / 86400
+                }
+        
+        # Value shares among non-null records; values sampled once say nothing about their frequency
+        present_positions = [position for position, is_present in zip(sample.positions, present) if is_present]
+        value_weights = self._sample_value_weights([str(value) for value in present_values], present_positions,
+                                                   present_weights)
+        
+        present_total = float(present_weights.sum())
+        n = effective_sample_size(present_weights)
+        most_common = []
+        for value, weight in value_weights[:10]:
+            share = weight / present_total
+            margin = Z_95 * math.sqrt(share * (1 - share) / n)
+            most_common.append({
+                "value": value,
+                "count": round(share * non_null_total),
+                "count_ci": [round(max(0.0, share - margin) * non_null_total),
+                             round(min(1.0, share + margin) * non_null_total)]
+            })
+        
+        unique_count = self._sample_distinct(sample, column, non_null_total)
+        analysis.update({
+            "unique_count": unique_count,
+            "unique_percentage": (unique_count / non_null_total) * 100 if non_null_total else 0,
+            "most_common_values": [[item["value"], item["count"]] for item in most_common],
+            "most_common_values_ci": [item["count_ci"] for item in most_common]
+        })
+        return analysis
     
-    def _analyze_numeric_column(self, values: List[Any]) -> Dict[str, Any]:
-        """Analyze numeric column"""
-        numeric_values = []
+    def _sample_numeric_stats(self, numbers: List[float], weights: List[float], bins: int,
+                              log_scale: bool) -> Dict[str, Any]:
+        """Weighted numeric estimates with 95% intervals for the mean and quantiles"""
+        mean = weighted_mean(numbers, weights)
+        median, q1, q3, p95, p99 = weighted_quantiles(numbers, weights, [0.5, 0.25, 0.75, 0.95, 0.99])
         
-        for v in values:
-            try:
-                if isinstance(v, (int, float)):
-                    numeric_values.append(float(v))
-                else:
-                    numeric_values.append(float(str(v)))
-            except (ValueError, TypeError):
-                continue
+        values = np.asarray(numbers, dtype=np.float64)
+        weights = np.asarray(weights, dtype=np.float64)
+        if log_scale:
+            positive = values > 0
+            values, weights = np.log10(values[positive]), weights[positive]
+        histogram = []
+        if len(values):
+            counts, edges = np.histogram(values, bins=bins, weights=weights)
+            total = float(counts.sum())
+            labels = [10 ** edge for edge in edges] if log_scale else list(edges)
+            fmt = "{:.4g} - {:.4g}" if log_scale else "{:.2f} - {:.2f}"
+            histogram = [
+                {
+                    "range": fmt.format(labels[i], labels[i + 1]),
+                    "percentage": float(count) / total * 100
+                }
+                for i, count in enumerate(counts)
+            ]
         
-        if not numeric_values:
+        return {
+            "min": min(numbers),
+            "max": max(numbers),
+            "mean": mean["estimate"],
+            "mean_ci": [mean["ci_low"], mean["ci_high"]],
+            "median": median["estimate"],
+            "median_ci": [median["ci_low"], median["ci_high"]],
+            "std_dev": mean["std_dev"],
+            "variance": mean["std_dev"] ** 2,
+            "q1": q1["estimate"],
+            "q3": q3["estimate"],
+            "percentile_95": p95["estimate"],
+            "percentile_99": p99["estimate"],
+            "histogram": histogram,
+            "histogram_scale": "log" if log_scale else "linear"
+        }
+    
+    def _sample_value_weights(self, values: List[str], positions: List[int], weights) -> List[tuple]:
+        """(value, total weight) for values found in more than one distinct row, heaviest first"""
+        value_weights: Dict[str, float] = {}
+        rows: Dict[str, set] = {}
+        for value, position, weight in zip(values, positions, weights):
+            value_weights[value] = value_weights.get(value, 0.0) + weight
+            rows.setdefault(value, set()).add(position)
+        repeated = [(value, weight) for value, weight in value_weights.items() if len(rows[value]) > 1]
+        return sorted(repeated, key=lambda item: item[1], reverse=True)
+    
+    def _sample_distinct(self, sample: RecordSample, column: str, population: int) -> int:
+        """Distinct non-null values of a column, estimated from the sample's distinct rows"""
+        rows = {}
+        for position, record in zip(sample.positions, sample.records):
+            value = record.get(column)
+            if value is not None and value != '':
+                rows[position] = str(value)
+        return min(estimate_distinct(list(rows.values()), population), population)
+    
+    def _analyze_numeric_column(self, accumulator: ColumnAccumulator, bins: int = 20,
+                                log_scale: bool = False) -> Dict[str, Any]:
+        """Analyze numeric column from streaming accumulators"""
+        running = accumulator.numeric_stats
+        if running.count == 0:
             return {}
         
-        # Calculate statistics
-        sorted_values = sorted(numeric_values)
+        # Quantiles come from the KLL sketch (about 1.65% rank error)
+        median, q1, q3, p95, p99 = accumulator.numeric_quantiles.quantiles([0.5, 0.25, 0.75, 0.95, 0.99])
+        
+        # Mode only when some value repeats
+        mode = None
+        top_values = accumulator.value_counts.most_common(1, guaranteed=True)
+        if top_values and top_values[0][1] > 1:
+            try:
+                mode = float(top_values[0][0])
+            except ValueError:
+                mode = None
         
         stats = {
-            "min": min(numeric_values),
-            "max": max(numeric_values),
-            "mean": statistics.mean(numeric_values),
-            "median": statistics.median(numeric_values),
-            "mode": statistics.mode(numeric_values) if len(set(numeric_values)) < len(numeric_values) else None,
-            "std_dev": statistics.stdev(numeric_values) if len(numeric_values) > 1 else 0,
-            "variance": statistics.variance(numeric_values) if len(numeric_values) > 1 else 0
+            "min": running.min,
+            "max": running.max,
+            "mean": running.mean,
+            "median": median,
+            "mode": mode,
+            "std_dev": running.std_dev,
+            "variance": running.variance
         }
         
         # Percentiles
         stats.update({
-            "q1": sorted_values[len(sorted_values) // 4],
-            "q3": sorted_values[3 * len(sorted_values) // 4],
-            "percentile_95": sorted_values[int(0.95 * len(sorted_values))],
-            "percentile_99": sorted_values[int(0.99 * len(sorted_values))]
+            "q1": q1,
+            "q3": q3,
+            "percentile_95": p95,
+            "percentile_99": p99
         })
         
         # Distribution
-        hist_bins = self._create_histogram(numeric_values, 20)
-        stats["histogram"] = hist_bins
+        if log_scale:
+            stats["histogram"] = self._create_log_histogram(accumulator.log_histogram, bins)
+        else:
+            stats["histogram"] = self._create_histogram(accumulator.histogram, bins)
+        stats["histogram_scale"] = "log" if log_scale else "linear"
         
         return {"numeric_stats": stats}
     
-    def _analyze_date_column(self, values: List[Any]) -> Dict[str, Any]:
-        """Analyze date column"""
-        # Simple date analysis
-        date_strings = [str(v) for v in values if v is not None]
+    def _analyze_date_column(self, accumulator: ColumnAccumulator) -> Dict[str, Any]:
+        """Analyze date column from its parsed epoch-second profiles"""
+        accumulator.flush()
+        parser = accumulator.timestamps
+        histogram = accumulator.time_histogram
         
-        if not date_strings:
+        if not accumulator.date_samples:
             return {}
         
-        return {
-            "date_range": {
-                "earliest": min(date_strings),
-                "latest": max(date_strings),
-                "span_days": "N/A"  # Would need proper date parsing
-            },
-            "sample_formats": list(set(date_strings[:10]))
+        analysis = {
+            "parsed_count": histogram.count,
+            "unparsed_count": parser.failures,
+            "formats": dict(parser.format_counts.most_common()),
+            "sample_formats": accumulator.date_samples
         }
+        if histogram.count:
+            analysis["date_range"] = {
+                "earliest": format_timestamp(accumulator.earliest),
+                "latest": format_timestamp(accumulator.latest),
+                "span_days": (accumulator.latest - accumulator.earliest) / 86400
+            }
+            analysis["hour_of_day"] = [
+                {"hour": hour, "count": int(count)} for hour, count in enumerate(accumulator.hour_of_day)
+            ]
+            analysis["day_of_week"] = [
+                {"day": day, "count": int(count)} for day, count in zip(self.WEEKDAYS, accumulator.day_of_week)
+            ]
+        return analysis
     
-    def _analyze_common(self, values: List[Any]) -> Dict[str, Any]:
-        """Common analysis for all data types"""
-        if not values:
+    def _analyze_common(self, value_counts: SpaceSaving, distinct: HyperLogLog) -> Dict[str, Any]:
+        """Common analysis for all data types.
+        
+        Top values come from a Space-Saving summary and report guaranteed
+        (lower bound) counts, within non_null_count / capacity of the truth;
+        least common values are only reported while the summary is exact.
+        """
+        total_values = value_counts.total
+        if not total_values:
             return {}
         
-        # Value frequency
-        value_counts = Counter(str(v) for v in values)
-        unique_count = len(value_counts)
+        # Distinct count from HyperLogLog (about 0.81% standard error)
+        unique_count = min(distinct.estimate(), total_values)
         
         return {
             "unique_count": unique_count,
-            "unique_percentage": (unique_count / len(values)) * 100,
-            "most_common_values": value_counts.most_common(10),
-            "least_common_values": value_counts.most_common()[-10:] if len(value_counts) > 10 else []
+            "unique_percentage": (unique_count / total_values) * 100,
+            "most_common_values": value_counts.most_common(10, guaranteed=True),
+            "least_common_values": value_counts.least_common(10) if len(value_counts) > 10 else []
         }
     
-    def _create_histogram(self, values: List[float], bins: int = 20) -> List[Dict[str, Any]]:
-        """Create histogram data"""
-        if not values:
+    def _create_histogram(self, histogram: StreamingHistogram, bins: int = 20) -> List[Dict[str, Any]]:
+        """Create histogram data by re-binning the streaming histogram"""
+        if histogram.count == 0:
             return []
         
-        min_val = min(values)
-        max_val = max(values)
+        min_val = histogram.min
+        max_val = histogram.max
+        total = histogram.count
         
         if min_val == max_val:
-            return [{"range": f"{min_val}", "count": len(values)}]
+            return [{"range": f"{min_val}", "count": total}]
         
         bin_width = (max_val - min_val) / bins
-        histogram = []
+        edges = [min_val + i * bin_width for i in range(bins)] + [max_val]
+        counts = histogram.bin_counts(edges)
+        
+        return [
+            {
+                "range": f"{edges[i]:.2f} - {edges[i + 1]:.2f}",
+                "count": count,
+                "percentage": (count / total) * 100
+            }
+            for i, count in enumerate(counts)
+        ]
+    
+    def _create_log_histogram(self, histogram: StreamingHistogram, bins: int = 20) -> List[Dict[str, Any]]:
+        """Create log-scale histogram data (positive values only) from a histogram of log10 values"""
+        if histogram.count == 0:
+            return []
+        
+        min_exp = histogram.min
+        max_exp = histogram.max
+        total = histogram.count
+        
+        if min_exp == max_exp:
+            return [{"range": f"{10 ** min_exp:.4g}", "count": total}]
+        
+        bin_width = (max_exp - min_exp) / bins
+        edges = [min_exp + i * bin_width for i in range(bins)] + [max_exp]
+        counts = histogram.bin_counts(edges)
+        
+        return [
+            {
+                "range": f"{10 ** edges[i]:.4g} - {10 ** edges[i + 1]:.4g}",
+                "count": count,
+                "percentage": (count / total) * 100
+            }
+            for i, count in enumerate(counts)
+        ]
+    
+    def _create_time_histogram(self, histogram: StreamingHistogram, time_bucket: str = "auto") -> Dict[str, Any]:
+        """Create hour/day/week buckets from a histogram of hours since the epoch.
+        
+        Bucket edges are whole hours, so they fall on the histogram's
+        power-of-two grid and counts are exact for spans up to about 15 years.
+        """
+        if histogram.count == 0:
+            return {"bucket": None, "bins": []}
+        
+        # Use the requested (or finest) bucket that keeps the bucket count manageable
+        names = list(self.TIME_BUCKETS)
+        span = histogram.max - histogram.min
+        bucket = names[names.index(time_bucket)] if time_bucket in self.TIME_BUCKETS else names[0]
+        for name in names[names.index(bucket):]:
+            bucket = name
+            if span / self.TIME_BUCKETS[name] <= self.MAX_TIME_BUCKETS:
+                break
+        width = self.TIME_BUCKETS[bucket]
+        
+        # Weeks start on Monday (the epoch was a Thursday)
+        anchor = 4 * 24 if bucket == "week" else 0
+        first = math.floor((histogram.min - anchor) / width) * width + anchor
+        num_buckets = int((histogram.max - first) // width) + 1
+        edges = [first + i * width for i in range(num_buckets + 1)]
+        counts = histogram.bin_counts(edges)
+        
+        return {
+            "bucket": bucket,
+            "bins": [
+                {
+                    "start": format_timestamp(edges[i] * 3600),
+                    "end": format_timestamp(edges[i + 1] * 3600),
+                    "count": count,
+                    "percentage": (count / histogram.count) * 100
+                }
+                for i, count in enumerate(counts)
+            ]
+        }
+    
+    def get_histogram(self, file_id: str, column: str, bins: int = 20, log_scale: bool = False,
+                      time_bucket: str = "auto") -> Optional[Dict[str, Any]]:
+        """Re-bin the histograms of a completed column analysis"""
+        entry = self._load_result(file_id, "column", column)
+        if not entry or entry[1] is None:
+            return None
+        # Histograms not kept for the column's type are empty
+        histograms = {
+            name: StreamingHistogram.from_state(entry[1][name]) if name in entry[1] else StreamingHistogram()
+            for name in ("linear", "log", "time")
+        }
+        
+        if log_scale:
+            histogram = self._create_log_histogram(histograms["log"], bins)
+        else:
+            histogram = self._create_histogram(histograms["linear"], bins)
+        
+        return {
+            "column": column,
+            "histogram": histogram,
+            "histogram_scale": "log" if log_scale else "linear",
+            "time_histogram": self._create_time_histogram(histograms["time"], time_bucket)
+        }
+    
+    def get_cached_analysis(self, file_id: str, column: str, bins: Optional[int] = None,
+                            log_scale: bool = False, time_bucket: str = "auto") -> Optional[Dict[str, Any]]:
+        """Get cached analysis result, re-binning its histograms when bins is given"""
+        entry = self._load_result(file_id, "column", column)
+        if entry is None:
+            return None
+        analysis = entry[0]
+        if bins is None:
+            return analysis
+        
+        rebinned = self.get_histogram(file_id, column, bins, log_scale, time_bucket)
+        if not rebinned:
+            return analysis
+        
+        analysis = dict(analysis)
+        if "numeric_stats" in analysis:
+            analysis["numeric_stats"] = {
+                **analysis["numeric_stats"],
+                "histogram": rebinned["histogram"],
+                "histogram_scale": rebinned["histogram_scale"]
+            }
+        if "time_histogram" in analysis:
+            analysis["time_histogram"] = rebinned["time_histogram"]
+        return analysis
+    
+    def _correlation_columns(self, metadata, columns: Optional[List[str]]) -> tuple:
+        """Split requested columns (all when None) into numeric and categorical columns"""
+        column_infos = {col.name: col for col in metadata.columns}
+        if columns is None:
+            columns = list(column_infos)
+        missing = [column for column in columns if column not in column_infos]
+        if missing:
+            raise ValueError(f"Columns not found: {', '.join(missing)}")
+        
+        numeric = [column for column in columns if column_infos[column].data_type == DataType.NUMBER]
+        categorical = [column for column in columns
+                       if column_infos[column].data_type in (DataType.STRING, DataType.BOOLEAN)]
+        return numeric, categorical
+    
+    def _correlation_key(self, columns: Optional[List[str]], methods: List[str], max_categories: int,
+                         include_tables: bool) -> str:
+        return json.dumps({
+            "columns": sorted(columns) if columns is not None else None,
+            "methods": sorted(methods),
+            "max_categories": max_categories,
+            "include_tables": include_tables
+        }, sort_keys=True)
+    
+    def get_cached_correlations(self, file_id: str, columns: Optional[List[str]] = None,
+                                methods: Optional[List[str]] = None, max_categories: int = 50,
+                                include_tables: bool = False) -> Optional[Dict[str, Any]]:
+        """Get stored correlation analysis for the file's current contents"""
+        key = self._correlation_key(columns, methods or ["pearson", "spearman"], max_categories, include_tables)
+        entry = self._load_result(file_id, "correlation", key)
+        return entry[0] if entry else None
+    
+    def analyze_correlations(self, file_id: str, columns: Optional[List[str]] = None,
+                             methods: Optional[List[str]] = None, max_categories: int = 50,
+                             include_tables: bool = False) -> str:
+        """Start cross-column correlation and contingency analysis task"""
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {file_id}")
+        methods = methods or ["pearson", "spearman"]
+        unknown = [method for method in methods if method not in ("pearson", "spearman")]
+        if unknown:
+            raise ValueError(f"Unknown correlation methods: {', '.join(unknown)}")
+        self._correlation_columns(metadata, columns)
         
-        for i in range(bins):
-            bin_start = min_val + i * bin_width
-            bin_end = bin_start + bin_width
+        return task_manager.submit_task(
+            self._analyze_correlations_task,
+            "Correlation analysis",
+            file_id, columns, methods, max_categories, include_tables
+        )
+    
+    def _analyze_correlations_task(self, task_id: str, file_id: str, columns: Optional[List[str]],
+                                   methods: List[str], max_categories: int,
+                                   include_tables: bool) -> Dict[str, Any]:
+        """Background task computing correlations and contingency tables in one pass"""
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {file_id}")
+        
+        numeric, categorical = self._correlation_columns(metadata, columns)
+        
+        # Shift numeric values by their sample means to keep the co-moment sums well conditioned
+        shifts = []
+        for column in numeric:
+            sample_values = []
+            for record in metadata.sample_data:
+                value = record.get(column)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    sample_values.append(float(value))
+            shifts.append(statistics.fmean(sample_values) if sample_values else 0.0)
+        
+        task_manager.update_progress(task_id, 5)
+        
+        accumulator = accumulate_correlations(
+            metadata.file_path,
+            numeric,
+            categorical,
+            shifts,
+            max_categories,
+            settings.correlation_sample_size if "spearman" in methods else 0,
+            settings.analysis_workers or settings.max_workers,
+            settings.analysis_shard_min_bytes,
+            metadata.total_records,
+            lambda fraction: task_manager.update_progress(task_id, 5 + fraction * 85)
+        )
+        
+        result = {
+            "total_records": accumulator.total_count,
+            "numeric_columns": numeric,
+            "categorical_columns": [
+                column for index, column in enumerate(categorical) if not accumulator.overflowed[index]
+            ],
+            "skipped_columns": {
+                column: f"more than {max_categories} distinct values"
+                for index, column in enumerate(categorical) if accumulator.overflowed[index]
+            },
+            "contingency": accumulator.contingency(include_tables)
+        }
+        if "pearson" in methods:
+            result["pearson"] = accumulator.pearson()
+        if "spearman" in methods:
+            result["spearman"] = accumulator.spearman()
+        
+        self._save_result(file_id, "correlation",
+                          self._correlation_key(columns, methods, max_categories, include_tables), result)
+        
+        task_manager.update_progress(task_id, 100)
+        return result
+    
+    def get_dataset_overview(self, file_id: str, approximate: bool = False) -> Dict[str, Any]:
+        """Generate comprehensive dataset overview.
+        
+        With approximate, an estimate from a random record sample is returned
+        immediately while the exact overview is computed in the background.
+        """
+        cached = self._load_result(file_id, "overview")
+        if cached:
+            return cached[0]
+        
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {file_id}")
+        
+        if not approximate:
+            return self._compute_dataset_overview(file_id)
+        
+        sample = self._get_sample(file_id, metadata.file_path)
+        overview = self._approximate_dataset_overview(metadata, sample)
+        
+        with self._lock:
+            task_id = self.overview_tasks.get(file_id)
+            if not task_id:
+                task_id = task_manager.submit_task(
+                    self._dataset_overview_task,
+                    "Dataset overview",
+                    file_id
+                )
+                self.overview_tasks[file_id] = task_id
+        overview["task_id"] = task_id
+        return overview
+    
+    def _dataset_overview_task(self, task_id: str, file_id: str) -> Dict[str, Any]:
+        """Background task computing the exact dataset overview"""
+        try:
+            return self._compute_dataset_overview(file_id)
+        finally:
+            with self._lock:
+                self.overview_tasks.pop(file_id, None)
+    
+    def _approximate_dataset_overview(self, metadata, sample: RecordSample) -> Dict[str, Any]:
+        """Dataset overview estimated from a weighted record sample"""
+        total_records, total_records_ci = self._estimate_total_records(metadata, sample)
+        weights = sample.weights
+        columns = [col.name for col in metadata.columns]
+        
+        # Null matrix: one row per sampled record, one column per schema column
+        nulls = np.array([
+            [record.get(col_name) is None or record.get(col_name) == '' for col_name in columns]
+            for record in sample.records
+        ], dtype=bool).reshape(len(sample.records), len(columns))
+        
+        column_stats = []
+        for index, col in enumerate(metadata.columns):
+            null_share = weighted_proportion(nulls[:, index], weights)
+            non_null_count = round(total_records * (1 - null_share["estimate"]))
+            present_values = [str(record[col.name]) for record, is_null in zip(sample.records, nulls[:, index])
+                              if not is_null]
+            present_positions = [position for position, is_null in zip(sample.positions, nulls[:, index])
+                                 if not is_null]
             
-            count = sum(1 for v in values if bin_start <= v < bin_end)
-            if i == bins - 1:  # Include max value in last bin
-                count = sum(1 for v in values if bin_start <= v <= bin_end)
+            top_values = []
+            if present_values:
+                present_weights = weights[~nulls[:, index]]
+                present_total = float(present_weights.sum())
+                top_values = [
+                    {'value': value, 'count': round(weight / present_total * non_null_count)}
+                    for value, weight in self._sample_value_weights(present_values, present_positions, present_weights)[:5]
+                ]
             
-            histogram.append({
-                "range": f"{bin_start:.2f} - {bin_end:.2f}",
-                "count": count,
-                "percentage": (count / len(values)) * 100
+            column_stats.append({
+                'name': col.name,
+                'data_type': col.data_type.value,
+                'null_count': round(total_records * null_share["estimate"]),
+                'null_ratio': null_share["estimate"],
+                'null_ratio_ci': [null_share["ci_low"], null_share["ci_high"]],
+                'unique_count': self._sample_distinct(sample, col.name, non_null_count),
+                'top_values': top_values
             })
         
-        return histogram
-    
-    def get_cached_analysis(self, file_id: str, column: str) -> Optional[Dict[str, Any]]:
-        """Get cached analysis result"""
-        cache_key = f"{file_id}_{column}"
-        return self.analysis_cache.get(cache_key)
+        total_weight = float(weights.sum())
+        if total_weight and columns:
+            null_ratio = float((nulls.mean(axis=1) * weights).sum()) / total_weight
+        else:
+            null_ratio = 0.0
+        empty_rows = weighted_proportion(nulls.all(axis=1), weights) if columns else {"estimate": 0.0}
+        
+        type_distribution = {}
+        for col in metadata.columns:
+            data_type = col.data_type.value
+            type_distribution[data_type] = type_distribution.get(data_type, 0) + 1
+        
+        return {
+            'approximate': True,
+            'sampling': {
+                'method': sample.method,
+                'sample_size': len(sample),
+                'effective_sample_size': sample.effective_size,
+                'confidence_level': 0.95
+            },
+            'basic_info': {
+                'total_records': total_records,
+                'total_records_ci': total_records_ci,
+                'total_columns': len(metadata.columns),
+                'file_size': metadata.file_size
+            },
+            'data_quality': {
+                'total_null_ratio': null_ratio,
+                'empty_rows': round(total_records * empty_rows["estimate"]),
+                'empty_columns': sum(1 for stats in column_stats if stats['null_ratio'] == 1.0),
+                'completeness_score': 1.0 - null_ratio
+            },
+            'column_stats': column_stats,
+            'type_distribution': type_distribution
+        }
     
-    def get_dataset_overview(self, file_id: str) -> Dict[str, Any]:
-        """Generate comprehensive dataset overview"""
+    def _compute_dataset_overview(self, file_id: str) -> Dict[str, Any]:
+        """Exact dataset overview in one pass over the file.
+        
+        Column unique counts are HyperLogLog estimates (about 0.81% standard error)
+        and top values come from a 100-entry Space-Saving summary per column.
+        """
         metadata = file_loader_service.get_file_metadata(file_id)
         if not metadata:
             raise ValueError(f"File not found: {file_id}")
@@ -254,8 +939,8 @@ class AnalysisService:
             'name': col.name,
             'data_type': col.data_type.value,
             'null_count': 0,
-            'unique_values': set(),
-            'value_counts': Counter(),
+            'unique_values': HyperLogLog(),
+            'value_counts': SpaceSaving(100),
             'sample_values': []
         } for col in metadata.columns}
         
@@ -273,16 +958,11 @@ class AnalysisService:
                     null_cells += 1
                     row_null_count += 1
                 else:
-                    # Track unique values (limited to avoid memory issues)
-                    if len(column_stats[col_name]['unique_values']) < 10000:
-                        column_stats[col_name]['unique_values'].add(str(value))
+                    # Track distinct values in fixed memory
+                    column_stats[col_name]['unique_values'].add(str(value))
                     
-                    # Track value frequency (top 100)
-                    column_stats[col_name]['value_counts'][str(value)] += 1
-                    if len(column_stats[col_name]['value_counts']) > 100:
-                        # Keep only top values
-                        top_values = dict(column_stats[col_name]['value_counts'].most_common(50))
-                        column_stats[col_name]['value_counts'] = Counter(top_values)
+                    # Track heavy hitters in bounded memory
+                    column_stats[col_name]['value_counts'].add(str(value))
                     
                     # Sample values
                     if len(column_stats[col_name]['sample_values']) < 5:
@@ -296,8 +976,8 @@ class AnalysisService:
         processed_column_stats = []
         for col_name, stats in column_stats.items():
             null_ratio = stats['null_count'] / total_records if total_records > 0 else 0
-            unique_count = len(stats['unique_values'])
-            top_values = [{'value': k, 'count': v} for k, v in stats['value_counts'].most_common(5)]
+            unique_count = min(stats['unique_values'].estimate(), total_records - stats['null_count'])
+            top_values = [{'value': k, 'count': v} for k, v in stats['value_counts'].most_common(5, guaranteed=True)]
             
             processed_column_stats.append({
                 'name': col_name,
@@ -319,7 +999,7 @@ class AnalysisService:
             data_type = col.data_type.value
             type_distribution[data_type] = type_distribution.get(data_type, 0) + 1
         
-        return {
+        overview = {
             'basic_info': {
                 'total_records': total_records,
                 'total_columns': len(metadata.columns),
@@ -334,6 +1014,8 @@ class AnalysisService:
             'column_stats': processed_column_stats,
             'type_distribution': type_distribution
         }
+        self._save_result(file_id, "overview", "", overview)
+        return overview
 
     def analyze_data_quality(self, file_id: str) -> str:
         """Analyze overall data quality"""
@@ -344,6 +1026,11 @@ class AnalysisService:
         )
         return task_id
     
+    def get_cached_quality(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get stored data quality report for the file's current contents"""
+        entry = self._load_result(file_id, "quality")
+        return entry[0] if entry else None
+    
     def _analyze_data_quality_task(self, task_id: str, file_id: str) -> Dict[str, Any]:
         """Background task for data quality analysis"""
         metadata = file_loader_service.get_file_metadata(file_id)
@@ -354,39 +1041,45 @@ class AnalysisService:
         
         # Track quality metrics
         total_records = 0
-        duplicate_records = set()
         column_completeness = {col.name: 0 for col in metadata.columns}
-        record_hashes = set()
+        expected_records = (metadata.total_records if metadata.processing_status == "full_analysis_complete"
+                            else metadata.estimated_records or metadata.total_records)
+        duplicates = DuplicateDetector(
+            settings.quality_hash_bits,
+            settings.quality_memory_budget,
+            expected_records
+        )
         
         task_manager.update_progress(task_id, 10)
         
         for record in streamer.stream_records():
             total_records += 1
             
-            # Check for duplicates (simple hash)
-            record_str = str(sorted(record.items()))
-            record_hash = hash(record_str)
-            
-            if record_hash in record_hashes:
-                duplicate_records.add(record_hash)
-            else:
-                record_hashes.add(record_hash)
+            # Fingerprint for duplicate detection
+            duplicates.add(record)
             
             # Count non-null values per column
             for column in record:
-                if record[column] is not None:
+                if column in column_completeness and record[column] is not None:
                     column_completeness[column] += 1
             
             # Update progress
-            if total_records % 1000 == 0:
-                progress = 10 + (total_records / metadata.total_records) * 80
+            if total_records % 1000 == 0 and expected_records:
+                progress = 10 + min(1.0, total_records / expected_records) * 70
                 task_manager.update_progress(task_id, progress)
         
+        task_manager.update_progress(task_id, 80)
+        
+        # Group duplicates (Bloom mode re-reads the file for candidate rows)
+        duplicate_report = duplicates.result(streamer.stream_records, settings.quality_max_duplicate_groups)
+        duplicate_count = duplicate_report["duplicate_count"]
+        
         # Calculate quality metrics
         quality_report = {
             "total_records": total_records,
-            "duplicate_count": len(duplicate_records),
-            "duplicate_percentage": (len(duplicate_records) / total_records) * 100 if total_records > 0 else 0,
+            "duplicate_count": duplicate_count,
+            "duplicate_percentage": (duplicate_count / total_records) * 100 if total_records > 0 else 0,
+            "duplicates": duplicate_report,
             "column_completeness": {
                 col: {
                     "non_null_count": count,
@@ -395,10 +1088,12 @@ class AnalysisService:
                 for col, count in column_completeness.items()
             },
             "overall_quality_score": self._calculate_quality_score(
-                len(duplicate_records), total_records, column_completeness
+                duplicate_count, total_records, column_completeness
             )
         }
         
+        self._save_result(file_id, "quality", "", quality_report)
+        
         task_manager.update_progress(task_id, 100)
         return quality_report
     
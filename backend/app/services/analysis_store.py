@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+from ..core.config import settings
+
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024
+
+_fingerprints: Dict[str, Tuple[int, int, str]] = {}
+_fingerprints_lock = threading.Lock()
+
+def file_fingerprint(file_path: str) -> str:
+    """Content fingerprint from path, size, mtime and a hash of the file's head and tail.
+
+    Hashing is skipped while size and mtime are unchanged since the last call.
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+
+    with _fingerprints_lock:
+        known = _fingerprints.get(path)
+    if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+        return known[2]
+
+    digest = hashlib.sha256(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode('utf-8'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(FINGERPRINT_SAMPLE_BYTES, stat.st_size - FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+    fingerprint = digest.hexdigest()[:32]
+
+    with _fingerprints_lock:
+        _fingerprints[path] = (stat.st_size, stat.st_mtime_ns, fingerprint)
+    return fingerprint
+
+def sqlite_path(database_url: str) -> str:
+    """Filesystem path of a sqlite:/// database URL"""
+    prefix = "sqlite:///"
+    if not database_url.startswith(prefix) or len(database_url) == len(prefix):
+        raise ValueError(f"Unsupported database URL for the analysis store: {database_url}")
+    return database_url[len(prefix):]
+
+class AnalysisStore:
+    """SQLite-backed store of analysis results keyed by file fingerprint and analysis version.
+
+    Results and sketch states are stored as JSON, so loading an entry never
+    runs code. Least recently used entries are evicted beyond max_entries, and
+    results for a path are dropped as soon as a result for a new fingerprint
+    of it is saved.
+    """
+
+    def __init__(self, database_url: str, max_entries: int = 10000):
+        self.db_path = sqlite_path(database_url)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_results (
+                    fingerprint TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    path TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    sketches BLOB,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (fingerprint, kind, key, version)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_results_path ON analysis_results (path)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_results_accessed ON analysis_results (accessed_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:  # Commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, fingerprint: str, kind: str, key: str, version: int) -> Optional[Tuple[Any, Any]]:
+        """Return (result, sketches) and mark the entry as recently used; unreadable entries are misses"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT result, sketches FROM analysis_results "
+                "WHERE fingerprint = ? AND kind = ? AND key = ? AND version = ?",
+                (fingerprint, kind, key, version)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE analysis_results SET accessed_at = ? "
+                "WHERE fingerprint = ? AND kind = ? AND key = ? AND version = ?",
+                (time.time(), fingerprint, kind, key, version)
+            )
+
+        result, sketches = row
+        try:
+            return json.loads(result), json.loads(sketches) if sketches is not None else None
+        except ValueError:
+            return None
+
+    def put(self, fingerprint: str, path: str, kind: str, key: str, version: int, result: Any,
+            sketches: Any = None):
+        """Save a result and JSON-serializable sketch state, invalidating results of older contents
+        of the same path"""
+        now = time.time()
+        path = os.path.abspath(path)
+        payload = json.dumps(result, default=str)
+        blob = json.dumps(sketches).encode('utf-8') if sketches is not None else None
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM analysis_results WHERE path = ? AND fingerprint != ?",
+                (path, fingerprint)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_results "
+                "(fingerprint, kind, key, version, path, result, sketches, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, kind, key, version, path, payload, blob, now, now)
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        (count,) = conn.execute("SELECT COUNT(*) FROM analysis_results").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM analysis_results WHERE rowid IN ("
+                "SELECT rowid FROM analysis_results ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def invalidate(self, path: str) -> int:
+        """Drop every stored result for a path"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute("DELETE FROM analysis_results WHERE path = ?", (os.path.abspath(path),))
+            return cursor.rowcount
+
+# Global store instance
+analysis_store = AnalysisStore(settings.database_url, settings.analysis_store_max_entries)
@@ -1,10 +1,30 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterator, Optional
 import math
+from ..core.config import settings
 from ..models.file_info import DataChunk
 from ..models.filter import DataRequest, FilterRequest, SortRule, SortOrder
+from ..processors.external_sort import external_sort
 from ..processors.jsonl_streamer import JSONLStreamer
 from ..services.file_loader import file_loader_service
 
+class _SortKey:
+    """Composite sort key comparing per-rule keys in rule order, each in its own direction"""
+
+    __slots__ = ('values', 'descending')
+
+    def __init__(self, values: tuple, descending: tuple):
+        self.values = values
+        self.descending = descending
+
+    def __lt__(self, other: '_SortKey') -> bool:
+        for value, other_value, descending in zip(self.values, other.values, self.descending):
+            if value != other_value:
+                return value > other_value if descending else value < other_value
+        return False
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _SortKey) and self.values == other.values
+
 class DataService:
     """Service for retrieving and processing JSONL data"""
 
@@ -69,6 +89,38 @@ class DataService:
             has_prev=request.page > 1
         )
 
+    def iter_records(self, request: DataRequest,
+                     progress_callback: Optional[Callable[[float], None]] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the full filtered, searched and sorted result of a request (pagination ignored).
+
+        Filters and search are applied record by record; sorting is an external
+        merge sort, so memory stays bounded however large the result is.
+        progress_callback receives the fraction of the file's records read.
+        """
+        metadata = file_loader_service.get_file_metadata(request.file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {request.file_id}")
+
+        records = JSONLStreamer(metadata.file_path).stream_records()
+        if progress_callback and metadata.total_records:
+            records = self._report_progress(records, metadata.total_records, progress_callback)
+        if request.filters:
+            records = (record for record in records if self._record_matches_filters(record, request.filters))
+        if request.search:
+            search_term = request.search.lower()
+            records = (record for record in records if self._record_matches_search(record, search_term))
+        if request.sort:
+            records = external_sort(records, self._sort_key(request.sort), settings.sort_run_records,
+                                    settings.cache_dir)
+        return records
+
+    def _report_progress(self, records: Iterator[Dict[str, Any]], total_records: int,
+                         progress_callback: Callable[[float], None]) -> Iterator[Dict[str, Any]]:
+        for count, record in enumerate(records, start=1):
+            if count % 10000 == 0:
+                progress_callback(min(1.0, count / total_records))
+            yield record
+
     def _apply_filters(self, records: List[Dict[str, Any]], filters: FilterRequest) -> List[Dict[str, Any]]:
         """Apply filters to records"""
         filtered_records = []
@@ -164,43 +216,47 @@ class DataService:
             return records
 
         search_term = search_term.lower()
-        filtered_records = []
-
-        for record in records:
-            for value in record.values():
-                if value is not None and search_term in str(value).lower():
-                    filtered_records.append(record)
-                    break
+        return [record for record in records if self._record_matches_search(record, search_term)]
 
-        return filtered_records
+    def _record_matches_search(self, record: Dict[str, Any], search_term: str) -> bool:
+        """Check if any value of the record contains the lowercased search term"""
+        for value in record.values():
+            if value is not None and search_term in str(value).lower():
+                return True
+        return False
 
     def _apply_sorting(self, records: List[Dict[str, Any]], sort_rules: List[SortRule]) -> List[Dict[str, Any]]:
         """Apply sorting to records by each SortRule sequentially"""
         if not sort_rules:
             return records
 
-        result = records[:]
-        for rule in reversed(sort_rules):
-            def sort_key(record, _rule=rule): # _rule을 사용하여 클로저 문제 방지
-                value = record.get(_rule.column)
-                if value is None:
-                    # None 값은 ASC 정렬 시 맨 앞, DESC 정렬 시 맨 뒤에 오도록 튜플의 첫 번째 요소로 제어
-                    if _rule.order == SortOrder.ASC:
-                        return (0, )
-                    else:
-                        return (2, ) # Type 2 for None in DESC
-
-                # 숫자 타입 시도
-                try:
-                    num_val = float(value)
-                    return (1, num_val) # Type 1 for numbers
-                except (ValueError, TypeError):
-                    # 문자열로 처리
-                    return (1, str(value).lower()) # Type 1 for strings too
-
-            result.sort(key=sort_key, reverse=rule.order == SortOrder.DESC)
-
-        return result
+        return sorted(records, key=self._sort_key(sort_rules))
+
+    def _sort_key(self, sort_rules: List[SortRule]) -> Callable[[Dict[str, Any]], _SortKey]:
+        """Key function ordering records by each SortRule in turn"""
+        descending = tuple(rule.order == SortOrder.DESC for rule in sort_rules)
+
+        def rule_key(record: Dict[str, Any], rule: SortRule) -> tuple:
+            value = record.get(rule.column)
+            if value is None:
+                # None 값은 ASC 정렬 시 맨 앞, DESC 정렬 시 맨 뒤에 오도록 튜플의 첫 번째 요소로 제어
+                if rule.order == SortOrder.ASC:
+                    return (0, )
+                else:
+                    return (2, ) # Type 2 for None in DESC
+
+            # 숫자 타입 시도
+            try:
+                num_val = float(value)
+                return (1, 0, num_val) # Type 1 for numbers
+            except (ValueError, TypeError):
+                # 문자열로 처리; numbers sort before strings so mixed columns stay comparable
+                return (1, 1, str(value).lower()) # Type 1 for strings too
+
+        def sort_key(record: Dict[str, Any]) -> _SortKey:
+            return _SortKey(tuple(rule_key(record, rule) for rule in sort_rules), descending)
+
+        return sort_key
 
 
 # Global service instance
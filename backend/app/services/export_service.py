@@ -1,150 +1,508 @@
 import json
 import csv
-import pandas as pd
-from io import StringIO, BytesIO
-from typing import List, Dict, Any, Optional
+import hashlib
+import itertools
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from io import StringIO
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 import zipfile
 import tempfile
+from ..core.config import settings
+from ..core.task_manager import TaskCancelled, task_manager
+from ..models.file_info import ColumnInfo, DataType, FileMetadata
 from ..models.filter import DataRequest
+from ..processors.columnar import arrow_schema, columnar_codec, write_columnar
+from ..processors.excel_writer import write_excel
+from ..processors.shard_writer import CODECS as SHARD_CODECS, Shard, ShardWriter, compressor, parallel_compress, partition_name
 from ..services.data_service import data_service
 from ..services.file_loader import file_loader_service
 
+EXPORT_SPOOL_DIR = "exports"  # Under settings.cache_dir
+COLUMN_SHARD_BUFFER_BYTES = 128 * 1024  # Per-shard buffer when partitioning by column (many shards are open)
+
+@dataclass
+class ExportJob:
+    id: str
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    path: Optional[Path] = None
+    task_id: Optional[str] = None
+    size: Optional[int] = None
+    etag: Optional[str] = None
+    created_at: float = None
+    completed_at: Optional[float] = None
+    expires_at: Optional[float] = None  # Set once the file is ready for download
+    cancelled: bool = False
+
 class ExportService:
     """Data export service supporting multiple formats"""
     
-    async def export_data(self, request: DataRequest, format: str, include_stats: bool = False) -> Dict[str, Any]:
-        """Export data in specified format"""
-        # Get data
-        data_chunk = await data_service.get_data_chunk(request)
+    def __init__(self):
+        self.jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+    
+    async def export_data(self, request: DataRequest, format: str, include_stats: bool = False,
+                          compression: Optional[str] = None, row_group_size: Optional[int] = None,
+                          partition_by: Optional[str] = None, partition_size: Optional[int] = None,
+                          partition_column: Optional[str] = None) -> Dict[str, Any]:
+        """Export the full filtered and sorted result in specified format.
+
+        Every format is returned as a lazy "stream" of byte chunks using
+        bounded memory. Text formats are chunked to about
+        settings.export_chunk_bytes; Parquet and Arrow are written in row
+        groups of row_group_size rows with the given codec. For text formats
+        compression is gzip or zstd stream compression, and JSONL and CSV can
+        be partitioned into shard files delivered as a zip.
+
+        Options are validated before the stream is built, so invalid requests
+        raise ValueError here. Each stream yields its first chunk before it
+        reads any records, and only that chunk is pulled before returning.
+        Excel is the exception: the workbook is only readable once complete,
+        so files above settings.export_sync_excel_max_records records are
+        refused here and must be exported through submit_job. So is
+        partitioning by column, whose zip is only written after every record.
+        """
+        if partition_by == 'column':
+            raise ValueError("Exports partitioned by column must use /export/jobs")
+        if format.lower() == 'excel':
+            metadata = file_loader_service.get_file_metadata(request.file_id)
+            records = max(metadata.total_records, metadata.estimated_records or 0) if metadata else 0
+            if records > settings.export_sync_excel_max_records:
+                raise ValueError(
+                    f"Excel exports of more than {settings.export_sync_excel_max_records} records "
+                    f"must use /export/jobs"
+                )
+        result = self._build_export(request, format, include_stats, compression, row_group_size,
+                                    partition_by, partition_size, partition_column)
+        result["stream"] = await run_in_threadpool(prime_stream, result["stream"])
+        return result
+    
+    def _build_export(self, request: DataRequest, format: str, include_stats: bool = False,
+                      compression: Optional[str] = None, row_group_size: Optional[int] = None,
+                      partition_by: Optional[str] = None, partition_size: Optional[int] = None,
+                      partition_column: Optional[str] = None,
+                      progress_callback: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
         metadata = file_loader_service.get_file_metadata(request.file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {request.file_id}")
+        format = format.lower()
+        if format not in ('json', 'jsonl', 'csv', 'parquet', 'arrow', 'excel'):
+            raise ValueError(f"Unsupported format: {format}")
+        if partition_by and format not in ('jsonl', 'csv'):
+            raise ValueError("Partitioned export supports the jsonl and csv formats")
+        if compression and format == 'excel':
+            raise ValueError("Excel export does not support compression")
+        if compression and format not in ('parquet', 'arrow'):
+            compressor(compression)  # Validate the codec before the export starts
+        records = data_service.iter_records(request, progress_callback)
+        
+        if partition_by:
+            return self._export_partitioned(records, metadata, format, compression, partition_by,
+                                            partition_size, partition_column)
+        if format in ('parquet', 'arrow'):
+            return self._export_columnar(records, metadata, format, compression, row_group_size)
+        if format == 'excel':
+            return self._export_excel(records, metadata, include_stats)
         
-        if format.lower() == 'json':
-            return await self._export_json(data_chunk.data, metadata.filename, include_stats)
-        elif format.lower() == 'jsonl':
-            return await self._export_jsonl(data_chunk.data, metadata.filename, include_stats)
-        elif format.lower() == 'csv':
-            return await self._export_csv(data_chunk.data, metadata.filename, include_stats)
-        elif format.lower() == 'excel':
-            return await self._export_excel(data_chunk.data, metadata.filename, include_stats)
+        if format == 'json':
+            result = self._export_json(records, metadata.filename)
+        elif format == 'jsonl':
+            result = self._export_jsonl(records, metadata.filename)
         else:
-            raise ValueError(f"Unsupported format: {format}")
+            result = self._export_csv(records, metadata)
+        if compression:
+            suffix, content_type = SHARD_CODECS[compression]
+            result["stream"] = parallel_compress(result["stream"], compression, self._workers())
+            result["content_type"] = content_type
+            result["filename"] += suffix
+        return result
+    
+    def _workers(self) -> int:
+        return settings.export_workers or settings.max_workers
+    
+    def _chunked(self, pieces: Iterable[str], lead: str = '') -> Iterator[bytes]:
+        """Encode text pieces and group them into chunks of about settings.export_chunk_bytes.
+        
+        lead (a header, possibly empty) is yielded as the first chunk before
+        any piece is pulled, so the download starts before the records are read.
+        """
+        yield lead.encode('utf-8')
+        buffer: List[bytes] = []
+        buffered = 0
+        for piece in pieces:
+            data = piece.encode('utf-8')
+            buffer.append(data)
+            buffered += len(data)
+            if buffered >= settings.export_chunk_bytes:
+                yield b''.join(buffer)
+                buffer = []
+                buffered = 0
+        if buffer:
+            yield b''.join(buffer)
     
-    async def _export_json(self, data: List[Dict[str, Any]], filename: str, include_stats: bool) -> Dict[str, Any]:
+    def _export_json(self, records: Iterator[Dict[str, Any]], filename: str) -> Dict[str, Any]:
         """Export as JSON"""
-        output = StringIO()
-        json.dump(data, output, indent=2, default=str)
-        content = output.getvalue()
+        def pieces() -> Iterator[str]:
+            separator = '\n  '
+            for record in records:
+                yield separator
+                # Indent each record as one element of an indented array
+                yield json.dumps(record, indent=2, default=str).replace('\n', '\n  ')
+                separator = ',\n  '
+            yield ']' if separator == '\n  ' else '\n]'
         
         return {
-            "content": content,
+            "stream": self._chunked(pieces(), '['),
             "content_type": "application/json",
-            "filename": f"{Path(filename).stem}_export.json",
-            "size": len(content.encode('utf-8'))
+            "filename": f"{Path(filename).stem}_export.json"
         }
     
-    async def _export_jsonl(self, data: List[Dict[str, Any]], filename: str, include_stats: bool) -> Dict[str, Any]:
-        """Export as JSONL"""
-        output = StringIO()
-        for record in data:
-            output.write(json.dumps(record, default=str) + '\n')
-        content = output.getvalue()
-        
-        return {
-            "content": content,
-            "content_type": "application/jsonl",
-            "filename": f"{Path(filename).stem}_export.jsonl",
-            "size": len(content.encode('utf-8'))
-        }
+    def _export_columns(self, records: Iterator[Dict[str, Any]],
+                        metadata: FileMetadata) -> Tuple[List[str], Iterator[Dict[str, Any]]]:
+        """Top-level columns covering every key of the records, and the records to write.
+
+        Full analysis leaves metadata.columns with every top-level key of the
+        file, so it is used as is. Until then the columns come from a sample,
+        and keys it lacks are appended after them rather than dropped: finding
+        those takes a full pass, so the records are spilled to a temporary
+        file and replayed.
+        """
+        names = [column.name for column in metadata.columns]
+        if metadata.processing_status == "full_analysis_complete":
+            return names, records
+        known = set(names)
+        extra = set()
+        spool = tempfile.TemporaryFile(dir=settings.cache_dir)
+        try:
+            for record in records:
+                extra.update(key for key in record if key not in known)
+                spool.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+            spool.seek(0)
+        except BaseException:
+            spool.close()
+            raise
+        return names + sorted(extra), self._replay(spool)
     
-    async def _export_csv(self, data: List[Dict[str, Any]], filename: str, include_stats: bool) -> Dict[str, Any]:
-        """Export as CSV"""
-        if not data:
-            return {"content": "", "content_type": "text/csv", "filename": f"{Path(filename).stem}_export.csv", "size": 0}
-        
-        # Get all columns
-        all_columns = set()
-        for record in data:
-            all_columns.update(record.keys())
-        columns = sorted(all_columns)
+    def _replay(self, spool) -> Iterator[Dict[str, Any]]:
+        try:
+            for line in spool:
+                yield json.loads(line)
+        finally:
+            spool.close()
+    
+    def _line_encoder(self, format: str, columns: List[str]) -> Tuple[str, Callable[[Dict[str, Any]], str]]:
+        """Header and per-record encoder of a line-oriented format (jsonl or csv)"""
+        if format == 'jsonl':
+            return '', lambda record: json.dumps(record, default=str) + '\n'
         
         output = StringIO()
         writer = csv.DictWriter(output, fieldnames=columns)
         writer.writeheader()
+        header = output.getvalue()
         
-        for record in data:
+        def encode(record: Dict[str, Any]) -> str:
+            output.seek(0)
+            output.truncate()
             # Convert complex objects to strings
-            clean_record = {}
-            for col in columns:
-                value = record.get(col)
-                if isinstance(value, (dict, list)):
-                    clean_record[col] = json.dumps(value, default=str)
-                else:
-                    clean_record[col] = value
-            writer.writerow(clean_record)
+            writer.writerow({
+                col: json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+                for col, value in record.items()
+            })
+            return output.getvalue()
         
-        content = output.getvalue()
+        return header, encode
+    
+    def _export_jsonl(self, records: Iterator[Dict[str, Any]], filename: str) -> Dict[str, Any]:
+        """Export as JSONL"""
+        _, encode = self._line_encoder('jsonl', [])
+        return {
+            "stream": self._chunked(map(encode, records)),
+            "content_type": "application/jsonl",
+            "filename": f"{Path(filename).stem}_export.jsonl"
+        }
+    
+    def _export_csv(self, records: Iterator[Dict[str, Any]], metadata: FileMetadata) -> Dict[str, Any]:
+        """Export as CSV with one column per top-level field of the file's schema or its records"""
+        def stream() -> Iterator[bytes]:
+            columns, rows = self._export_columns(records, metadata)
+            header, encode = self._line_encoder('csv', columns)
+            yield from self._chunked(map(encode, rows), header)
         
         return {
-            "content": content,
+            "stream": stream(),
             "content_type": "text/csv",
-            "filename": f"{Path(filename).stem}_export.csv",
-            "size": len(content.encode('utf-8'))
+            "filename": f"{Path(metadata.filename).stem}_export.csv"
         }
     
-    async def _export_excel(self, data: List[Dict[str, Any]], filename: str, include_stats: bool) -> Dict[str, Any]:
-        """Export as Excel"""
-        if not data:
-            return {"content": b"", "content_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
-                   "filename": f"{Path(filename).stem}_export.xlsx", "size": 0}
+    def _export_partitioned(self, records: Iterator[Dict[str, Any]], metadata: FileMetadata, format: str,
+                            compression: Optional[str], partition_by: str, partition_size: Optional[int],
+                            partition_column: Optional[str]) -> Dict[str, Any]:
+        """Export JSONL or CSV split into shard files, delivered as a zip archive.
+
+        Shards hold partition_size records ("rows") or about partition_size
+        uncompressed bytes ("size") of the result in order, or every record
+        with one value of partition_column ("column"). Each shard is optionally
+        gzip/zstd compressed. Rows and size shards are added to the zip as
+        each one fills; column shards stay open until the last record, so
+        their zip is only written at the end and errors such as too many
+        column values are raised before any shard is sent.
+        """
+        if partition_by in ('rows', 'size'):
+            if not partition_size or partition_size <= 0:
+                raise ValueError(f"partition_size must be positive when partitioning by {partition_by}")
+        elif partition_by == 'column':
+            if not partition_column:
+                raise ValueError("partition_column is required when partitioning by column")
+        else:
+            raise ValueError(f"Unsupported partitioning: {partition_by} (expected rows, size or column)")
         
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
+        suffix = f".{format}" + (SHARD_CODECS[compression][0] if compression else "")
+        return {
+            "stream": self._partitioned_stream(records, metadata, format, compression, suffix,
+                                               partition_by, partition_size, partition_column),
+            "content_type": "application/zip",
+            "filename": f"{Path(metadata.filename).stem}_export.zip"
+        }
+    
+    def _partitioned_stream(self, records: Iterator[Dict[str, Any]], metadata: FileMetadata, format: str,
+                            compression: Optional[str], suffix: str, partition_by: str,
+                            partition_size: Optional[int], partition_column: Optional[str]) -> Iterator[bytes]:
+        columns: List[str] = []
+        if format == 'csv':
+            columns, records = self._export_columns(records, metadata)
+        header, encode = self._line_encoder(format, columns)
+        header_bytes = header.encode('utf-8')
+        if partition_by == 'column':
+            buffer_bytes = COLUMN_SHARD_BUFFER_BYTES
+        else:
+            buffer_bytes = settings.export_chunk_bytes
+        writer = ShardWriter(compression, self._workers(), buffer_bytes, settings.cache_dir)
+        try:
+            yield b''  # The zip starts with the first finished shard
+            by_value: Dict[Optional[str], Shard] = {}
+            shard = None
+            for record in records:
+                if partition_by == 'column':
+                    value = record.get(partition_column)
+                    key = value if value is None or isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+                    shard = by_value.get(key)
+                    if shard is None:
+                        if len(by_value) >= settings.export_max_partitions:
+                            raise ValueError(f"Column {partition_column} has more than "
+                                             f"{settings.export_max_partitions} distinct values")
+                        shard = by_value[key] = writer.open_shard(partition_name(partition_column, key), suffix,
+                                                                  header_bytes)
+                elif shard is None or (shard.rows if partition_by == 'rows' else shard.raw_bytes) >= partition_size:
+                    if shard is not None:
+                        yield from writer.zip_shard(shard, settings.export_chunk_bytes)
+                    shard = writer.open_shard(f"part-{len(writer.shards):05d}", suffix, header_bytes)
+                writer.write(shard, encode(record).encode('utf-8'))
+                shard.rows += 1
+            
+            yield from writer.stream_zip(settings.export_chunk_bytes)
+        finally:
+            writer.close()
+    
+    def _export_columnar(self, records: Iterator[Dict[str, Any]], metadata: FileMetadata, format: str,
+                         compression: Optional[str], row_group_size: Optional[int]) -> Dict[str, Any]:
+        """Export as Parquet or Arrow IPC with the schema detected for the file; keys missing from
+        a sampled schema are written as JSON text"""
+        row_group_size = row_group_size or settings.export_row_group_size
+        columnar_codec(format, compression, row_group_size)  # Validate before the stream starts
         
-        # Handle complex objects
-        for col in df.columns:
-            df[col] = df[col].apply(lambda x: json.dumps(x, default=str) if isinstance(x, (dict, list)) else x)
+        def stream() -> Iterator[bytes]:
+            names, rows = self._export_columns(records, metadata)
+            known = {column.name: column for column in metadata.columns}
+            columns = [known.get(name) or ColumnInfo(name=name, data_type=DataType.STRING) for name in names]
+            yield from write_columnar(rows, arrow_schema(columns, metadata.fields), format, compression,
+                                      row_group_size)
         
-        # Create Excel file in memory
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Data', index=False)
-            
-            if include_stats:
-                # Add basic stats sheet
-                stats_data = []
-                for col in df.columns:
-                    if df[col].dtype in ['int64', 'float64']:
-                        stats_data.append({
-                            'Column': col,
-                            'Type': 'Numeric',
-                            'Count': df[col].count(),
-                            'Mean': df[col].mean(),
-                            'Std': df[col].std(),
-                            'Min': df[col].min(),
-                            'Max': df[col].max()
-                        })
-                    else:
-                        stats_data.append({
-                            'Column': col,
-                            'Type': 'Text',
-                            'Count': df[col].count(),
-                            'Unique': df[col].nunique(),
-                            'Most_Common': df[col].mode().iloc[0] if not df[col].mode().empty else None
-                        })
-                
-                if stats_data:
-                    stats_df = pd.DataFrame(stats_data)
-                    stats_df.to_excel(writer, sheet_name='Statistics', index=False)
+        return {
+            "stream": stream(),
+            "content_type": "application/vnd.apache.parquet" if format == 'parquet' else "application/vnd.apache.arrow.file",
+            "filename": f"{Path(metadata.filename).stem}_export.{format}"
+        }
+    
+    def _export_excel(self, records: Iterator[Dict[str, Any]], metadata: FileMetadata,
+                      include_stats: bool) -> Dict[str, Any]:
+        """Export as Excel, one column per top-level field of the file's schema or its records.
         
-        content = output.getvalue()
+        The stream yields nothing until the whole workbook is written.
+        """
+        def stream() -> Iterator[bytes]:
+            columns, rows = self._export_columns(records, metadata)
+            yield from write_excel(rows, columns, include_stats, settings.cache_dir, settings.export_chunk_bytes)
         
         return {
-            "content": content,
+            "stream": stream(),
             "content_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            "filename": f"{Path(filename).stem}_export.xlsx",
-            "size": len(content)
+            "filename": f"{Path(metadata.filename).stem}_export.xlsx"
+        }
+
+    def submit_job(self, request: DataRequest, format: str, include_stats: bool = False,
+                   compression: Optional[str] = None, row_group_size: Optional[int] = None,
+                   partition_by: Optional[str] = None, partition_size: Optional[int] = None,
+                   partition_column: Optional[str] = None) -> ExportJob:
+        """Run an export in the background, spooling it to a file kept for settings.export_job_ttl seconds"""
+        self.expire_jobs()
+        job = ExportJob(id=uuid.uuid4().hex, created_at=time.time())
+        export = self._build_export(
+            request, format, include_stats, compression, row_group_size,
+            partition_by, partition_size, partition_column,
+            lambda fraction: self._report_progress(job, fraction)
+        )
+        
+        spool_dir = Path(settings.cache_dir) / EXPORT_SPOOL_DIR
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        job.filename = export["filename"]
+        job.content_type = export["content_type"]
+        job.path = spool_dir / f"{job.id}{Path(job.filename).suffix}"
+        with self._lock:
+            self.jobs[job.id] = job
+        job.task_id = task_manager.submit_task(self._run_job, f"Export to {job.filename}", job, export["stream"])
+        return job
+    
+    def _report_progress(self, job: ExportJob, fraction: float):
+        """Progress callback of a job's export; stops the scan once the job is cancelled"""
+        if job.cancelled:
+            raise TaskCancelled(f"Export job {job.id} was cancelled")
+        task_manager.update_progress(job.task_id, fraction * 99)
+    
+    def _run_job(self, task_id: str, job: ExportJob, stream: Iterator[bytes]) -> Dict[str, Any]:
+        """Write an export stream to the job's spool file (background task).
+
+        Cancellation is checked between chunks (and by the progress callback
+        during the scan); a cancelled or failed job leaves no file behind.
+        """
+        job.task_id = task_id  # Progress reports may start before submit_job records it
+        partial = job.path.with_name(job.path.name + '.part')
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(partial, 'wb') as f:
+                for chunk in stream:
+                    if job.cancelled:
+                        raise TaskCancelled(f"Export job {job.id} was cancelled")
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            if job.cancelled:
+                raise TaskCancelled(f"Export job {job.id} was cancelled")
+            os.replace(partial, job.path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        finally:
+            stream.close()  # Releases the export's spill files when it stopped early
+            job.completed_at = time.time()
+        
+        job.size = size
+        job.etag = f'"{digest.hexdigest()[:32]}"'
+        job.expires_at = job.completed_at + settings.export_job_ttl
+        with self._lock:
+            deleted = job.id not in self.jobs
+        if deleted:
+            job.path.unlink(missing_ok=True)
+        return {"job_id": job.id, "size": size, "etag": job.etag}
+    
+    def get_job(self, job_id: str) -> Optional[ExportJob]:
+        self.expire_jobs()
+        with self._lock:
+            return self.jobs.get(job_id)
+    
+    def job_status(self, job: ExportJob) -> Dict[str, Any]:
+        task = task_manager.get_task(job.task_id)
+        return {
+            "job_id": job.id,
+            "status": task.status.value if task else "unknown",
+            "progress": task.progress if task else None,
+            "error": task.error if task else None,
+            "filename": job.filename,
+            "content_type": job.content_type,
+            "size": job.size,
+            "etag": job.etag,
+            "created_at": job.created_at,
+            "completed_at": job.completed_at,
+            "expires_at": job.expires_at
         }
+    
+    def delete_job(self, job_id: str) -> bool:
+        """Cancel a job (stopping it at its next chunk if running) and delete its file"""
+        with self._lock:
+            job = self.jobs.pop(job_id, None)
+        if job is None:
+            return False
+        job.cancelled = True
+        task_manager.cancel_task(job.task_id)
+        job.path.unlink(missing_ok=True)
+        return True
+    
+    def expire_jobs(self) -> int:
+        """Delete jobs (and their files) whose TTL has passed; failed and cancelled jobs have no file
+        but are dropped export_job_ttl after they stopped"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job for job in self.jobs.values()
+                if job.completed_at and (job.expires_at or job.completed_at + settings.export_job_ttl) < now
+            ]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            job.path.unlink(missing_ok=True)
+        return len(expired)
+    
+    def read_job_file(self, job: ExportJob, start: int, end: int) -> Iterator[bytes]:
+        """Bytes start..end (inclusive) of a finished job's file, in export_chunk_bytes chunks"""
+        f = open(job.path, 'rb')  # Opened eagerly so a missing file fails before a response starts
+        return self._read_range(f, start, end)
+    
+    def _read_range(self, f, start: int, end: int) -> Iterator[bytes]:
+        with f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(settings.export_chunk_bytes, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+def prime_stream(stream: Iterator[bytes]) -> Iterator[bytes]:
+    """Pull a byte stream's first chunk (surfacing errors raised while it starts), returning an
+    iterator over the whole stream"""
+    for chunk in stream:
+        return itertools.chain([chunk], stream)
+    return iter(())
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single `bytes=` Range header, or None to send the whole file.
+
+    Malformed and multi-range headers are ignored as RFC 9110 allows; raises
+    ValueError when the range lies beyond the end of the file.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, separator, last = header[len('bytes='):].strip().partition('-')
+    if not separator or not (first + last).isdigit():
+        return None
+    if not first:
+        suffix_length = int(last)
+        if suffix_length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - suffix_length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, min(int(last), size - 1) if last else size - 1
 
 # Global service instance
 export_service = ExportService()
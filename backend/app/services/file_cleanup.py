@@ -2,6 +2,7 @@ import asyncio
 import os
 from pathlib import Path
 from app.core.config import settings
+from app.services.analysis_store import analysis_store
 
 async def delete_file_after_delay(file_path: str, delay_minutes: int = 30):
     """지정된 시간 후 파일 삭제"""
@@ -9,6 +10,7 @@ async def delete_file_after_delay(file_path: str, delay_minutes: int = 30):
     try:
         if os.path.exists(file_path):
             os.unlink(file_path)
+            analysis_store.invalidate(file_path)
             print(f"Cleaned up uploaded file: {file_path}")
     except Exception as e:
         print(f"Failed to cleanup file {file_path}: {e}")
@@ -21,6 +23,17 @@ def cleanup_temp_files():
             if file_path.is_file():
                 try:
                     file_path.unlink()
+                    analysis_store.invalidate(str(file_path))
                     print(f"Cleaned up old file: {file_path}")
                 except Exception as e:
                     print(f"Failed to cleanup {file_path}: {e}")
+
+    # 이전 실행의 내보내기 작업 파일은 더 이상 다운로드할 수 없으므로 삭제
+    export_dir = Path(settings.cache_dir) / "exports"
+    if export_dir.exists():
+        for file_path in export_dir.glob("*"):
+            if file_path.is_file():
+                try:
+                    file_path.unlink()
+                except Exception as e:
+                    print(f"Failed to cleanup {file_path}: {e}")
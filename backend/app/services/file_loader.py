@@ -9,6 +9,9 @@ from ..core.config import settings
 from ..core.task_manager import task_manager
 from ..models.file_info import FileMetadata, DataType, ColumnInfo
 from ..processors.jsonl_streamer import JSONLStreamer
+from ..processors.sampling import stratified_sample
+from ..processors.schema_stats import accumulate_schema, schema_drift
+from ..services.analysis_store import analysis_store
 from ..services.schema_detector import SchemaDetector
 
 class FileLoaderService:
@@ -19,6 +22,7 @@ class FileLoaderService:
         self.upload_dir.mkdir(exist_ok=True)
         self.schema_detector = SchemaDetector()
         self.loaded_files: Dict[str, FileMetadata] = {}
+        self.schema_drift: Dict[str, Dict[str, Any]] = {}  # file_id -> segment schema profile
     
     async def upload_file(self, file_data: bytes, filename: str, temporary: bool = False) -> FileMetadata:
         """Upload and process JSONL file"""
@@ -84,14 +88,16 @@ class FileLoaderService:
         # Get basic file info
         file_info = streamer.get_file_info()
         
-        # Sample records for schema detection
-        sample_records = streamer.sample_records(settings.max_sample_size // 10)  # Quick sample
+        # Sample records across the whole file for schema detection and the record estimate
+        quick_sample_size = settings.max_sample_size // 10
+        offsets = max(1, min(settings.quick_sample_offsets, quick_sample_size))
+        sample = stratified_sample(str(file_path), offsets, max(1, quick_sample_size // offsets))
         
         # Detect schema
-        schema_info = self.schema_detector.detect_schema(sample_records)
+        schema_info = self.schema_detector.detect_schema(sample.records)
         
-        # Estimate total records (rough calculation)
-        estimated_records = self._estimate_record_count(file_path, len(sample_records))
+        exact = sample.method == 'exact'
+        low, high = sample.total_records_ci
         
         return FileMetadata(
             id=file_id,
@@ -99,12 +105,15 @@ class FileLoaderService:
             original_filename=filename,
             file_path=str(file_path),
             file_size=file_info['size'],
-            total_records=len(sample_records),  # Will be updated in full analysis
-            estimated_records=estimated_records,
+            # Will be updated in full analysis
+            total_records=round(sample.total_records) if exact else len(sample.records),
+            estimated_records=round(sample.total_records),
+            estimated_records_ci=[round(low), round(high)],
             columns=schema_info.columns,
+            fields=schema_info.fields,
             upload_time=datetime.now(),
             processing_status="quick_analysis_complete",
-            sample_data=sample_records[:50],  # First 50 records
+            sample_data=streamer.sample_records(50),  # First 50 records
             schema_version="1.0"
         )
     
@@ -116,25 +125,31 @@ class FileLoaderService:
             # Update progress
             task_manager.update_progress(task_id, 10)
             
-            # Count total records
-            total_records = streamer.count_records()
-            task_manager.update_progress(task_id, 30)
-            
-            # Sample more records for better schema detection
-            sample_records = streamer.sample_records(settings.max_sample_size)
-            task_manager.update_progress(task_id, 60)
-            
-            # Re-detect schema with larger sample
-            schema_info = self.schema_detector.detect_schema(sample_records)
+            # Count records and detect the schema of the whole file in one pass
+            accumulator = accumulate_schema(
+                str(file_path),
+                settings.analysis_workers or settings.max_workers,
+                settings.analysis_shard_min_bytes,
+                settings.schema_segment_bytes,
+                lambda fraction: task_manager.update_progress(task_id, 10 + fraction * 70)
+            )
+            total_records = accumulator.line_count
+            schema_info = self.schema_detector.build_schema(accumulator)
+            drift = schema_drift(accumulator)
             task_manager.update_progress(task_id, 80)
             
+            sample_records = streamer.sample_records(100)
+            
             # Update file metadata
+            new_columns: List[str] = []
             if file_id in self.loaded_files:
                 metadata = self.loaded_files[file_id]
                 metadata.total_records = total_records
-                metadata.columns = schema_info.columns
+                new_columns = self._merge_columns(metadata, schema_info.columns)
+                metadata.fields = schema_info.fields
                 metadata.processing_status = "full_analysis_complete"
-                metadata.sample_data = sample_records[:100]  # More sample data
+                metadata.sample_data = sample_records  # More sample data
+                self.schema_drift[file_id] = drift
             
             task_manager.update_progress(task_id, 100)
             
@@ -142,7 +157,9 @@ class FileLoaderService:
                 "file_id": file_id,
                 "total_records": total_records,
                 "schema_confidence": schema_info.detection_confidence,
-                "columns_count": len(schema_info.columns)
+                "columns_count": len(schema_info.columns),
+                "new_columns": new_columns,
+                "schema_drift_events": drift["event_count"]
             }
             
         except Exception as e:
@@ -150,27 +167,19 @@ class FileLoaderService:
                 self.loaded_files[file_id].processing_status = "analysis_failed"
             raise e
     
-    def _estimate_record_count(self, file_path: Path, sample_size: int) -> int:
-        """Estimate total records based on file size and sample"""
-        if sample_size == 0:
-            return 0
-        
-        file_size = file_path.stat().st_size
-        
-        # Read first chunk to estimate average line size
-        chunk_size = min(1024 * 1024, file_size)  # 1MB or file size
-        
-        with open(file_path, 'rb') as f:
-            chunk = f.read(chunk_size)
-        
-        lines_in_chunk = chunk.count(b'\n')
-        if lines_in_chunk == 0:
-            return sample_size
-        
-        avg_line_size = chunk_size / lines_in_chunk
-        estimated_lines = file_size / avg_line_size
-        
-        return int(estimated_lines * 0.9)  # Slightly conservative estimate
+    def _merge_columns(self, metadata: FileMetadata, detected: List[ColumnInfo]) -> List[str]:
+        """Replace column details with the full-file schema, keeping the known column order
+        and appending columns the quick sample did not see; returns the appended names"""
+        detected_by_name = {column.name: column for column in detected}
+        known = [column.name for column in metadata.columns if column.name in detected_by_name]
+        known_names = set(known)
+        new_columns = [column.name for column in detected if column.name not in known_names]
+        metadata.columns = [detected_by_name[name] for name in known + new_columns]
+        return new_columns
+    
+    def get_schema_drift(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Segment schema profile of a fully analyzed file"""
+        return self.schema_drift.get(file_id)
     
     def get_file_metadata(self, file_id: str) -> Optional[FileMetadata]:
         """Get file metadata by ID"""
@@ -192,9 +201,11 @@ class FileLoaderService:
             Path(metadata.file_path).unlink(missing_ok=True)
         except Exception:
             pass
+        analysis_store.invalidate(metadata.file_path)
         
         # Remove from memory
         del self.loaded_files[file_id]
+        self.schema_drift.pop(file_id, None)
         return True
 
 # Global service instance
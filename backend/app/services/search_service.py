@@ -1,89 +1,360 @@
-from typing import List, Dict, Any, Optional, Set
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+import heapq
+import json
+import math
 import re
-from collections import defaultdict
+import threading
+import time
+from array import array
+from ..core.config import settings
+from ..core.task_manager import task_manager, TaskStatus
 from ..processors.jsonl_streamer import JSONLStreamer
+from ..processors.index_builder import build_index, tokenize
+from ..processors.regex_scanner import is_record, prefilter_safe, regex_scan, regex_scan_candidates, required_literals
 from ..services.file_loader import file_loader_service
 
 class SearchService:
     """Global and column-specific search service"""
     
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    STREAM_FLUSH_SECONDS = 0.25
+    
     def __init__(self):
-        self.search_indexes: Dict[str, Dict[str, Set[int]]] = {}  # file_id -> {column -> {word -> row_indexes}}
+        self.search_indexes: Dict[str, Dict[str, Dict[str, List[int]]]] = {}  # file_id -> {column -> {word -> sorted row_indexes}}
+        self.row_offsets: Dict[str, array] = {}  # file_id -> byte offset per row (uncompressed files)
+        self.row_lengths: Dict[str, array] = {}  # file_id -> token count per row
+        self.avg_row_lengths: Dict[str, float] = {}
+        self.index_tasks: Dict[str, str] = {}  # file_id -> index build task_id
+        self._lock = threading.Lock()
+    
+    def start_index_build(self, file_id: str) -> str:
+        """Start background index build, reusing a build already in flight"""
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {file_id}")
+        
+        with self._lock:
+            task_id = self.index_tasks.get(file_id)
+            if task_id:
+                task = task_manager.get_task(task_id)
+                if task and task.status in (TaskStatus.PENDING, TaskStatus.RUNNING):
+                    return task_id
+            
+            task_id = task_manager.submit_task(
+                self._build_search_index_task,
+                f"Build search index for {metadata.filename}",
+                file_id
+            )
+            self.index_tasks[file_id] = task_id
+        return task_id
+    
+    def get_index_status(self, file_id: str) -> str:
+        """Get index status: ready, building, failed or missing"""
+        if file_id in self.search_indexes:
+            return "ready"
+        
+        task_id = self.index_tasks.get(file_id)
+        task = task_manager.get_task(task_id) if task_id else None
+        if not task:
+            return "missing"
+        if task.status in (TaskStatus.PENDING, TaskStatus.RUNNING):
+            return "building"
+        if task.status == TaskStatus.FAILED:
+            return "failed"
+        return "missing"
     
-    def build_search_index(self, file_id: str) -> Dict[str, Any]:
+    def _build_search_index_task(self, task_id: str, file_id: str) -> Dict[str, Any]:
+        """Background task for search index build"""
+        return self.build_search_index(file_id, task_id)
+    
+    def build_search_index(self, file_id: str, task_id: Optional[str] = None) -> Dict[str, Any]:
         """Build search index for a file"""
         metadata = file_loader_service.get_file_metadata(file_id)
         if not metadata:
             raise ValueError(f"File not found: {file_id}")
         
-        streamer = JSONLStreamer(metadata.file_path)
-        index = defaultdict(lambda: defaultdict(set))
+        def report_progress(progress: float):
+            if task_id:
+                task_manager.update_progress(task_id, progress)
         
-        # Build index from all records
-        for row_idx, record in enumerate(streamer.stream_records()):
-            for column, value in record.items():
-                if value is not None:
-                    # Tokenize value
-                    tokens = self._tokenize(str(value))
-                    for token in tokens:
-                        index[column][token.lower()].add(row_idx)
-        
-        self.search_indexes[file_id] = dict(index)
+        # Shards are indexed in worker processes and k-way merged into sorted postings
+        index, offsets, lengths = build_index(
+            metadata.file_path,
+            settings.index_workers or settings.max_workers,
+            settings.index_shard_min_bytes,
+            report_progress
+        )
+        
+        if offsets is not None:
+            self.row_offsets[file_id] = offsets
+        self.row_lengths[file_id] = lengths
+        self.avg_row_lengths[file_id] = sum(lengths) / len(lengths) if lengths else 0.0
+        self.search_indexes[file_id] = index
         return {
             "file_id": file_id,
             "indexed_columns": len(index),
             "total_tokens": sum(len(col_index) for col_index in index.values())
         }
     
-    def search_global(self, file_id: str, query: str, limit: int = 1000) -> List[int]:
-        """Search across all columns"""
-        if file_id not in self.search_indexes:
-            # Build index on-demand
-            self.build_search_index(file_id)
+    def _ensure_index(self, file_id: str) -> bool:
+        """Return True if the index is ready, otherwise start building it in the background"""
+        if file_id in self.search_indexes:
+            return True
+        if self.get_index_status(file_id) != "building":
+            self.start_index_build(file_id)
+        return False
+    
+    def _scan_search(self, file_id: str, query: str, column: Optional[str], limit: int,
+                     count_limit: Optional[int] = None) -> Tuple[List[int], int]:
+        """Bounded streaming scan used while the index is not ready: the first limit matching
+        rows, and the number of matches counted up to count_limit (default limit)"""
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {file_id}")
         
         query_tokens = self._tokenize(query.lower())
-        matching_rows = set()
+        if not query_tokens:
+            return [], 0
         
-        index = self.search_indexes[file_id]
+        count_limit = max(limit, count_limit or 0)
+        streamer = JSONLStreamer(metadata.file_path)
+        matching_rows = []
+        total_matches = 0
         
-        for column_index in index.values():
-            for token in query_tokens:
-                # Exact match
-                if token in column_index:
-                    matching_rows.update(column_index[token])
-                
-                # Partial match (contains)
-                for indexed_token in column_index:
-                    if token in indexed_token:
-                        matching_rows.update(column_index[indexed_token])
+        for row_idx, record in enumerate(streamer.stream_records(limit=settings.search_scan_max_records)):
+            if total_matches >= count_limit:
+                break
+            
+            values = [record.get(column)] if column else record.values()
+            for value in values:
+                if value is None:
+                    continue
+                text = str(value).lower()
+                if any(token in text for token in query_tokens):
+                    total_matches += 1
+                    if len(matching_rows) < limit:
+                        matching_rows.append(row_idx)
+                    break
         
-        return list(matching_rows)[:limit]
+        return matching_rows, total_matches
+    
+    def search_global(self, file_id: str, query: str, limit: int = 1000,
+                      column_boosts: Optional[Dict[str, float]] = None) -> List[int]:
+        """Search across all columns, most relevant rows first"""
+        return self.search_with_scores(file_id, query, limit, column_boosts=column_boosts)[0]
     
     def search_column(self, file_id: str, column: str, query: str, limit: int = 1000) -> List[int]:
-        """Search within specific column"""
-        if file_id not in self.search_indexes:
-            self.build_search_index(file_id)
+        """Search within specific column, most relevant rows first"""
+        return self.search_with_scores(file_id, query, limit, column=column)[0]
+    
+    def search_with_scores(self, file_id: str, query: str, limit: int = 1000, column: Optional[str] = None,
+                           column_boosts: Optional[Dict[str, float]] = None, count_limit: Optional[int] = None
+                           ) -> Tuple[List[int], Optional[List[float]], int]:
+        """Search returning (rows, scores, total matches); scores are None during fallback scans.
         
+        Fallback scans stop counting matches at count_limit (default limit),
+        while the index counts every match.
+        """
+        if not self._ensure_index(file_id):
+            matching_rows, total_matches = self._scan_search(file_id, query, column, limit, count_limit)
+            return matching_rows, None, total_matches
+        
+        ranked, total_matches = self.search_ranked(
+            file_id, query, limit, [column] if column else None, column_boosts
+        )
+        return [row for row, _ in ranked], [score for _, score in ranked], total_matches
+    
+    def search_ranked(self, file_id: str, query: str, limit: int = 1000, columns: Optional[List[str]] = None,
+                      column_boosts: Optional[Dict[str, float]] = None) -> Tuple[List[Tuple[int, float]], int]:
+        """BM25-ranked search over the token index.
+        
+        Postings are merged document-at-a-time in row order, so only the top
+        `limit` rows are kept in a bounded heap while all matches are counted.
+        Postings are deduplicated per row, so term frequency is binary and
+        ranking comes from idf, row length normalization and column boosts.
+        """
         index = self.search_indexes[file_id]
-        if column not in index:
-            return []
+        row_lengths = self.row_lengths[file_id]
+        total_rows = len(row_lengths)
+        avg_length = self.avg_row_lengths.get(file_id) or 1.0
+        column_boosts = column_boosts or {}
         
-        query_tokens = self._tokenize(query.lower())
-        matching_rows = set()
+        query_tokens = list(dict.fromkeys(self._tokenize(query.lower())))
+        
+        streams = []
+        for column in columns or list(index):
+            column_index = index.get(column)
+            boost = column_boosts.get(column, 1.0)
+            if not column_index or boost <= 0:
+                continue
+            
+            for query_idx, token in enumerate(query_tokens):
+                for indexed_token, postings in column_index.items():
+                    # Exact match scores fully, partial (contains) match proportionally
+                    if token not in indexed_token:
+                        continue
+                    df = len(postings)
+                    idf = math.log(1 + (total_rows - df + 0.5) / (df + 0.5))
+                    weight = boost * idf * (len(token) / len(indexed_token))
+                    streams.append(self._weighted_postings(postings, query_idx, weight))
+        
+        top: List[Tuple[float, int]] = []  # min-heap of (score, -row)
+        total_matches = 0
+        
+        def flush(row: int, term_weights: Dict[int, float]):
+            nonlocal total_matches
+            total_matches += 1
+            if limit <= 0:
+                return
+            norm = self.BM25_K1 * (1 - self.BM25_B + self.BM25_B * row_lengths[row] / avg_length)
+            score = sum(term_weights.values()) * (self.BM25_K1 + 1) / (1 + norm)
+            entry = (score, -row)
+            if len(top) < limit:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
         
-        column_index = index[column]
+        current_row = None
+        term_weights: Dict[int, float] = {}
+        for row, query_idx, weight in heapq.merge(*streams):
+            if row != current_row:
+                if current_row is not None:
+                    flush(current_row, term_weights)
+                current_row = row
+                term_weights = {}
+            # A query token counts once per row, through its best-scoring expansion
+            if weight > term_weights.get(query_idx, 0.0):
+                term_weights[query_idx] = weight
+        if current_row is not None:
+            flush(current_row, term_weights)
         
-        for token in query_tokens:
-            # Exact match
-            if token in column_index:
-                matching_rows.update(column_index[token])
+        ranked = sorted(top, reverse=True)
+        return [(-neg_row, score) for score, neg_row in ranked], total_matches
+    
+    @staticmethod
+    def _weighted_postings(postings: List[int], query_idx: int, weight: float):
+        for row in postings:
+            yield row, query_idx, weight
+    
+    def stream_search(self, file_id: str, query: str, column: Optional[str] = None, regex: bool = False,
+                      limit: int = 1000, batch_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """Validate a search and return a generator of progressive match/progress events"""
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {file_id}")
+        
+        if regex:
+            if not column:
+                raise ValueError("Regex search requires a column")
+            try:
+                re.compile(query, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"Invalid regex pattern: {e}")
+        elif file_id in self.search_indexes:
+            # Indexed searches are fast enough to answer in a single batch
+            return self._ranked_events(file_id, query, column, limit)
+        
+        return self._scan_events(metadata.file_path, query, column, regex, limit, batch_size)
+    
+    def _ranked_events(self, file_id: str, query: str, column: Optional[str], limit: int) -> Iterator[Dict[str, Any]]:
+        rows, scores, total_matches = self.search_with_scores(file_id, query, limit, column=column)
+        yield {"event": "matches", "rows": rows, "scores": scores}
+        yield {"event": "done", "total_matches": total_matches, "truncated": total_matches > len(rows)}
+    
+    def _scan_events(self, file_path: str, query: str, column: Optional[str], regex: bool,
+                     limit: int, batch_size: int) -> Iterator[Dict[str, Any]]:
+        """Sequential scan yielding match batches and progress, flushed at least every STREAM_FLUSH_SECONDS"""
+        streamer = JSONLStreamer(file_path)
+        file_size = streamer.file_path.stat().st_size or 1
+        
+        if regex:
+            pattern = re.compile(query, re.IGNORECASE)
+            literals = required_literals(query)
+            matches = lambda text: pattern.search(text) is not None
+            line_may_match = lambda line: all(literal in line for literal in literals)
+        else:
+            query_tokens = self._tokenize(query.lower())
+            # Same rules as regex literals: raw-bytes checks must not reject a matching record
+            prefilter = [token.encode('ascii') for token in query_tokens if prefilter_safe(token)]
+            if len(prefilter) != len(query_tokens):
+                prefilter = []
+            matches = lambda text: any(token in text.lower() for token in query_tokens)
+            line_may_match = lambda line: not prefilter or any(token in line for token in prefilter)
+            if not query_tokens:
+                yield {"event": "done", "total_matches": 0, "rows_scanned": 0, "truncated": False}
+                return
+        
+        batch: List[int] = []
+        total_matches = 0
+        row_idx = 0
+        last_flush = time.monotonic()
+        
+        for line, position in streamer.iter_lines_with_position():
+            line = line.strip()
+            if not line:
+                continue
+            
+            if line_may_match(line.lower()):
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                
+                if isinstance(record, dict):
+                    values = [record.get(column)] if column else record.values()
+                    if any(value is not None and matches(str(value)) for value in values):
+                        batch.append(row_idx)
+                        total_matches += 1
+                row_idx += 1
+            elif is_record(line):
+                row_idx += 1
+            
+            if total_matches >= limit:
+                break
             
-            # Partial match
-            for indexed_token in column_index:
-                if token in indexed_token:
-                    matching_rows.update(column_index[indexed_token])
+            now = time.monotonic()
+            if len(batch) >= batch_size or now - last_flush >= self.STREAM_FLUSH_SECONDS:
+                if batch:
+                    yield {"event": "matches", "rows": batch}
+                    batch = []
+                yield {"event": "progress", "progress": min(100.0, position / file_size * 100), "rows_scanned": row_idx}
+                last_flush = now
+        
+        if batch:
+            yield {"event": "matches", "rows": batch}
+        yield {
+            "event": "done",
+            "total_matches": total_matches,
+            "rows_scanned": row_idx,
+            "truncated": total_matches >= limit
+        }
+    
+    def get_records(self, file_id: str, row_ids: List[int]) -> List[Optional[Dict[str, Any]]]:
+        """Fetch records by row id, by offset seek when the index has row offsets"""
+        metadata = file_loader_service.get_file_metadata(file_id)
+        if not metadata:
+            raise ValueError(f"File not found: {file_id}")
+        
+        if not row_ids:
+            return []
+        
+        streamer = JSONLStreamer(metadata.file_path)
+        offsets = self.row_offsets.get(file_id)
+        if offsets is not None:
+            return streamer.read_records_at([offsets[row] for row in row_ids])
         
-        return list(matching_rows)[:limit]
+        # No random access (compressed file or index not built yet): stream up to the last row
+        wanted = set(row_ids)
+        last_row = max(wanted)
+        found: Dict[int, Dict[str, Any]] = {}
+        for row_idx, record in enumerate(streamer.stream_records()):
+            if row_idx in wanted:
+                found[row_idx] = record
+            if row_idx >= last_row:
+                break
+        
+        return [found.get(row) for row in row_ids]
     
     def search_regex(self, file_id: str, column: str, pattern: str, limit: int = 1000) -> List[int]:
         """Regex search within column"""
@@ -92,22 +363,50 @@ class SearchService:
             raise ValueError(f"File not found: {file_id}")
         
         try:
-            regex = re.compile(pattern, re.IGNORECASE)
+            re.compile(pattern, re.IGNORECASE)
         except re.error as e:
             raise ValueError(f"Invalid regex pattern: {e}")
         
-        streamer = JSONLStreamer(metadata.file_path)
-        matching_rows = []
+        workers = settings.index_workers or settings.max_workers
         
-        for row_idx, record in enumerate(streamer.stream_records()):
-            if len(matching_rows) >= limit:
-                break
-            
-            value = record.get(column)
-            if value is not None and regex.search(str(value)):
-                matching_rows.append(row_idx)
+        # Prune rows with the token index when the pattern has required literals
+        candidates = self._regex_candidates(file_id, column, pattern)
+        if candidates is not None:
+            return regex_scan_candidates(
+                metadata.file_path, pattern, column, candidates,
+                self.row_offsets[file_id], limit, workers
+            )
+        
+        return regex_scan(
+            metadata.file_path, pattern, column, limit, workers, settings.index_shard_min_bytes,
+            self.row_offsets.get(file_id)
+        )
+    
+    def _regex_candidates(self, file_id: str, column: str, pattern: str) -> Optional[List[int]]:
+        """Rows whose indexed tokens contain every required literal, or None if unprunable"""
+        if file_id not in self.search_indexes or file_id not in self.row_offsets:
+            return None
+        
+        literals = required_literals(pattern)
+        if not literals:
+            return None
+        
+        column_index = self.search_indexes[file_id].get(column)
+        if not column_index:
+            return []
+        
+        candidates: Optional[Set[int]] = None
+        for literal in literals:
+            literal = literal.decode('ascii')
+            rows: Set[int] = set()
+            for token, postings in column_index.items():
+                if literal in token:
+                    rows.update(postings)
+            candidates = rows if candidates is None else candidates & rows
+            if not candidates:
+                return []
         
-        return matching_rows
+        return sorted(candidates)
     
     def get_search_suggestions(self, file_id: str, column: str, prefix: str, limit: int = 10) -> List[str]:
         """Get search suggestions for autocomplete"""
@@ -131,14 +430,16 @@ class SearchService:
     
     def _tokenize(self, text: str) -> List[str]:
         """Tokenize text for search indexing"""
-        # Simple tokenization - split on non-alphanumeric
-        tokens = re.findall(r'\w+', text.lower())
-        return [token for token in tokens if len(token) >= 2]  # Ignore single chars
+        return tokenize(text)
     
     def clear_index(self, file_id: str):
         """Clear search index for file"""
         if file_id in self.search_indexes:
             del self.search_indexes[file_id]
+        self.row_offsets.pop(file_id, None)
+        self.row_lengths.pop(file_id, None)
+        self.avg_row_lengths.pop(file_id, None)
+        self.index_tasks.pop(file_id, None)
 
 # Global service instance
 search_service = SearchService()
@@ -0,0 +1,75 @@
+"""
+Shared pytest setup for the JSONL Viewer backend tests
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+# Keep uploads, caches and the analysis store out of the working tree (read when app.core.config is imported)
+_TEST_ROOT = Path(tempfile.mkdtemp(prefix="jsonl-viewer-tests-"))
+os.environ.setdefault("UPLOAD_DIR", str(_TEST_ROOT / "uploads"))
+os.environ.setdefault("CACHE_DIR", str(_TEST_ROOT / "cache"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TEST_ROOT / 'analysis.db'}")
+
+def _wait_for_task(task_id: str, timeout: float = 60.0):
+    from app.core.task_manager import TaskStatus, task_manager
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        task = task_manager.get_task(task_id)
+        if task and task.status not in (TaskStatus.PENDING, TaskStatus.RUNNING):
+            return task
+        time.sleep(0.01)
+    raise AssertionError(f"Task {task_id} did not finish within {timeout}s")
+
+@pytest.fixture
+def wait_for_task():
+    """Block until a TaskManager task has finished and return its TaskInfo"""
+    return _wait_for_task
+
+@pytest.fixture
+def write_jsonl(tmp_path):
+    """Write records (dicts, or raw strings written as-is) as a JSONL file and return its path"""
+    def write(records, name: str = "data.jsonl") -> Path:
+        path = tmp_path / name
+        with open(path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write((record if isinstance(record, str) else json.dumps(record)) + "\n")
+        return path
+    return write
+
+@pytest.fixture
+def load_file():
+    """Register a file with the file loader and wait for its full analysis"""
+    from app.services.file_loader import file_loader_service
+    from app.services.search_service import search_service
+
+    loaded = []
+
+    def load(path: Path, full_analysis: bool = True):
+        metadata = asyncio.run(file_loader_service.load_from_path(str(path)))
+        loaded.append(metadata.id)
+        deadline = time.monotonic() + 60
+        while full_analysis and metadata.processing_status == "quick_analysis_complete":
+            assert time.monotonic() < deadline, "Full analysis did not finish"
+            time.sleep(0.01)
+        return metadata
+
+    yield load
+    for file_id in loaded:
+        file_loader_service.loaded_files.pop(file_id, None)
+        file_loader_service.schema_drift.pop(file_id, None)
+        search_service.clear_index(file_id)
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app import create_app
+
+    with TestClient(create_app()) as test_client:
+        yield test_client
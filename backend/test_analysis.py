@@ -0,0 +1,722 @@
+"""
+Tests for the streaming column analysis sketches and the analysis endpoints
+"""
+import json
+import pickle
+import random
+import re
+import sqlite3
+import statistics
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import app.services.analysis_service as analysis_module
+import app.services.analysis_store as store_module
+from app.processors.column_stats import accumulate_columns
+from app.processors.correlation import CorrelationAccumulator, average_ranks, cramers_v
+from app.processors.duplicates import DuplicateDetector, canonical_json, record_digest
+from app.processors.sampling import (
+    estimate_distinct, sample_records, weighted_mean, weighted_proportion, weighted_quantiles
+)
+from app.processors.sketches import HyperLogLog, KLLSketch, RunningStats, SpaceSaving, StreamingHistogram
+from app.processors.text_stats import TextAccumulator
+from app.processors.timestamps import TimestampParser
+from app.services.analysis_service import AnalysisService
+from app.services.analysis_store import AnalysisStore, analysis_store, file_fingerprint
+from app.services.file_loader import file_loader_service
+
+def _rank_error(values_sorted, value, fraction):
+    """Distance between fraction and the normalized rank interval of value"""
+    low = sum(1 for v in values_sorted if v < value) / len(values_sorted)
+    high = sum(1 for v in values_sorted if v <= value) / len(values_sorted)
+    return 0.0 if low <= fraction <= high else min(abs(fraction - low), abs(fraction - high))
+
+def test_running_stats_match_statistics_and_merge():
+    rng = random.Random(1)
+    values = [rng.gauss(50, 12) for _ in range(5000)]
+
+    whole = RunningStats()
+    parts = [RunningStats() for _ in range(3)]
+    for i, value in enumerate(values):
+        whole.add(value)
+        parts[i % 3].add(value)
+    merged = RunningStats()
+    for part in parts:
+        merged.merge(part)
+
+    for stats in (whole, merged):
+        assert stats.count == len(values)
+        assert stats.mean == pytest.approx(statistics.mean(values))
+        assert stats.variance == pytest.approx(statistics.variance(values))
+        assert (stats.min, stats.max) == (min(values), max(values))
+
+def test_kll_quantiles_stay_within_rank_error_after_merge():
+    rng = random.Random(2)
+    values = [rng.expovariate(0.1) for _ in range(50000)]
+    ordered = sorted(values)
+    fractions = [0.01, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+    whole = KLLSketch(seed=3)
+    parts = [KLLSketch(seed=seed) for seed in range(4)]
+    for i, value in enumerate(values):
+        whole.add(value)
+        parts[i % 4].add(value)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+
+    for sketch in (whole, merged):
+        assert sketch.count == len(values)
+        assert sum(len(c) for c in sketch.compactors) < 2000
+        for fraction, value in zip(fractions, sketch.quantiles(fractions)):
+            assert _rank_error(ordered, value, fraction) < 0.02
+    assert KLLSketch().quantile(0.5) is None
+
+def test_sharded_accumulation_matches_single_pass(write_jsonl):
+    rng = random.Random(4)
+    records = [
+        {"amount": round(rng.uniform(0, 1000), 2) if i % 10 else None, "label": f"l{i % 7}"}
+        for i in range(3000)
+    ]
+    path = str(write_jsonl(records))
+    columns = [("amount", "number"), ("label", "string")]
+
+    single = accumulate_columns(path, columns, 1, 1)
+    sharded = accumulate_columns(path, columns, 4, 1)
+    amounts = [r["amount"] for r in records if r["amount"] is not None]
+    for result in (single, sharded):
+        amount = result["amount"]
+        assert (amount.total_count, amount.null_count) == (3000, 300)
+        assert amount.numeric_stats.mean == pytest.approx(statistics.mean(amounts))
+        assert amount.numeric_stats.std_dev == pytest.approx(statistics.stdev(amounts))
+        assert dict(result["label"].value_counts.most_common()) == Counter(r["label"] for r in records)
+
+def test_column_analysis_endpoint_reports_streamed_stats(write_jsonl, load_file, wait_for_task, client):
+    values = list(range(1, 1001))
+    random.Random(5).shuffle(values)
+    metadata = load_file(write_jsonl([{"amount": value, "label": "x"} for value in values]))
+
+    response = client.post("/api/v1/analysis/column", json={"file_id": metadata.id, "column": "amount"})
+    assert response.json()["status"] == "started"
+    task = wait_for_task(response.json()["task_id"])
+    stats = task.result["numeric_stats"]
+    assert (stats["min"], stats["max"]) == (1, 1000)
+    assert stats["mean"] == pytest.approx(500.5)
+    assert stats["std_dev"] == pytest.approx(statistics.stdev(values))
+    assert abs(stats["median"] - 500) <= 20
+    assert abs(stats["percentile_95"] - 950) <= 20
+
+    cached = client.get(f"/api/v1/analysis/column/{metadata.id}/amount").json()
+    assert cached["numeric_stats"] == stats
+
+def test_hyperloglog_estimates_and_merges_distinct_counts():
+    small = HyperLogLog()
+    for i in range(1000):
+        small.add(i % 250)
+    assert abs(small.estimate() - 250) <= 2
+
+    parts = [HyperLogLog() for _ in range(4)]
+    for i in range(200000):
+        parts[i % 4].add(f"user-{i}")
+    merged = HyperLogLog()
+    for part in parts:
+        merged.merge(part)
+    assert abs(merged.estimate() - 200000) / 200000 < 3 * merged.relative_error
+    assert abs(parts[0].estimate() - 50000) / 50000 < 3 * merged.relative_error
+
+    with pytest.raises(ValueError):
+        merged.merge(HyperLogLog(precision=10))
+
+def test_distinct_counts_in_schema_and_overview(write_jsonl, load_file, client):
+    records = [{"id": f"row-{i}", "category": ["a", "b", "c"][i % 3], "empty": None} for i in range(5000)]
+    metadata = load_file(write_jsonl(records))
+
+    columns = {column.name: column for column in metadata.columns}
+    assert abs(columns["id"].unique_count - 5000) <= 150
+    assert columns["category"].unique_count == 3
+
+    overview = client.get(f"/api/v1/analysis/dataset-overview/{metadata.id}").json()
+    stats = {column["name"]: column for column in overview["column_stats"]}
+    assert abs(stats["id"]["unique_count"] - 5000) <= 150
+    assert stats["category"]["unique_count"] == 3
+    assert stats["empty"]["unique_count"] == 0
+
+def _skewed_stream(seed, size=20000):
+    rng = random.Random(seed)
+    keys = [f"k{i}" for i in range(2000)]
+    weights = [1 / (i + 1) ** 1.2 for i in range(len(keys))]
+    return rng.choices(keys, weights, k=size)
+
+def _check_space_saving_bounds(summary, truth):
+    threshold = summary.total / summary.capacity
+    for key, count in truth.items():
+        if count > threshold:
+            assert key in summary.counts
+    for key, count in summary.counts.items():
+        assert count - summary.errors[key] <= truth[key] <= count
+        assert summary.errors[key] <= threshold
+
+def test_space_saving_bounds_and_heavy_hitters():
+    stream = _skewed_stream(6)
+    truth = Counter(stream)
+    summary = SpaceSaving(50)
+    for key in stream:
+        summary.add(key)
+
+    assert len(summary) == 50 and not summary.is_exact
+    _check_space_saving_bounds(summary, truth)
+    assert [key for key, _ in summary.most_common(3)] == [key for key, _ in truth.most_common(3)]
+    assert all(count <= truth[key] for key, count in summary.most_common(guaranteed=True))
+    assert summary.least_common(5) == []
+
+    exact = SpaceSaving(10)
+    for key in "aaabbc":
+        exact.add(key)
+    assert exact.is_exact
+    assert exact.most_common() == [("a", 3), ("b", 2), ("c", 1)]
+    assert exact.least_common(1) == [("c", 1)]
+
+def test_space_saving_merge_keeps_bounds():
+    first, second = _skewed_stream(7), _skewed_stream(8)
+    truth = Counter(first) + Counter(second)
+    merged, other = SpaceSaving(50), SpaceSaving(50)
+    for key in first:
+        merged.add(key)
+    for key in second:
+        other.add(key)
+    merged.merge(other)
+
+    assert merged.total == len(first) + len(second)
+    _check_space_saving_bounds(merged, truth)
+
+def test_column_analysis_reports_top_values(write_jsonl, load_file, wait_for_task, client):
+    stream = _skewed_stream(9, 5000)
+    metadata = load_file(write_jsonl([{"key": key} for key in stream]))
+
+    task_id = client.post("/api/v1/analysis/column", json={"file_id": metadata.id, "column": "key"}).json()["task_id"]
+    result = wait_for_task(task_id).result
+    truth = Counter(stream)
+    top = result["most_common_values"]
+    assert [key for key, _ in top[:3]] == [key for key, _ in truth.most_common(3)]
+    assert all(count <= truth[key] for key, count in top)
+
+def test_streaming_histogram_rebins_on_its_grid():
+    rng = random.Random(10)
+    values = [rng.randrange(0, 1000) for _ in range(20000)]
+    edges = list(range(0, 1001, 50))
+    expected = np.histogram(values, bins=edges)[0].tolist()
+
+    whole = StreamingHistogram()
+    for value in values:
+        whole.add(value)
+    assert whole.bin_counts(edges) == expected
+    assert (whole.count, whole.min, whole.max) == (len(values), min(values), max(values))
+
+    # Growing the range batch by batch and merging partitions stay exact
+    low, high = StreamingHistogram(), StreamingHistogram()
+    low.add_many(np.array([v for v in values if v < 100]))
+    high.add_many(np.array([v for v in values if 100 <= v < 500]))
+    high.add_many(np.array([v for v in values if v >= 500]))
+    low.merge(high)
+    assert low.bin_counts(edges) == expected
+    assert low.count == len(values)
+
+def test_histogram_endpoint_rebins_without_rescanning(write_jsonl, load_file, wait_for_task, client, monkeypatch):
+    values = [i % 100 for i in range(2000)] + [1000]
+    metadata = load_file(write_jsonl([{"amount": value} for value in values]))
+    task_id = client.post("/api/v1/analysis/column", json={
+        "file_id": metadata.id, "column": "amount", "histogram_bins": 10
+    }).json()["task_id"]
+    histogram = wait_for_task(task_id).result["numeric_stats"]["histogram"]
+    assert len(histogram) == 10
+    assert histogram[0]["count"] == 2000 and histogram[-1]["count"] == 1
+
+    def no_rescan(*args, **kwargs):
+        raise AssertionError("histogram re-binning must not rescan the file")
+
+    monkeypatch.setattr(analysis_module, "accumulate_columns", no_rescan)
+    rebinned = client.get(f"/api/v1/analysis/histogram/{metadata.id}/amount", params={"bins": 4}).json()
+    assert [bin["count"] for bin in rebinned["histogram"]] == [2000, 0, 0, 1]
+
+    log_scale = client.get(f"/api/v1/analysis/histogram/{metadata.id}/amount",
+                           params={"bins": 3, "log_scale": True}).json()
+    assert log_scale["histogram_scale"] == "log"
+    assert sum(bin["count"] for bin in log_scale["histogram"]) == len([v for v in values if v > 0])
+
+def test_histogram_bin_counts_are_bounded(client):
+    assert client.get("/api/v1/analysis/histogram/any/amount", params={"bins": 0}).status_code == 400
+    for endpoint, body in (
+        ("/api/v1/analysis/column", {"file_id": "any", "column": "amount", "histogram_bins": 1001}),
+        ("/api/v1/analysis/columns", {"file_id": "any", "histogram_bins": 0}),
+    ):
+        assert client.post(endpoint, json=body).status_code == 400
+
+def test_batch_analysis_scans_once_and_caches(write_jsonl, load_file, wait_for_task, client, monkeypatch):
+    records = [{"amount": i, "label": f"l{i % 4}", "flag": i % 2 == 0} for i in range(500)]
+    metadata = load_file(write_jsonl(records))
+
+    scans = []
+    accumulate = analysis_module.accumulate_columns
+
+    def counting_accumulate(file_path, columns, *args, **kwargs):
+        scans.append([column for column, _ in columns])
+        return accumulate(file_path, columns, *args, **kwargs)
+
+    monkeypatch.setattr(analysis_module, "accumulate_columns", counting_accumulate)
+    body = client.post("/api/v1/analysis/columns", json={"file_id": metadata.id, "columns": "all"}).json()
+    assert body["status"] == "started"
+    assert sorted(body["columns"]) == ["amount", "flag", "label"]
+    results = wait_for_task(body["task_id"]).result
+    assert len(scans) == 1 and sorted(scans[0]) == ["amount", "flag", "label"]
+    assert results["amount"]["numeric_stats"]["max"] == 499
+    assert results["label"]["unique_count"] == 4
+
+    body = client.post("/api/v1/analysis/columns", json={"file_id": metadata.id, "columns": ["amount", "label"]}).json()
+    assert body["status"] == "completed" and body["task_id"] is None
+    assert sorted(body["cached"]) == ["amount", "label"]
+    assert body["results"]["amount"]["numeric_stats"] == results["amount"]["numeric_stats"]
+    assert len(scans) == 1
+
+def test_batch_analysis_attaches_to_running_column_task(write_jsonl, load_file, wait_for_task, client, monkeypatch):
+    metadata = load_file(write_jsonl([{"amount": i, "label": "x"} for i in range(100)]))
+
+    release = threading.Event()
+    accumulate = analysis_module.accumulate_columns
+
+    def blocked_accumulate(*args, **kwargs):
+        release.wait(10)
+        return accumulate(*args, **kwargs)
+
+    monkeypatch.setattr(analysis_module, "accumulate_columns", blocked_accumulate)
+    column_task = client.post("/api/v1/analysis/column", json={"file_id": metadata.id, "column": "amount"}).json()["task_id"]
+    body = client.post("/api/v1/analysis/columns", json={"file_id": metadata.id, "columns": ["amount", "label"]}).json()
+    assert body["attached"] == {"amount": column_task}
+    assert body["columns"] == ["label"]
+
+    release.set()
+    assert wait_for_task(column_task).status.value == "completed"
+    assert wait_for_task(body["task_id"]).status.value == "completed"
+
+def test_batch_analysis_rejects_unknown_columns(write_jsonl, load_file, client):
+    metadata = load_file(write_jsonl([{"amount": 1}]))
+    assert client.post("/api/v1/analysis/columns", json={"file_id": metadata.id, "columns": ["nope"]}).status_code == 400
+    assert client.post("/api/v1/analysis/columns", json={"file_id": metadata.id, "columns": "some"}).status_code == 400
+
+def _mixed_length_records(count=4000):
+    rng = random.Random(11)
+    return [
+        {"long": True, "value": rng.gauss(100, 5), "padding": "x" * 200}
+        if i % 2 else {"long": False, "value": rng.gauss(10, 5)}
+        for i in range(count)
+    ]
+
+def test_offset_sample_weights_correct_for_line_length(write_jsonl):
+    records = _mixed_length_records()
+    sample = sample_records(str(write_jsonl(records)), 3000, seed=12)
+
+    low, high = sample.total_records_ci
+    assert low <= len(records) <= high
+    # Long lines are hit far more often, but their weighted share stays near the true half
+    raw_share = sum(record["long"] for record in sample.records) / len(sample)
+    share = weighted_proportion([record["long"] for record in sample.records], sample.weights)
+    assert raw_share > 0.8
+    assert share["ci_low"] <= 0.5 <= share["ci_high"]
+    mean = weighted_mean([record["value"] for record in sample.records], sample.weights)
+    assert mean["ci_low"] <= statistics.mean(record["value"] for record in records) <= mean["ci_high"]
+
+def test_sample_estimators():
+    assert estimate_distinct(list("aabbcd"), 6) == 4
+    assert estimate_distinct([f"v{i}" for i in range(100)], 10000) > 1000
+    assert estimate_distinct(["same"] * 100, 10000) == 1
+
+    quantiles = weighted_quantiles(list(range(1, 101)), [1.0] * 100, [0.5, 0.9])
+    assert quantiles[0]["estimate"] == 50 and quantiles[1]["estimate"] == 90
+    assert quantiles[0]["ci_low"] < 50 < quantiles[0]["ci_high"]
+
+def test_approximate_column_analysis_then_exact(write_jsonl, load_file, wait_for_task, client, monkeypatch):
+    records = _mixed_length_records()
+    metadata = load_file(write_jsonl(records))
+    monkeypatch.setattr(analysis_module, "sample_records",
+                        lambda file_path, sample_size: sample_records(file_path, sample_size, seed=13))
+    true_mean = statistics.mean(record["value"] for record in records)
+
+    body = client.post("/api/v1/analysis/column", json={
+        "file_id": metadata.id, "column": "value", "approximate": True
+    }).json()
+    assert body["status"] == "approximate"
+    stats = body["result"]["numeric_stats"]
+    assert stats["mean_ci"][0] <= true_mean <= stats["mean_ci"][1]
+    assert body["result"]["sampling"]["method"] == "offset"
+
+    wait_for_task(body["task_id"])
+    body = client.post("/api/v1/analysis/column", json={
+        "file_id": metadata.id, "column": "value", "approximate": True
+    }).json()
+    assert body["status"] == "completed"
+    assert body["result"]["numeric_stats"]["mean"] == pytest.approx(true_mean)
+
+def _records_with_duplicates(count=3000):
+    rng = random.Random(14)
+    records = [{"id": i, "tags": ["a", i % 5], "nested": {"x": i % 3}} for i in range(count)]
+    for _ in range(400):
+        source = records[rng.randrange(len(records))]
+        # Same content with keys in another order
+        records.insert(rng.randrange(len(records) + 1), dict(reversed(list(source.items()))))
+    return records
+
+def _expected_groups(records):
+    rows = {}
+    for row, record in enumerate(records):
+        rows.setdefault(json.dumps(record, sort_keys=True), []).append(row)
+    groups = [group for group in rows.values() if len(group) > 1]
+    return sorted(groups, key=lambda group: (-len(group), group[0]))
+
+def _detect(records, **kwargs):
+    detector = DuplicateDetector(**kwargs)
+    detector.BATCH_SIZE = 256
+    for record in records:
+        detector.add(record)
+    return detector.result(lambda: iter(records), max_groups=10000)
+
+def test_canonical_json_ignores_key_order():
+    assert canonical_json({"b": 1, "a": [1, {"d": 2, "c": 3}]}) == canonical_json({"a": [1, {"c": 3, "d": 2}], "b": 1})
+    assert record_digest({"a": 1}) != record_digest({"a": "1"})
+
+@pytest.mark.parametrize("options", [
+    {"hash_bits": 64},
+    {"hash_bits": 128},
+    {"hash_bits": 64, "memory_budget": 2048, "expected_records": 3400},
+])
+def test_duplicate_groups_match_exact_grouping(options):
+    records = _records_with_duplicates()
+    expected = _expected_groups(records)
+    report = _detect(records, **options)
+
+    assert report["mode"] == ("bloom" if "memory_budget" in options else "exact")
+    assert report["duplicate_count"] == sum(len(group) - 1 for group in expected)
+    assert report["duplicate_group_count"] == len(expected)
+    assert [group["row_ids"] for group in report["duplicate_groups"]] == expected
+
+def test_duplicate_detector_rejects_unsupported_hash_size():
+    with pytest.raises(ValueError):
+        DuplicateDetector(hash_bits=32)
+
+def test_quality_endpoint_reports_duplicates(write_jsonl, load_file, wait_for_task, client):
+    records = [{"a": 1, "b": None}, {"b": None, "a": 1}, {"a": 2, "b": "x"}, {"a": 1, "b": None}]
+    metadata = load_file(write_jsonl(records))
+
+    body = client.post("/api/v1/analysis/quality", json={"file_id": metadata.id}).json()
+    report = wait_for_task(body["task_id"]).result
+    assert report["duplicate_count"] == 2
+    assert report["duplicates"]["duplicate_groups"] == [{"count": 3, "row_ids": [0, 1, 3]}]
+    assert report["column_completeness"]["b"]["non_null_count"] == 1
+
+    cached = client.post("/api/v1/analysis/quality", json={"file_id": metadata.id}).json()
+    assert cached["status"] == "completed"
+    assert cached["result"]["duplicate_count"] == 2
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+def test_analysis_store_round_trip_and_lru_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "time", _Clock())
+    store = AnalysisStore(f"sqlite:///{tmp_path / 'store.db'}", max_entries=2)
+    histogram = StreamingHistogram()
+    histogram.add_many(np.arange(10.0))
+
+    store.put("fp-a", str(tmp_path / "a.jsonl"), "column", "x", 1, {"mean": 4.5}, {"linear": histogram.to_state()})
+    result, sketches = store.get("fp-a", "column", "x", 1)
+    assert result == {"mean": 4.5}
+    assert StreamingHistogram.from_state(sketches["linear"]).bin_counts([0, 5, 9]) == [5, 5]
+    assert store.get("fp-a", "column", "x", 2) is None
+
+    store.put("fp-b", str(tmp_path / "b.jsonl"), "overview", "", 1, {"b": 1})
+    store.get("fp-a", "column", "x", 1)  # a is now more recent than b
+    store.put("fp-c", str(tmp_path / "c.jsonl"), "overview", "", 1, {"c": 1})
+    assert store.get("fp-b", "overview", "", 1) is None
+    assert store.get("fp-a", "column", "x", 1) is not None
+
+    # A new fingerprint of a path replaces its older results
+    store.put("fp-a2", str(tmp_path / "a.jsonl"), "overview", "", 1, {"a": 2})
+    assert store.get("fp-a", "column", "x", 1) is None
+    assert store.invalidate(str(tmp_path / "a.jsonl")) == 1
+    assert store.get("fp-a2", "overview", "", 1) is None
+
+def test_histogram_state_round_trip():
+    histogram = StreamingHistogram(resolution=64)
+    histogram.add_many(np.array([-3.0, 0.5, 0.5, 7.25, 100.0]))
+    state = histogram.to_state()
+    assert json.loads(json.dumps(state)) == state
+    assert len(state["bins"]) == 4  # Only occupied bins are kept
+
+    restored = StreamingHistogram.from_state(state)
+    assert (restored.count, restored.min, restored.max) == (5, -3.0, 100.0)
+    assert restored.counts.tolist() == histogram.counts.tolist()
+    restored.merge(histogram)
+    assert restored.bin_counts([-3, 50, 100]) == [8, 2]
+
+def test_analysis_store_ignores_unreadable_sketches(tmp_path):
+    store = AnalysisStore(f"sqlite:///{tmp_path / 'store.db'}")
+    store.put("fp", str(tmp_path / "a.jsonl"), "column", "x", 1, {"mean": 1})
+    with sqlite3.connect(store.db_path) as conn:
+        conn.execute("UPDATE analysis_results SET sketches = ?", (pickle.dumps({"linear": StreamingHistogram()}),))
+    assert store.get("fp", "column", "x", 1) is None
+
+def test_column_results_keep_only_their_type_histograms(write_jsonl, load_file, wait_for_task, client):
+    records = [{"amount": i, "name": f"n{i % 7}", "at": f"2024-05-{i % 28 + 1:02d}T10:00:00Z"} for i in range(50)]
+    metadata = load_file(write_jsonl(records))
+    body = {"file_id": metadata.id, "columns": ["amount", "name", "at"]}
+    wait_for_task(client.post("/api/v1/analysis/columns", json=body).json()["task_id"])
+
+    fingerprint = file_fingerprint(metadata.file_path)
+    stored = {column: analysis_store.get(fingerprint, "column", column, AnalysisService.ANALYSIS_VERSION)[1]
+              for column in body["columns"]}
+    assert {column: sorted(sketches) for column, sketches in stored.items()} == {
+        "amount": ["linear", "log"], "name": [], "at": ["time"]
+    }
+
+    histogram = client.get(f"/api/v1/analysis/histogram/{metadata.id}/name").json()
+    assert histogram["histogram"] == [] and histogram["time_histogram"]["bins"] == []
+    histogram = client.get(f"/api/v1/analysis/histogram/{metadata.id}/at?time_bucket=day").json()
+    assert sum(bin["count"] for bin in histogram["time_histogram"]["bins"]) == 50
+
+def test_file_fingerprint_follows_contents(write_jsonl):
+    path = write_jsonl([{"a": 1}])
+    first = file_fingerprint(str(path))
+    assert file_fingerprint(str(path)) == first
+    write_jsonl([{"a": 2}, {"a": 3}])
+    assert file_fingerprint(str(path)) != first
+
+def test_analysis_results_survive_restart_and_file_deletion_invalidates(write_jsonl, load_file, wait_for_task, client):
+    metadata = load_file(write_jsonl([{"amount": i} for i in range(50)]))
+    task_id = client.post("/api/v1/analysis/column", json={"file_id": metadata.id, "column": "amount"}).json()["task_id"]
+    wait_for_task(task_id)
+
+    # A fresh service (as after a restart) answers from the persistent store
+    restarted = AnalysisService()
+    analysis = restarted.get_cached_analysis(metadata.id, "amount", bins=5)
+    assert analysis["numeric_stats"]["max"] == 49
+    assert len(analysis["numeric_stats"]["histogram"]) == 5
+
+    fingerprint = file_fingerprint(metadata.file_path)
+    assert file_loader_service.delete_file(metadata.id)
+    assert analysis_store.get(fingerprint, "column", "amount", AnalysisService.ANALYSIS_VERSION) is None
+
+def _correlation_records(count=3000):
+    rng = random.Random(15)
+    records = []
+    for i in range(count):
+        x = rng.uniform(-5, 5)
+        records.append({
+            "x": 1e9 + x,
+            "y": None if i % 10 == 0 else 3 * x + rng.gauss(0, 1),
+            "z": x ** 3,
+            "color": "red" if x > 0 else "blue",
+            "size": ("big" if x > 0 else "small") if i % 4 else "medium",
+            "noise": rng.choice("abc"),
+        })
+    return records
+
+def _accumulate(records, shifts=None, **kwargs):
+    accumulator = CorrelationAccumulator(["x", "y", "z"], ["color", "size", "noise"], shifts, **kwargs)
+    accumulator.BATCH_SIZE = 500
+    for record in records:
+        accumulator.add_record(record)
+    accumulator.flush()
+    return accumulator
+
+def test_pearson_uses_pairwise_complete_rows_and_merges():
+    records = _correlation_records()
+    paired = [(r["x"], r["y"]) for r in records if r["y"] is not None]
+    expected = np.corrcoef(np.array(paired).T)[0, 1]
+
+    whole = _accumulate(records, shifts=[1e9, 0.0, 0.0])
+    merged = _accumulate(records[:1000], shifts=[1e9, 0.0, 0.0])
+    merged.merge(_accumulate(records[1000:], shifts=[1e9, 0.0, 0.0]))
+    for accumulator in (whole, merged):
+        pearson = accumulator.pearson()
+        assert pearson["matrix"][0][1] == pytest.approx(expected, abs=1e-9)
+        assert pearson["n"][0][1] == len(paired)
+        assert pearson["n"][0][0] == len(records)
+        assert pearson["matrix"][0][0] == pytest.approx(1.0)
+
+def test_spearman_ranks_monotonic_relations():
+    assert average_ranks(np.array([10.0, 20.0, 20.0, 30.0])).tolist() == [1.0, 2.5, 2.5, 4.0]
+
+    records = _correlation_records()
+    spearman = _accumulate(records, seed=16).spearman()
+    assert spearman["sample_size"] == len(records)
+    assert spearman["matrix"][0][2] == pytest.approx(1.0)
+    xs = np.array([r["x"] for r in records if r["y"] is not None])
+    ys = np.array([r["y"] for r in records if r["y"] is not None])
+    assert spearman["matrix"][0][1] == pytest.approx(np.corrcoef(average_ranks(xs), average_ranks(ys))[0, 1])
+
+    sampled = _accumulate(records, sample_size=500, seed=17).spearman()
+    assert sampled["sample_size"] == 500
+    assert sampled["matrix"][0][2] == pytest.approx(1.0)
+
+def test_cramers_v_and_category_overflow():
+    assert cramers_v(np.array([[10, 0], [0, 10]]))["cramers_v"] == pytest.approx(1.0)
+    independent = cramers_v(np.array([[10, 20], [20, 40]]))
+    assert independent["cramers_v"] == pytest.approx(0.0) and independent["dof"] == 1
+    assert cramers_v(np.array([[5, 5]]))["cramers_v"] is None
+
+    records = _correlation_records()
+    pairs = {tuple(pair["columns"]): pair for pair in _accumulate(records).contingency(include_tables=True)}
+    assert pairs[("color", "size")]["cramers_v"] > 0.6
+    assert pairs[("color", "noise")]["cramers_v"] < 0.1
+    assert sum(map(sum, pairs[("color", "noise")]["table"]["counts"])) == len(records)
+
+    overflowed = _accumulate(records, max_categories=2)
+    assert overflowed.overflowed == [False, True, True]
+    assert overflowed.contingency() == []
+
+def test_contingency_tables_grow_with_the_categories_seen():
+    records = _correlation_records()
+    whole = _accumulate(records, max_categories=1000)
+    assert {pair: table.shape for pair, table in whole.tables.items()} == {(0, 1): (2, 3), (0, 2): (2, 3), (1, 2): (3, 3)}
+
+    # Partitions that meet categories in different orders merge to the same tables
+    merged = _accumulate(records[1500:], max_categories=1000)
+    merged.merge(_accumulate(records[:1500], max_categories=1000))
+    for pair, table in whole.tables.items():
+        order_i = [list(merged.categories[pair[0]]).index(key) for key in whole.categories[pair[0]]]
+        order_j = [list(merged.categories[pair[1]]).index(key) for key in whole.categories[pair[1]]]
+        assert merged.tables[pair][np.ix_(order_i, order_j)].tolist() == table.tolist()
+
+    overflowed = _accumulate(records, max_categories=2)
+    assert overflowed.tables[(0, 1)].size == 0 and overflowed.tables[(1, 2)].size == 0
+
+def test_correlation_endpoint(write_jsonl, load_file, wait_for_task, client):
+    records = _correlation_records(500)
+    metadata = load_file(write_jsonl(records))
+
+    body = client.post("/api/v1/analysis/correlation", json={"file_id": metadata.id, "max_categories": 2}).json()
+    result = wait_for_task(body["task_id"]).result
+    assert result["numeric_columns"] == ["x", "y", "z"]
+    assert result["categorical_columns"] == ["color"]
+    assert set(result["skipped_columns"]) == {"size", "noise"}
+    assert result["spearman"]["matrix"][0][2] == pytest.approx(1.0)
+
+    cached = client.post("/api/v1/analysis/correlation", json={"file_id": metadata.id, "max_categories": 2}).json()
+    assert cached["status"] == "completed"
+    for request in ({"methods": ["kendall"]}, {"columns": ["missing"]}, {"max_categories": 1}):
+        assert client.post("/api/v1/analysis/correlation", json={"file_id": metadata.id, **request}).status_code == 400
+
+def _epoch(*args, tz=timezone.utc):
+    return int(datetime(*args, tzinfo=tz).timestamp())
+
+def test_timestamp_formats_parse_to_epoch_seconds():
+    parser = TimestampParser()
+    assert parser.parse("2024-03-01T12:30:15") == _epoch(2024, 3, 1, 12, 30, 15)
+    assert parser.parse("2024-03-01 12:30:15.250Z") == _epoch(2024, 3, 1, 12, 30, 15)
+    assert parser.parse("2024-03-01T12:30:15+02:00") == _epoch(2024, 3, 1, 10, 30, 15)
+    assert parser.parse("03/01/2024 08:05") == _epoch(2024, 3, 1, 8, 5)
+    assert parser.parse("1969/12/31") == _epoch(1969, 12, 31)
+    assert parser.parse("2023-02-29") is None
+    assert parser.parse("13/01/2024") is None
+    assert parser.parse(20240301) is None
+    assert parser.failures == 3
+    assert parser.format_counts == Counter({"iso": 1, "iso_tz": 2, "mdy": 1, "ymd_slash": 1})
+
+def test_parse_many_matches_per_value_parsing():
+    rng = random.Random(18)
+    values = [
+        (datetime(1950, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=rng.randrange(3_000_000_000)))
+        .strftime("%Y-%m-%dT%H:%M:%S")
+        for _ in range(1000)
+    ]
+    expected = [_epoch(*map(int, re.split(r"[-T:]", value))) for value in values]
+
+    parser = TimestampParser()
+    assert parser.parse_many(values).tolist() == expected
+    assert parser.format == "iso"
+
+    mixed = values[:3] + ["not a date", "2024-01-05T00:00:00Z"]
+    fallback = TimestampParser()
+    assert fallback.parse_many(mixed).tolist() == expected[:3] + [_epoch(2024, 1, 5)]
+    assert fallback.failures == 1
+
+def test_date_column_analysis_buckets_times(write_jsonl, load_file, wait_for_task, client):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)  # A Monday
+    stamps = [start + timedelta(hours=7 * i) for i in range(200)]
+    metadata = load_file(write_jsonl([{"at": stamp.strftime("%Y-%m-%dT%H:%M:%S")} for stamp in stamps]))
+    assert {column.name: column.data_type.value for column in metadata.columns}["at"] == "date"
+
+    task_id = client.post("/api/v1/analysis/column", json={
+        "file_id": metadata.id, "column": "at", "time_bucket": "day"
+    }).json()["task_id"]
+    result = wait_for_task(task_id).result
+    assert result["parsed_count"] == 200 and result["unparsed_count"] == 0
+    assert result["date_range"]["earliest"] == start.isoformat()
+    assert [bin["count"] for bin in result["hour_of_day"]] == [
+        sum(1 for stamp in stamps if stamp.hour == hour) for hour in range(24)
+    ]
+    assert [bin["count"] for bin in result["day_of_week"]] == [
+        sum(1 for stamp in stamps if stamp.weekday() == day) for day in range(7)
+    ]
+    histogram = result["time_histogram"]
+    assert histogram["bucket"] == "day"
+    assert [bin["count"] for bin in histogram["bins"]] == list(Counter(stamp.date() for stamp in stamps).values())
+
+    weekly = client.get(f"/api/v1/analysis/histogram/{metadata.id}/at", params={"time_bucket": "week"}).json()
+    assert weekly["time_histogram"]["bucket"] == "week"
+    assert weekly["time_histogram"]["bins"][0]["start"] == start.isoformat()
+    assert sum(bin["count"] for bin in weekly["time_histogram"]["bins"]) == 200
+
+def _text_summary(texts, char_stats=False, parts=1):
+    accumulators = [TextAccumulator(char_stats) for _ in range(parts)]
+    for accumulator in accumulators:
+        accumulator.BATCH_CHARS = 64
+    for i, text in enumerate(texts):
+        accumulators[i % parts].add(text)
+    for other in accumulators[1:]:
+        accumulators[0].merge(other)
+    return accumulators[0].summary()
+
+def test_text_accumulator_counts_words_across_batches_and_merges():
+    rng = random.Random(19)
+    vocabulary = ["alpha", "beta", "gamma", "delta", "epsilon"]
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(rng.randrange(1, 8))) for _ in range(500)]
+    words = Counter(word for text in texts for word in text.split())
+
+    for parts in (1, 3):
+        summary = _text_summary(texts, parts=parts)
+        assert summary["total_words"] == sum(words.values())
+        assert dict(summary["most_common_words"]) == dict(words)
+        assert summary["unique_word_count"] == 5
+        lengths = [len(text) for text in texts]
+        assert summary["length_stats"]["min"] == min(lengths)
+        assert summary["length_stats"]["mean"] == pytest.approx(statistics.mean(lengths))
+        assert "char_stats" not in summary
+
+    # Adjacent texts never join into one word
+    assert dict(_text_summary(["end", "start"])["most_common_words"]) == {"end": 1, "start": 1}
+
+def test_text_char_classes_and_scripts():
+    summary = _text_summary(["Ab1 !\té", "Привет", "日本"], char_stats=True, parts=2)["char_stats"]
+    counts = {name: item["count"] for name, item in summary["classes"].items()}
+    assert counts == {"letter": 2, "digit": 1, "whitespace": 2, "punctuation": 1, "control": 0, "non_ascii": 9}
+    assert summary["total_chars"] == 15
+    assert {name: item["count"] for name, item in summary["scripts"].items()} == {"latin": 3, "cyrillic": 6, "cjk": 2}
+
+def test_string_column_analysis_reports_text_stats(write_jsonl, load_file, wait_for_task, client, monkeypatch):
+    monkeypatch.setattr(analysis_module.settings, "text_char_stats", True)
+    texts = ["the quick fox", "the lazy dog", "THE END"]
+    metadata = load_file(write_jsonl([{"text": text} for text in texts]))
+
+    task_id = client.post("/api/v1/analysis/column", json={"file_id": metadata.id, "column": "text"}).json()["task_id"]
+    result = wait_for_task(task_id).result
+    assert result["most_common_words"][0] == ("the", 3)
+    assert result["total_words"] == 8
+    assert result["length_stats"]["max"] == 13
+    assert result["char_stats"]["classes"]["whitespace"]["count"] == 5
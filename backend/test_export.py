@@ -0,0 +1,431 @@
+"""
+Tests for streaming, columnar, Excel, compressed and partitioned exports and export jobs
+"""
+import csv
+import gzip
+import io
+import json
+import threading
+import zipfile
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import zstandard
+
+import app.processors.excel_writer as excel_writer_module
+import app.processors.external_sort as external_sort_module
+from app.core.config import settings
+from app.models.filter import DataRequest, SortRule
+from app.processors.columnar import arrow_schema
+from app.processors.excel_writer import cell_value, write_excel
+from app.processors.external_sort import external_sort
+from app.processors.shard_writer import compressor, parallel_compress
+from app.services.data_service import data_service
+from app.services.export_service import export_service, parse_range, prime_stream
+
+def _records(count):
+    return [{"row": i, "group": "abcde"[i * 7 % 5], "score": i * 37 % 11, "meta": {"even": i % 2 == 0}}
+            for i in range(count)]
+
+def _export(client, file_id, format, **options):
+    response = client.post("/api/v1/export/", json={"data_request": {"file_id": file_id}, "format": format, **options})
+    assert response.status_code == 200, response.text
+    return response
+
+def test_external_sort_is_stable_across_spilled_runs(monkeypatch):
+    monkeypatch.setattr(external_sort_module, "MAX_MERGE_RUNS", 3)  # Forces intermediate merge passes
+    records = _records(200)
+    key = lambda record: record["score"]
+    expected = sorted(records, key=key)
+
+    assert list(external_sort(iter(records), key, run_records=7)) == expected
+    assert list(external_sort(iter(records), key, run_records=1000)) == expected  # One in-memory run
+    assert list(external_sort(iter([]), key, run_records=7)) == []
+
+def test_sorted_result_keeps_file_order_for_ties(write_jsonl, load_file, monkeypatch):
+    monkeypatch.setattr(settings, "sort_run_records", 16)
+    records = _records(300)
+    metadata = load_file(write_jsonl(records))
+
+    request = DataRequest(file_id=metadata.id, sort=[SortRule(column="group", order="desc"), SortRule(column="score")])
+    result = list(data_service.iter_records(request))
+    expected = sorted(sorted(records, key=lambda record: record["score"]), key=lambda record: record["group"],
+                      reverse=True)
+    assert result == expected
+
+def test_export_streams_the_whole_result_in_chunks(write_jsonl, load_file, client, monkeypatch):
+    monkeypatch.setattr(settings, "export_chunk_bytes", 1024)
+    records = _records(500)
+    metadata = load_file(write_jsonl(records))
+
+    stream = export_service._build_export(DataRequest(file_id=metadata.id, page_size=10), "jsonl")["stream"]
+    chunks = list(stream)
+    assert len(chunks) > 10 and all(len(chunk) < 2048 for chunk in chunks)
+    assert [json.loads(line) for line in b"".join(chunks).splitlines()] == records  # Not just one page
+
+    response = _export(client, metadata.id, "json")
+    assert response.headers["content-disposition"] == "attachment; filename=data_export.json"
+    assert json.loads(response.content) == records
+
+    filters = {"groups": [{"rules": [{"column": "group", "operator": "equals", "value": "zzz"}]}]}
+    response = _export(client, metadata.id, "json", data_request={"file_id": metadata.id, "filters": filters})
+    assert json.loads(response.content) == []
+
+def test_export_columns_come_from_the_full_schema_or_a_spool(write_jsonl, load_file, client):
+    metadata = load_file(write_jsonl(_records(20)))
+    assert [column.name for column in metadata.columns] == ["group", "meta", "row", "score"]
+    records = iter([{"b": 1}, {"a": 2, "z": 3}, {"c": 4}])
+    columns, replayed = export_service._export_columns(records, metadata)
+    assert columns == ["group", "meta", "row", "score"] and replayed is records  # No spool after full analysis
+
+    # A sampled schema is completed with the keys it lacks
+    sampled = metadata.model_copy(update={"processing_status": "quick_analysis_complete",
+                                          "columns": metadata.columns[2:]})
+    columns, replayed = export_service._export_columns(iter([{"row": 1}, {"a": 2, "z": 3}, {"c": 4}]), sampled)
+    assert columns == ["row", "score", "a", "c", "z"]
+    assert list(replayed) == [{"row": 1}, {"a": 2, "z": 3}, {"c": 4}]
+
+    rows = list(csv.DictReader(io.StringIO(_export(client, metadata.id, "csv").text)))
+    assert list(rows[0]) == ["group", "meta", "row", "score"]
+    assert len(rows) == 20
+    assert rows[3] == {"group": "b", "meta": '{"even": false}', "row": "3", "score": "1"}
+
+def test_export_streams_start_before_records_are_read(write_jsonl, load_file, monkeypatch):
+    metadata = load_file(write_jsonl(_records(20)))
+    started = []
+
+    def tracked_records(request, progress_callback=None):
+        started.append(True)
+        yield from _records(20)
+    monkeypatch.setattr(data_service, "iter_records", tracked_records)
+
+    request = DataRequest(file_id=metadata.id, sort=[SortRule(column="score")])
+    for format, compression in (("json", None), ("jsonl", "gzip"), ("csv", "zstd"), ("parquet", None),
+                                ("arrow", None)):
+        stream = prime_stream(export_service._build_export(request, format, compression=compression)["stream"])
+        assert not started, format
+        assert b"".join(stream)
+        assert started.pop()
+
+def test_export_rejects_invalid_requests(write_jsonl, load_file, client):
+    metadata = load_file(write_jsonl(_records(5)))
+    for body in ({"data_request": {"file_id": metadata.id}, "format": "xml"},
+                 {"data_request": {"file_id": "missing"}, "format": "jsonl"}):
+        assert client.post("/api/v1/export/", json=body).status_code == 400
+
+def _nested_records(count):
+    return [{"row": i, "name": f"n{i}", "meta": {"even": i % 2 == 0, "tags": ["t"] * (i % 3)},
+             "mixed": i if i % 2 else "x"} for i in range(count)]
+
+def _as_columnar(record):
+    """A nested record as read back from Parquet/Arrow: mixed values as JSON text"""
+    mixed = record["mixed"]
+    return record | {"mixed": mixed if isinstance(mixed, str) else json.dumps(mixed)}
+
+def test_arrow_schema_preserves_nested_structure(write_jsonl, load_file):
+    metadata = load_file(write_jsonl(_nested_records(30)))
+    schema = arrow_schema(metadata.columns, metadata.fields)
+    assert schema == pa.schema([
+        pa.field("meta", pa.struct([pa.field("even", pa.bool_()), pa.field("tags", pa.list_(pa.string()))])),
+        pa.field("mixed", pa.string()),
+        pa.field("name", pa.string()),
+        pa.field("row", pa.int64()),
+    ])
+
+def test_parquet_export_round_trip(write_jsonl, load_file, client):
+    records = _nested_records(300)
+    metadata = load_file(write_jsonl(records))
+
+    response = _export(client, metadata.id, "parquet", compression="zstd", row_group_size=64)
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.metadata.num_row_groups == 5
+    assert parquet.metadata.row_group(0).column(0).compression == "ZSTD"
+    assert parquet.read().to_pylist() == [_as_columnar(record) for record in records]
+
+def test_arrow_export_round_trip(write_jsonl, load_file, client):
+    records = _nested_records(300)
+    metadata = load_file(write_jsonl(records))
+
+    response = _export(client, metadata.id, "arrow", compression="lz4", row_group_size=100)
+    reader = pa.ipc.open_file(io.BytesIO(response.content))
+    assert reader.num_record_batches == 3
+    assert reader.read_all().to_pylist() == [_as_columnar(record) for record in records]
+
+def test_columnar_export_keeps_large_integers_exact(write_jsonl, load_file, client):
+    records = [{"id": 2 ** 53 + i, "ratio": i / 2, "huge": 2 ** 64 if i == 0 else i} for i in range(10)]
+    metadata = load_file(write_jsonl(records))
+    columns = {column.name: column for column in metadata.columns}
+    assert columns["id"].integer_count == 10 and columns["ratio"].integer_count == 0
+
+    for format in ("parquet", "arrow"):
+        content = _export(client, metadata.id, format).content
+        table = pq.read_table(io.BytesIO(content)) if format == "parquet" else pa.ipc.open_file(io.BytesIO(content)).read_all()
+        assert table.schema.field("id").type == pa.int64()
+        assert table.schema.field("ratio").type == pa.float64()
+        assert table.schema.field("huge").type == pa.float64()  # Beyond int64
+        assert table.column("id").to_pylist() == [record["id"] for record in records]
+
+def test_columnar_and_excel_exports_include_keys_missing_from_a_sampled_schema(write_jsonl, load_file):
+    metadata = load_file(write_jsonl(_nested_records(20)))
+    sampled = metadata.model_copy(update={"processing_status": "quick_analysis_complete",
+                                          "columns": [column for column in metadata.columns if column.name != "name"]})
+    records = _nested_records(20)
+
+    table = pq.read_table(io.BytesIO(b"".join(export_service._export_columnar(iter(records), sampled, "parquet",
+                                                                               None, None)["stream"])))
+    assert table.column_names == ["meta", "mixed", "row", "name"]
+    assert table.column("name").to_pylist() == [record["name"] for record in records]
+
+    sheets = _read_workbook(b"".join(export_service._export_excel(iter(records), sampled, False)["stream"]))
+    assert sheets["Data"][0] == ["meta", "mixed", "row", "name"]
+    assert sheets["Data"][1][3] == "n0"
+
+def test_columnar_export_rejects_invalid_options(write_jsonl, load_file, client):
+    metadata = load_file(write_jsonl(_nested_records(5)))
+    for options in ({"format": "arrow", "compression": "snappy"}, {"format": "parquet", "row_group_size": -1}):
+        response = client.post("/api/v1/export/", json={"data_request": {"file_id": metadata.id}, **options})
+        assert response.status_code == 400
+
+def _read_workbook(content):
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+    return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)] for sheet in workbook.worksheets}
+
+def test_excel_splits_sheets_at_the_row_limit(monkeypatch, tmp_path):
+    monkeypatch.setattr(excel_writer_module, "MAX_SHEET_ROWS", 10)
+    records = [{"n": i, "tag": "ab"[i % 2]} for i in range(25)]
+    sheets = _read_workbook(b"".join(write_excel(iter(records), ["n", "tag"], spill_dir=str(tmp_path))))
+
+    assert list(sheets) == ["Data", "Data 2", "Data 3"]
+    assert all(rows[0] == ["n", "tag"] for rows in sheets.values())
+    assert [len(rows) for rows in sheets.values()] == [10, 10, 8]  # Header rows count towards the limit
+    assert [row for rows in sheets.values() for row in rows[1:]] == [[i, "ab"[i % 2]] for i in range(25)]
+    assert list(tmp_path.iterdir()) == []  # The spilled workbook is removed
+
+    sheets = _read_workbook(b"".join(write_excel(iter([]), ["n"], spill_dir=str(tmp_path))))
+    assert sheets == {"Data": [["n"]]}
+
+def test_excel_cell_values():
+    assert cell_value({"a": [1]}) == '{"a": [1]}'
+    assert cell_value("bell\x07") == "bell"
+    assert len(cell_value("x" * 40000)) == excel_writer_module.MAX_CELL_CHARS
+    assert cell_value(1.5) == 1.5 and cell_value(None) is None
+
+def test_excel_export_with_statistics(write_jsonl, load_file, client):
+    records = [{"n": i, "tag": "aab"[i % 3], "nested": {"i": i}} for i in range(30)]
+    metadata = load_file(write_jsonl(records))
+
+    sheets = _read_workbook(_export(client, metadata.id, "excel", include_stats=True).content)
+    assert list(sheets) == ["Data", "Statistics"]
+    assert sheets["Data"][0] == ["n", "nested", "tag"]
+    assert sheets["Data"][2] == [1, '{"i": 1}', "a"]
+
+    stats = {row[0]: row for row in sheets["Statistics"][1:]}
+    assert sheets["Statistics"][0] == excel_writer_module.STATS_HEADER
+    assert stats["n"][1:3] == ["Numeric", 30]
+    assert stats["n"][3] == pytest.approx(14.5)
+    assert stats["n"][5:7] == [0, 29]
+    assert stats["tag"][1:3] == ["Text", 30]
+    assert stats["tag"][7:] == [2, "a"]
+
+def test_large_excel_exports_are_sent_to_jobs(write_jsonl, load_file, client, wait_for_task, monkeypatch):
+    monkeypatch.setattr(settings, "export_sync_excel_max_records", 20)
+    metadata = load_file(write_jsonl(_records(30)))
+
+    response = client.post("/api/v1/export/", json={"data_request": {"file_id": metadata.id}, "format": "excel"})
+    assert response.status_code == 400 and "/export/jobs" in response.json()["detail"]
+    _export(client, metadata.id, "jsonl")  # Streaming formats are not limited
+
+    job = _finished_job(client, wait_for_task, metadata.id, "excel")
+    assert job["status"] == "completed"
+    content = client.get(f"/api/v1/export/jobs/{job['job_id']}/download").content
+    assert len(_read_workbook(content)["Data"]) == 31
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=90-500", 100) == (90, 99)  # Clipped to the file
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+    # Malformed, reversed and multi-range headers fall back to the whole file
+    for header in ("items=0-9", "bytes=a-b", "bytes=9-0", "bytes=0-1,5-6", "bytes=5"):
+        assert parse_range(header, 100) is None
+    for header in ("bytes=100-", "bytes=-0"):
+        with pytest.raises(ValueError):
+            parse_range(header, 100)
+
+def _finished_job(client, wait_for_task, file_id, format="jsonl", **options):
+    job = client.post("/api/v1/export/jobs", json={"data_request": {"file_id": file_id}, "format": format,
+                                                   **options}).json()
+    wait_for_task(export_service.jobs[job["job_id"]].task_id)
+    return client.get(f"/api/v1/export/jobs/{job['job_id']}").json()
+
+def test_export_job_download_supports_ranges(write_jsonl, load_file, client, wait_for_task):
+    records = _records(200)
+    metadata = load_file(write_jsonl(records))
+    content = "".join(json.dumps(record) + "\n" for record in records).encode()
+
+    job = _finished_job(client, wait_for_task, metadata.id)
+    assert job["status"] == "completed" and job["size"] == len(content)
+    assert job["expires_at"] == pytest.approx(job["completed_at"] + settings.export_job_ttl)
+    url = f"/api/v1/export/jobs/{job['job_id']}/download"
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.content == content
+    assert response.headers["etag"] == job["etag"] and response.headers["accept-ranges"] == "bytes"
+
+    response = client.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206 and response.content == content[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(content)}"
+    assert client.get(url, headers={"Range": "bytes=-50"}).content == content[-50:]
+
+    # A resume is only honoured while the ETag still matches
+    response = client.get(url, headers={"Range": "bytes=100-", "If-Range": job["etag"]})
+    assert response.status_code == 206 and response.content == content[100:]
+    response = client.get(url, headers={"Range": "bytes=100-", "If-Range": '"stale"'})
+    assert response.status_code == 200 and response.content == content
+
+    response = client.get(url, headers={"Range": f"bytes={len(content)}-"})
+    assert response.status_code == 416 and response.headers["content-range"] == f"bytes */{len(content)}"
+    assert client.get(url, headers={"If-None-Match": job["etag"]}).status_code == 304
+
+def test_export_job_cancellation(write_jsonl, load_file, client, wait_for_task, monkeypatch):
+    metadata = load_file(write_jsonl(_records(10)))
+    release = threading.Event()
+
+    def blocked_records(request, progress_callback=None):
+        yield from _records(10)
+        release.wait(10)
+    monkeypatch.setattr(data_service, "iter_records", blocked_records)
+
+    job_id = client.post("/api/v1/export/jobs", json={"data_request": {"file_id": metadata.id},
+                                                      "format": "jsonl"}).json()["job_id"]
+    job = export_service.jobs[job_id]
+    assert client.get(f"/api/v1/export/jobs/{job_id}/download").status_code == 409
+
+    assert client.delete(f"/api/v1/export/jobs/{job_id}").status_code == 200
+    release.set()
+    assert wait_for_task(job.task_id).status.value == "cancelled"
+    assert not job.path.exists() and not job.path.with_name(job.path.name + ".part").exists()
+    assert client.get(f"/api/v1/export/jobs/{job_id}").status_code == 404
+    assert client.delete(f"/api/v1/export/jobs/{job_id}").status_code == 404
+
+def test_export_jobs_expire_after_their_ttl(write_jsonl, load_file, client, wait_for_task):
+    metadata = load_file(write_jsonl(_records(10)))
+    job = _finished_job(client, wait_for_task, metadata.id)
+    path = export_service.jobs[job["job_id"]].path
+    assert path.exists()
+
+    export_service.jobs[job["job_id"]].expires_at = job["completed_at"] - 1  # As if the TTL had passed
+    assert client.get(f"/api/v1/export/jobs/{job['job_id']}").status_code == 404
+    assert client.get(f"/api/v1/export/jobs/{job['job_id']}/download").status_code == 404
+    assert not path.exists()
+
+def _zstd_decompress(data):
+    return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True).read()
+
+def _jsonl(records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+def _shards(content):
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+def test_parallel_compression_round_trip():
+    chunks = [bytes(f"chunk {i} ", "ascii") * (i + 1) for i in range(50)]
+    gzipped = list(parallel_compress(iter(chunks), "gzip", 3))
+    assert len(gzipped) == 50  # One independent member per chunk, in order
+    assert gzip.decompress(b"".join(gzipped)) == b"".join(chunks)
+    assert _zstd_decompress(b"".join(parallel_compress(iter(chunks), "zstd", 3))) == b"".join(chunks)
+    with pytest.raises(ValueError):
+        compressor("brotli")
+
+def test_compressed_export(write_jsonl, load_file, client, monkeypatch):
+    monkeypatch.setattr(settings, "export_chunk_bytes", 1024)
+    records = _records(500)
+    metadata = load_file(write_jsonl(records))
+
+    response = _export(client, metadata.id, "jsonl", compression="gzip")
+    assert response.headers["content-type"] == "application/gzip"
+    assert response.headers["content-disposition"] == "attachment; filename=data_export.jsonl.gz"
+    assert gzip.decompress(response.content) == _jsonl(records)
+
+    response = _export(client, metadata.id, "json", compression="zstd")
+    assert json.loads(_zstd_decompress(response.content)) == records
+
+def test_partitioned_export_by_rows_and_size(write_jsonl, load_file, client):
+    records = _records(100)
+    metadata = load_file(write_jsonl(records))
+
+    shards = _shards(_export(client, metadata.id, "jsonl", partition_by="rows", partition_size=30).content)
+    assert list(shards) == [f"part-{i:05d}.jsonl" for i in range(4)]
+    assert [shard.count(b"\n") for shard in shards.values()] == [30, 30, 30, 10]
+    assert b"".join(shards.values()) == _jsonl(records)
+
+    shards = _shards(_export(client, metadata.id, "csv", partition_by="size", partition_size=800,
+                             compression="gzip").content)
+    assert len(shards) > 2 and all(name.endswith(".csv.gz") for name in shards)
+    rows = []
+    for shard in map(gzip.decompress, shards.values()):
+        shard_rows = list(csv.DictReader(io.StringIO(shard.decode())))
+        assert shard.startswith(b"group,meta,row,score")  # Every shard has the header
+        rows.extend(int(row["row"]) for row in shard_rows)
+    assert all(len(gzip.decompress(shard)) >= 800 for shard in list(shards.values())[:-1])
+    assert rows == list(range(100))
+
+def test_partitioned_export_streams_each_shard_once_full(write_jsonl, load_file, monkeypatch):
+    records = _records(100)
+    metadata = load_file(write_jsonl(records))
+    read = []
+
+    def tracked_records(request, progress_callback=None):
+        for record in records:
+            read.append(record)
+            yield record
+    monkeypatch.setattr(data_service, "iter_records", tracked_records)
+
+    stream = export_service._build_export(DataRequest(file_id=metadata.id), "jsonl", partition_by="rows",
+                                          partition_size=30)["stream"]
+    content = []
+    for chunk in stream:
+        content.append(chunk)
+        if chunk:
+            break
+    assert len(read) == 31  # The first shard was zipped as soon as the second one started
+    content.extend(stream)
+    assert b"".join(_shards(b"".join(content)).values()) == _jsonl(records)
+
+def test_partitioned_export_by_column(write_jsonl, load_file, client, wait_for_task, monkeypatch):
+    records = _records(50) + [{"row": 50, "group": None}, {"row": 51, "group": "a/b"}]
+    metadata = load_file(write_jsonl(records))
+
+    response = client.post("/api/v1/export/", json={"data_request": {"file_id": metadata.id}, "format": "jsonl",
+                                                    "partition_by": "column", "partition_column": "group"})
+    assert response.status_code == 400 and "/export/jobs" in response.json()["detail"]
+
+    job = _finished_job(client, wait_for_task, metadata.id, partition_by="column", partition_column="group",
+                        compression="zstd")
+    assert job["status"] == "completed"
+    shards = _shards(client.get(f"/api/v1/export/jobs/{job['job_id']}/download").content)
+    assert sorted(shards) == [f"group={value}.jsonl.zst" for value in ("__null__", "a", "a_b", "b", "c", "d", "e")]
+    for value in "abcde":
+        rows = [json.loads(line) for line in _zstd_decompress(shards[f"group={value}.jsonl.zst"]).splitlines()]
+        assert rows == [record for record in records if record["group"] == value]
+
+    monkeypatch.setattr(settings, "export_max_partitions", 3)
+    job = _finished_job(client, wait_for_task, metadata.id, partition_by="column", partition_column="group")
+    assert job["status"] == "failed" and "more than 3 distinct values" in job["error"]
+
+def test_partitioned_export_rejects_invalid_options(write_jsonl, load_file, client):
+    metadata = load_file(write_jsonl(_records(5)))
+    for options in ({"format": "json", "partition_by": "rows", "partition_size": 2},
+                    {"format": "jsonl", "partition_by": "size"},
+                    {"format": "jsonl", "partition_by": "column"},
+                    {"format": "jsonl", "partition_by": "hash", "partition_size": 2},
+                    {"format": "jsonl", "compression": "brotli"},
+                    {"format": "excel", "compression": "gzip"}):
+        response = client.post("/api/v1/export/", json={"data_request": {"file_id": metadata.id}, **options})
+        assert response.status_code == 400, options
@@ -0,0 +1,190 @@
+"""
+Tests for schema inference, schema drift and stratified sampling
+"""
+import gzip
+import json
+
+import pytest
+
+import app.processors.sampling as sampling_module
+import app.services.file_loader as file_loader_module
+from app.processors.jsonl_streamer import JSONLStreamer
+from app.processors.sampling import estimate_decompressed_size, stratified_sample
+from app.processors.schema_stats import SchemaAccumulator, accumulate_schema, schema_drift, value_type
+from app.processors.timestamps import TimestampParser
+from app.services.schema_detector import SchemaDetector
+
+NESTED_RECORDS = [
+    {"id": 1, "user": {"name": "ann", "tags": ["a", "b"]}, "events": [{"kind": "click", "at": 3}]},
+    {"id": 2, "user": {"name": "bob", "tags": []}, "events": [{"kind": "view"}, {"kind": 7}]},
+    {"id": 3, "user": None, "extra": True},
+]
+
+def test_nested_records_yield_dotted_paths():
+    accumulator = SchemaAccumulator()
+    for record in NESTED_RECORDS:
+        accumulator.add(record)
+    accumulator.add(["not", "an", "object"])
+
+    assert set(accumulator.fields) == {
+        "id", "user", "user.name", "user.tags", "user.tags[]", "events", "events[]",
+        "events[].kind", "events[].at", "extra"
+    }
+    assert accumulator.top_level_paths() == ["events", "extra", "id", "user"]
+    assert (accumulator.record_count, accumulator.invalid_count) == (3, 1)
+
+    kind = accumulator.fields["events[].kind"]
+    assert kind.type_counts == {"string": 2, "number": 1}
+    assert kind.present_count == 2  # Counted once per record
+    assert kind.primary_type == "string"
+    assert accumulator.fields["user"].null_count == 1
+
+def test_value_types():
+    timestamps = TimestampParser()
+    assert [value_type(value, timestamps) for value in (None, True, 1.5, [], {}, "text")] == [
+        "null", "boolean", "number", "array", "object", "string"
+    ]
+    assert value_type("2024-05-01T10:00:00Z", timestamps) == "date"
+    assert value_type("20240501", timestamps) == "string"
+
+def test_schema_treats_missing_keys_as_nulls():
+    schema = SchemaDetector().detect_schema(NESTED_RECORDS)
+    columns = {column.name: column for column in schema.columns}
+    assert list(columns) == ["events", "extra", "id", "user"]
+    assert columns["extra"].null_count == 2 and columns["extra"].nullable
+    assert columns["id"].null_count == 0 and not columns["id"].nullable
+    assert columns["id"].unique_count == 3
+    assert {field.name for field in schema.fields} >= {"user.tags[]", "events[].kind"}
+
+def test_path_limit_bounds_memory(monkeypatch):
+    monkeypatch.setattr(SchemaAccumulator, "MAX_PATHS", 3)
+    accumulator = SchemaAccumulator()
+    accumulator.add({"a": 1, "b": 2, "c": 3, "d": 4, "e": {"f": 5}})
+    assert len(accumulator.fields) == 3
+    assert accumulator.overflow_count == 3
+
+def test_sharded_schema_matches_single_pass(write_jsonl):
+    records = [NESTED_RECORDS[i % 3] | {"row": i} for i in range(600)]
+    lines = [json.dumps(record) for record in records]
+    lines.insert(100, "{broken")
+    path = str(write_jsonl(lines))
+
+    single = accumulate_schema(path, 1, 1)
+    sharded = accumulate_schema(path, 4, 1)
+    assert (sharded.record_count, sharded.invalid_count) == (600, 1)
+    assert sharded.line_count == single.line_count == 601
+    assert set(sharded.fields) == set(single.fields)
+    for name, stats in single.fields.items():
+        other = sharded.fields[name]
+        assert (other.present_count, other.null_count, other.type_counts) == (
+            stats.present_count, stats.null_count, stats.type_counts
+        )
+
+def test_full_analysis_lists_nested_fields(write_jsonl, load_file, client):
+    metadata = load_file(write_jsonl(NESTED_RECORDS * 10))
+    assert metadata.processing_status == "full_analysis_complete"
+    assert metadata.total_records == 30
+
+    body = client.get(f"/api/v1/files/{metadata.id}").json()
+    assert [column["name"] for column in body["columns"]] == ["events", "extra", "id", "user"]
+    fields = {field["name"]: field for field in body["fields"]}
+    assert fields["events[].kind"]["type_counts"] == {"string": 20, "number": 10}
+
+def _drift_lines():
+    # Every line is 22 bytes with its newline, so 220-byte segments start at rows 0, 10, 20, ...
+    before = [json.dumps({"a": 1, "b": "x"}) + "   "] * 50
+    nulls = [json.dumps({"a": None, "b": "x"})] * 10
+    after = [json.dumps({"a": "1", "c": 1}) + "   "] * 40
+    lines = before + nulls + after
+    assert {len(line) for line in lines} == {21}
+    return lines
+
+def test_schema_drift_locates_field_changes(write_jsonl):
+    path = str(write_jsonl(_drift_lines()))
+    for workers in (1, 3):
+        drift = schema_drift(accumulate_schema(path, workers, 1, segment_bytes=220))
+        assert drift["segment_count"] == 10
+        assert [segment["first_row"] for segment in drift["segments"]] == list(range(0, 100, 10))
+        assert drift["distinct_schemas"] == 3
+        assert drift["schema_changes"] == 2
+
+        # Nulls in rows 50-59 are not a type change; the number -> string change is found at row 60
+        assert {(event["event"], event["path"], event["row"]) for event in drift["events"]} == {
+            ("appeared", "c", 60), ("disappeared", "b", 60), ("type_changed", "a", 60)
+        }
+        changed = next(event for event in drift["events"] if event["event"] == "type_changed")
+        assert (changed["from"], changed["to"], changed["offset"]) == (["number"], ["string"], 1320)
+
+def test_schema_drift_event_limit(write_jsonl):
+    lines = [json.dumps({f"field{i}": i}) for i in range(40)]
+    drift = schema_drift(accumulate_schema(str(write_jsonl(lines)), 1, 1, segment_bytes=1), max_events=5)
+    assert drift["event_count"] > 5
+    assert len(drift["events"]) == 5 and drift["truncated"]
+
+def test_schema_drift_endpoint(write_jsonl, load_file, client, monkeypatch):
+    monkeypatch.setattr(file_loader_module.settings, "schema_segment_bytes", 220)
+    metadata = load_file(write_jsonl(_drift_lines()))
+
+    body = client.get(f"/api/v1/files/{metadata.id}/schema-drift").json()
+    assert body["segment_count"] == 10
+    assert {event["path"] for event in body["events"]} == {"a", "b", "c"}
+    assert client.get("/api/v1/files/missing/schema-drift").status_code == 404
+
+def _varied_lines(count):
+    return [json.dumps({"row": i, "text": "x" * (i * 7919 % 97)}) for i in range(count)]
+
+def test_small_files_are_counted_exactly(write_jsonl):
+    lines = _varied_lines(300)
+    lines.insert(10, "")
+    sample = stratified_sample(str(write_jsonl(lines)), 4, 5)
+    assert sample.method == "exact"
+    assert sample.total_records == 300 and sample.total_records_ci == (300, 300)
+    assert [record["row"] for record in sample.records] == list(range(19))  # The blank line is skipped
+
+def test_stratified_estimate_covers_the_record_count(write_jsonl, monkeypatch):
+    monkeypatch.setattr(sampling_module, "EXACT_COUNT_BYTES", 0)
+    path = str(write_jsonl(_varied_lines(20000)))
+
+    covered = 0
+    for seed in range(20):
+        sample = stratified_sample(path, 32, 20, seed=seed)
+        assert sample.method == "stratified"
+        assert sample.total_records == pytest.approx(20000, rel=0.05)
+        low, high = sample.total_records_ci
+        covered += low <= 20000 <= high
+    assert covered >= 16
+
+    rows = [record["row"] for record in sample.records]
+    assert len(rows) == 32 * 20
+    assert min(rows) < 1000 and max(rows) > 19000  # Drawn across the whole file
+
+def test_compressed_files_are_estimated_from_their_head(tmp_path, monkeypatch):
+    lines = _varied_lines(20000)
+    content = "".join(line + "\n" for line in lines).encode()
+    path = tmp_path / "data.jsonl.gz"
+    path.write_bytes(gzip.compress(content))
+
+    # Read whole: counted exactly
+    sample = stratified_sample(str(path), 4, 5)
+    assert sample.method == "exact" and sample.total_records == 20000
+    assert sample.decompressed_size == len(content)
+
+    # The gzip trailer gives the exact size even when only a head is decompressed
+    size, head, exact = estimate_decompressed_size(JSONLStreamer(path), probe_bytes=64 * 1024)
+    assert (size, exact) == (len(content), True) and content.startswith(head)
+
+    original = sampling_module.estimate_decompressed_size
+    monkeypatch.setattr(sampling_module, "estimate_decompressed_size",
+                        lambda streamer: original(streamer, probe_bytes=64 * 1024))
+    sample = stratified_sample(str(path), 4, 5)
+    assert sample.method == "compressed_head"
+    assert [record["row"] for record in sample.records] == list(range(20))
+    assert sample.total_records == pytest.approx(20000, rel=0.1)
+    low, high = sample.total_records_ci
+    assert low < sample.total_records < high
+
+def test_quick_analysis_reports_the_record_estimate(write_jsonl, load_file, client):
+    metadata = load_file(write_jsonl(_varied_lines(500)), full_analysis=False)
+    body = client.get(f"/api/v1/files/{metadata.id}").json()
+    assert body["estimated_records"] == 500
+    assert body["estimated_records_ci"] == [500, 500]
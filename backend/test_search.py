@@ -0,0 +1,358 @@
+"""
+Tests for search indexing, ranking and the search endpoints
+"""
+import json
+import re
+import threading
+
+from app.processors.index_builder import build_index, merge_segments
+from app.processors.regex_scanner import prefilter_safe, regex_scan, required_literals
+from app.services.search_service import search_service
+
+RECORDS = [
+    {"name": "alpha widget", "color": "red", "note": "first"},
+    {"name": "beta gadget", "color": "blue", "note": "second"},
+    {"name": "gamma widget", "color": "green", "note": "widget widget widget extra words here"},
+    {"name": "delta", "color": "red", "note": "fourth"},
+]
+
+def test_index_builds_in_background_and_reports_ready(write_jsonl, load_file, wait_for_task, client):
+    metadata = load_file(write_jsonl(RECORDS))
+    assert search_service.get_index_status(metadata.id) == "missing"
+
+    response = client.post(f"/api/v1/search/index/{metadata.id}")
+    assert response.status_code == 200
+    task_id = response.json()["task_id"]
+    assert wait_for_task(task_id).status.value == "completed"
+
+    status_response = client.get(f"/api/v1/search/index/{metadata.id}").json()
+    assert status_response["index_status"] == "ready"
+    assert status_response["progress"] == 100.0
+    assert client.post(f"/api/v1/search/index/{metadata.id}").json()["status"] == "completed"
+
+def test_index_build_reuses_task_in_flight(write_jsonl, load_file, wait_for_task, monkeypatch):
+    metadata = load_file(write_jsonl(RECORDS))
+    release = threading.Event()
+    build = search_service.build_search_index
+
+    def blocked_build(file_id, task_id=None):
+        release.wait(10)
+        return build(file_id, task_id)
+
+    monkeypatch.setattr(search_service, "build_search_index", blocked_build)
+    task_id = search_service.start_index_build(metadata.id)
+    assert search_service.start_index_build(metadata.id) == task_id
+    assert search_service.get_index_status(metadata.id) == "building"
+
+    release.set()
+    wait_for_task(task_id)
+    assert search_service.get_index_status(metadata.id) == "ready"
+
+def test_search_scans_while_index_builds(write_jsonl, load_file, wait_for_task, client, monkeypatch):
+    metadata = load_file(write_jsonl(RECORDS))
+    release = threading.Event()
+    build = search_service.build_search_index
+
+    def blocked_build(file_id, task_id=None):
+        release.wait(10)
+        return build(file_id, task_id)
+
+    monkeypatch.setattr(search_service, "build_search_index", blocked_build)
+    response = client.post("/api/v1/search/", json={"file_id": metadata.id, "query": "widget"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["index_status"] == "building"
+    assert body["matching_rows"] == [0, 2]
+    assert body["scores"] is None
+
+    release.set()
+    wait_for_task(search_service.index_tasks[metadata.id])
+    body = client.post("/api/v1/search/", json={"file_id": metadata.id, "query": "widget"}).json()
+    assert body["index_status"] == "ready"
+    assert sorted(body["matching_rows"]) == [0, 2]
+    assert len(body["scores"]) == 2
+
+def test_index_build_for_unknown_file_is_not_found(client):
+    assert client.post("/api/v1/search/index/missing-file").status_code == 404
+
+def _wide_records(count):
+    words = ["apple", "banana", "cherry", "damson", "elder"]
+    return [
+        {"id": i, "text": f"{words[i % 5]} {words[(i * 3) % 5]} item{i}", "group": words[i % 3]}
+        for i in range(count)
+    ]
+
+def test_merge_segments_shifts_rows_and_keeps_postings_sorted():
+    first = [("a", "x", [0, 2]), ("b", "y", [1])]
+    second = [("a", "x", [0]), ("a", "z", [1])]
+    index = merge_segments([first, second], [0, 3])
+    assert index == {"a": {"x": [0, 2, 3], "z": [4]}, "b": {"y": [1]}}
+
+def test_sharded_index_build_matches_single_shard(write_jsonl):
+    lines = [json.dumps(record) for record in _wide_records(300)]
+    lines.insert(50, "{not json")
+    path = write_jsonl(lines)
+
+    single_index, single_offsets, single_lengths = build_index(str(path), 1, 1)
+    index, offsets, lengths = build_index(str(path), 4, 1)
+    assert index == single_index
+    assert list(offsets) == list(single_offsets)
+    assert list(lengths) == list(single_lengths)
+    assert len(offsets) == 300
+
+    with open(path, "rb") as f:
+        for row in (0, 49, 50, 299):
+            f.seek(offsets[row])
+            assert json.loads(f.readline())["id"] == row
+
+def test_required_literals_keep_only_mandatory_words():
+    literals = required_literals(r"error: (timeout|refused) after \d+ retries")
+    assert set(literals) == {b"error", b"after", b"retries"}
+    assert len(literals[0]) >= len(literals[-1])
+    assert required_literals(r"(?:Status)+ OK") == [b"status", b"ok"]
+    assert required_literals(r"[a-z]+\d*") == []
+    assert required_literals(r"colou?r") == [b"colo"]
+    assert required_literals("(unclosed") == []
+
+def test_prefilter_skips_pieces_that_may_not_appear_in_raw_json():
+    assert prefilter_safe("abc")
+    assert not prefilter_safe("123")
+    assert not prefilter_safe("none")
+    assert not prefilter_safe("café")
+    assert required_literals("None found") == [b"found"]
+
+def _regex_lines():
+    lines = [json.dumps(record) for record in _wide_records(200)]
+    lines.insert(10, "{broken")
+    lines.insert(120, "")
+    lines[30] = json.dumps({"id": "odd", "text": None, "nested": {"a": None}})
+    return lines
+
+def _expected_regex_rows(lines, column, pattern):
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    regex = re.compile(pattern, re.IGNORECASE)
+    return [
+        row for row, record in enumerate(records)
+        if record.get(column) is not None and regex.search(str(record[column]))
+    ]
+
+def test_regex_scan_numbers_rows_like_the_index(write_jsonl):
+    lines = _regex_lines()
+    path = str(write_jsonl(lines))
+    _, offsets, _ = build_index(path, 1, 1)
+
+    for pattern in (r"cherry\s+banana", r"ITEM1\d\b", r"^elder"):
+        expected = _expected_regex_rows(lines, "text", pattern)
+        assert expected
+        for workers in (1, 4):
+            assert regex_scan(path, pattern, "text", 1000, workers, 1) == expected
+            assert regex_scan(path, pattern, "text", 1000, workers, 1, offsets) == expected
+        assert regex_scan(path, pattern, "text", 3, 4, 1) == expected[:3]
+
+def test_regex_search_endpoint_uses_index_candidates(write_jsonl, load_file, client):
+    lines = _regex_lines()
+    metadata = load_file(write_jsonl(lines))
+    search_service.build_search_index(metadata.id)
+
+    pattern = r"damson\s+elder"
+    assert search_service._regex_candidates(metadata.id, "text", pattern) is not None
+    response = client.post("/api/v1/search/", json={
+        "file_id": metadata.id, "query": pattern, "column": "text", "regex": True
+    })
+    assert response.status_code == 200
+    expected = _expected_regex_rows(lines, "text", pattern)
+    assert expected
+    assert response.json()["matching_rows"] == expected
+
+RANKING_RECORDS = [
+    {"title": "rare common", "body": "x"},
+    {"title": "common", "body": "y"},
+    {"title": "common filler filler filler filler filler", "body": "z"},
+    {"title": "other", "body": "rare"},
+    {"title": "common", "body": "y"},
+]
+
+def _indexed_file(write_jsonl, load_file, records):
+    metadata = load_file(write_jsonl(records))
+    search_service.build_search_index(metadata.id)
+    return metadata.id
+
+def test_bm25_prefers_shorter_rows_and_more_query_terms(write_jsonl, load_file):
+    file_id = _indexed_file(write_jsonl, load_file, RANKING_RECORDS)
+
+    ranked, total = search_service.search_ranked(file_id, "common")
+    assert total == 4
+    # Equal scores are ordered by row
+    assert [row for row, _ in ranked] == [1, 4, 0, 2]
+    assert ranked[0][1] == ranked[1][1] > ranked[2][1] > ranked[3][1]
+
+    ranked, _ = search_service.search_ranked(file_id, "rare common")
+    assert ranked[0][0] == 0
+
+def test_bm25_column_boosts_and_column_filter(write_jsonl, load_file):
+    file_id = _indexed_file(write_jsonl, load_file, RANKING_RECORDS)
+
+    ranked, _ = search_service.search_ranked(file_id, "rare", column_boosts={"title": 5.0})
+    assert [row for row, _ in ranked] == [0, 3]
+    ranked, _ = search_service.search_ranked(file_id, "rare", column_boosts={"body": 5.0})
+    assert [row for row, _ in ranked] == [3, 0]
+    ranked, total = search_service.search_ranked(file_id, "rare", columns=["body"])
+    assert [row for row, _ in ranked] == [3] and total == 1
+
+def test_bm25_top_k_matches_full_ranking(write_jsonl, load_file, client):
+    file_id = _indexed_file(write_jsonl, load_file, _wide_records(150))
+
+    full, total = search_service.search_ranked(file_id, "apple item1", limit=1000)
+    for limit in (1, 5, 20):
+        top, top_total = search_service.search_ranked(file_id, "apple item1", limit=limit)
+        assert top == full[:limit]
+        assert top_total == total
+
+    body = client.post("/api/v1/search/", json={"file_id": file_id, "query": "apple item1", "limit": 5}).json()
+    assert body["matching_rows"] == [row for row, _ in full[:5]]
+    assert body["total_matches"] == total
+    assert body["scores"] == sorted(body["scores"], reverse=True)
+
+def test_search_results_returns_pages_of_records(write_jsonl, load_file, client):
+    records = _wide_records(60)
+    file_id = _indexed_file(write_jsonl, load_file, records)
+    full, total = search_service.search_ranked(file_id, "banana")
+
+    request = {"file_id": file_id, "query": "banana", "page": 2, "page_size": 5}
+    body = client.post("/api/v1/search/results", json=request).json()
+    assert body["row_ids"] == [row for row, _ in full[5:10]]
+    assert body["data"] == [records[row] for row in body["row_ids"]]
+    assert body["total_matches"] == total
+    assert body["total_pages"] == -(-total // 5)
+    assert body["has_prev"] and body["has_next"]
+
+    request["page"] = body["total_pages"] + 1
+    body = client.post("/api/v1/search/results", json=request).json()
+    assert body["data"] == [] and not body["has_next"]
+
+def test_search_results_pages_regex_matches(write_jsonl, load_file, client):
+    records = _wide_records(90)
+    metadata = load_file(write_jsonl(records))
+    expected = [row for row, record in enumerate(records) if record["group"] == "apple"]
+
+    request = {"file_id": metadata.id, "query": "^app", "column": "group", "regex": True, "page_size": 10}
+    body = client.post("/api/v1/search/results", json=request).json()
+    assert body["row_ids"] == expected[:10]
+    assert (body["total_matches"], body["total_pages"], body["has_next"]) == (30, 3, True)
+
+    body = client.post("/api/v1/search/results", json=request | {"page": 3}).json()
+    assert body["row_ids"] == expected[20:]
+    assert not body["has_next"]
+
+def test_search_results_pages_scan_matches_while_index_builds(write_jsonl, load_file, wait_for_task, client,
+                                                            monkeypatch):
+    records = _wide_records(90)
+    metadata = load_file(write_jsonl(records))
+    expected = [row for row, record in enumerate(records) if record["group"] == "apple"]
+    release = threading.Event()
+    build = search_service.build_search_index
+
+    def blocked_build(file_id, task_id=None):
+        release.wait(10)
+        return build(file_id, task_id)
+
+    monkeypatch.setattr(search_service, "build_search_index", blocked_build)
+    request = {"file_id": metadata.id, "query": "apple", "column": "group", "page": 2, "page_size": 10}
+    body = client.post("/api/v1/search/results", json=request).json()
+    assert body["index_status"] == "building"
+    assert body["row_ids"] == expected[10:20]
+    assert (body["total_matches"], body["total_pages"], body["has_next"]) == (30, 3, True)
+
+    # Scans count matches up to the request's limit
+    body = client.post("/api/v1/search/results", json=request | {"limit": 25}).json()
+    assert (body["total_matches"], body["total_pages"], body["has_next"]) == (25, 3, True)
+
+    release.set()
+    wait_for_task(search_service.index_tasks[metadata.id])
+
+def test_search_results_rejects_invalid_paging(client):
+    for paging in ({"page": 0}, {"page_size": 0}, {"page_size": 1001}):
+        response = client.post("/api/v1/search/results", json={"file_id": "any", "query": "x", **paging})
+        assert response.status_code == 422
+
+def test_search_results_drops_unreadable_rows(write_jsonl, load_file, client, monkeypatch):
+    records = _wide_records(20)
+    file_id = _indexed_file(write_jsonl, load_file, records)
+    get_records = search_service.get_records
+
+    def lossy_get_records(file_id, row_ids):
+        found = get_records(file_id, row_ids)
+        return [None] + found[1:]
+
+    monkeypatch.setattr(search_service, "get_records", lossy_get_records)
+    body = client.post("/api/v1/search/results", json={"file_id": file_id, "query": "apple"}).json()
+    full, _ = search_service.search_ranked(file_id, "apple")
+    assert body["row_ids"] == [row for row, _ in full[1:]]
+    assert body["data"] == [records[row] for row in body["row_ids"]]
+    assert len(body["scores"]) == len(body["row_ids"])
+
+def _stream_events(client, **request):
+    response = client.post("/api/v1/search/stream", json=request)
+    assert response.status_code == 200
+    if request.get("format") == "sse":
+        return response, None
+    return response, [json.loads(line) for line in response.text.splitlines() if line]
+
+def test_stream_search_scans_in_batches(write_jsonl, load_file, client):
+    records = _wide_records(80)
+    lines = [json.dumps(record) for record in records]
+    lines.insert(5, "{broken")
+    metadata = load_file(write_jsonl(lines))
+    expected = [
+        row for row, record in enumerate(records)
+        if any("banana" in str(value) for value in record.values())
+    ]
+
+    response, events = _stream_events(client, file_id=metadata.id, query="banana", batch_size=3)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    batches = [event["rows"] for event in events if event["event"] == "matches"]
+    assert [row for batch in batches for row in batch] == expected
+    assert all(len(batch) <= 3 for batch in batches)
+    assert any(event["event"] == "progress" for event in events)
+    assert events[-1] == {"event": "done", "total_matches": len(expected), "rows_scanned": 80, "truncated": False}
+
+    _, events = _stream_events(client, file_id=metadata.id, query="banana", limit=4)
+    assert [row for event in events if event["event"] == "matches" for row in event["rows"]] == expected[:4]
+    assert events[-1]["truncated"]
+
+def test_stream_search_regex_and_sse(write_jsonl, load_file, client):
+    records = _wide_records(30)
+    metadata = load_file(write_jsonl(records))
+    expected = _expected_regex_rows([json.dumps(record) for record in records], "text", r"item2\d")
+
+    response, _ = _stream_events(client, file_id=metadata.id, query=r"item2\d", column="text", regex=True, format="sse")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    assert blocks[-1].startswith("event: done\ndata: ")
+    rows = [
+        row for block in blocks if block.startswith("event: matches")
+        for row in json.loads(block.split("data: ", 1)[1])["rows"]
+    ]
+    assert rows == expected
+
+def test_stream_search_uses_index_when_ready(write_jsonl, load_file, client):
+    file_id = _indexed_file(write_jsonl, load_file, RANKING_RECORDS)
+    _, events = _stream_events(client, file_id=file_id, query="common")
+    assert events[0]["event"] == "matches"
+    assert events[0]["rows"] == [1, 4, 0, 2]
+    assert len(events[0]["scores"]) == 4
+    assert events[-1] == {"event": "done", "total_matches": 4, "truncated": False}
+
+def test_stream_search_rejects_invalid_requests(write_jsonl, load_file, client):
+    metadata = load_file(write_jsonl(RECORDS))
+    for request in (
+        {"file_id": "missing", "query": "x"},
+        {"file_id": metadata.id, "query": "x", "regex": True},
+        {"file_id": metadata.id, "query": "(", "column": "name", "regex": True},
+    ):
+        assert client.post("/api/v1/search/stream", json=request).status_code == 400
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { Download, X, FileText, Table, FileSpreadsheet } from 'lucide-react'
+import { Download, X, FileText, Table, FileSpreadsheet, Database } from 'lucide-react'
 import { apiService } from '../../services/api'
 import { DataRequest } from '../../types'
 
@@ -47,7 +47,9 @@ const ExportModal: React.FC<ExportModalProps> = ({
     { value: 'json', label: 'JSON', icon: FileText, description: 'JavaScript Object Notation' },
     { value: 'jsonl', label: 'JSONL', icon: FileText, description: 'JSON Lines format' },
     { value: 'csv', label: 'CSV', icon: Table, description: 'Comma-separated values' },
-    { value: 'excel', label: 'Excel', icon: FileSpreadsheet, description: 'Excel spreadsheet (.xlsx)' }
+    { value: 'excel', label: 'Excel', icon: FileSpreadsheet, description: 'Excel spreadsheet (.xlsx)' },
+    { value: 'parquet', label: 'Parquet', icon: Database, description: 'Columnar Apache Parquet' },
+    { value: 'arrow', label: 'Arrow', icon: Database, description: 'Apache Arrow IPC file' }
   ]
 
   const handleExport = async () => {
@@ -1,4 +1,4 @@
-import { FileMetadata, DataRequest, DataChunk, SearchRequest, SearchResponse, TaskInfo, DirectoryListing } from '../types'
+import { FileMetadata, DataRequest, DataChunk, SearchRequest, SearchResponse, SearchResultsRequest, SearchResultsResponse, TaskInfo, DirectoryListing, ExportJob } from '../types'
 
 const API_BASE = '/api/v1'
 
@@ -43,6 +43,14 @@ class ApiService {
     return response.json()
   }
 
+  async getSchemaDrift(fileId: string): Promise<any> {
+    const response = await fetch(`${API_BASE}/files/${fileId}/schema-drift`)
+    if (!response.ok) {
+      throw new Error(`Failed to get schema drift: ${response.statusText}`)
+    }
+    return response.json()
+  }
+
   async listFiles(): Promise<FileMetadata[]> {
     const response = await fetch(`${API_BASE}/files/`)
     if (!response.ok) {
@@ -102,6 +110,20 @@ class ApiService {
     return response.json()
   }
 
+  async searchResults(request: SearchResultsRequest): Promise<SearchResultsResponse> {
+    const response = await fetch(`${API_BASE}/search/results`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(request)
+    })
+    
+    if (!response.ok) {
+      throw new Error(`Search failed: ${response.statusText}`)
+    }
+    
+    return response.json()
+  }
+
   async getSearchSuggestions(fileId: string, column: string, prefix: string): Promise<string[]> {
     const response = await fetch(`${API_BASE}/search/suggestions`, {
       method: 'POST',
@@ -132,6 +154,27 @@ class ApiService {
     return response.json()
   }
 
+  async analyzeColumns(fileId: string, columns: string[] | 'all' = 'all'): Promise<{
+    status: string
+    task_id: string | null
+    columns: string[]
+    attached: Record<string, string>
+    cached: string[]
+    results: Record<string, any>
+  }> {
+    const response = await fetch(`${API_BASE}/analysis/columns`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ file_id: fileId, columns })
+    })
+
+    if (!response.ok) {
+      throw new Error(`Batch analysis failed: ${response.statusText}`)
+    }
+
+    return response.json()
+  }
+
   async getColumnAnalysis(fileId: string, column: string): Promise<any> {
     const response = await fetch(`${API_BASE}/analysis/column/${fileId}/${column}`)
     if (!response.ok) {
@@ -183,6 +226,38 @@ class ApiService {
     
     return response.blob()
   }
+
+  async createExportJob(dataRequest: DataRequest, format: string, includeStats: boolean = false): Promise<ExportJob> {
+    const response = await fetch(`${API_BASE}/export/jobs`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        data_request: dataRequest,
+        format,
+        include_stats: includeStats
+      })
+    })
+    
+    if (!response.ok) {
+      throw new Error(`Export failed: ${response.statusText}`)
+    }
+    
+    return response.json()
+  }
+
+  async getExportJob(jobId: string): Promise<ExportJob> {
+    const response = await fetch(`${API_BASE}/export/jobs/${jobId}`)
+    
+    if (!response.ok) {
+      throw new Error(`Failed to get export job: ${response.statusText}`)
+    }
+    
+    return response.json()
+  }
+
+  getExportJobDownloadUrl(jobId: string): string {
+    return `${API_BASE}/export/jobs/${jobId}/download`
+  }
 }
 
 export const apiService = new ApiService()
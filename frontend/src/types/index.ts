@@ -7,7 +7,9 @@ export interface FileMetadata {
   file_size: number
   total_records: number
   estimated_records?: number
+  estimated_records_ci?: [number, number]
   columns: ColumnInfo[]
+  fields?: ColumnInfo[]
   upload_time: string
   processing_status: string
   sample_data: Record<string, any>[]
@@ -21,6 +23,7 @@ export interface ColumnInfo {
   sample_values: any[]
   unique_count?: number
   null_count?: number
+  type_counts?: Record<string, number>
 }
 
 export enum DataType {
@@ -124,6 +127,20 @@ export interface TaskInfo {
   completed_at?: number
 }
 
+export interface ExportJob {
+  job_id: string
+  status: TaskStatus | 'unknown'
+  progress?: number
+  error?: string
+  filename: string
+  content_type: string
+  size?: number
+  etag?: string
+  created_at: number
+  completed_at?: number
+  expires_at?: number
+}
+
 // Search Types
 export interface SearchRequest {
   file_id: string
@@ -131,13 +148,36 @@ export interface SearchRequest {
   column?: string
   regex?: boolean
   limit?: number
+  column_boosts?: Record<string, number>
 }
 
 export interface SearchResponse {
   matching_rows: number[]
   total_matches: number
   query: string
+  scores?: number[] | null
+  execution_time_ms: number
+  index_status?: 'ready' | 'building' | 'failed' | 'missing'
+}
+
+export interface SearchResultsRequest extends SearchRequest {
+  page?: number
+  page_size?: number
+}
+
+export interface SearchResultsResponse {
+  data: Record<string, any>[]
+  row_ids: number[]
+  scores?: number[] | null
+  page: number
+  page_size: number
+  total_pages: number
+  total_matches: number
+  has_next: boolean
+  has_prev: boolean
+  query: string
   execution_time_ms: number
+  index_status?: 'ready' | 'building' | 'failed' | 'missing'
 }
 
 // Analysis Types